@@ -1,12 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-import sys
-from PyQt6.QtWidgets import QApplication
-from ui.main_window import MainWindow
+import sys, time
+_T0 = time.perf_counter()
+from core import startup_profile
 
 def main():
+    # --profile-startup：打印各阶段和模块导入耗时（PyQt 与界面模块放到这之后再导入，才计得到）
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        startup_profile.enable(_T0)
+    from PyQt6.QtWidgets import QApplication
+    from ui.main_window import MainWindow
+    startup_profile.mark("imports")
     app = QApplication(sys.argv)
+    startup_profile.mark("QApplication")
     w = MainWindow()
+    startup_profile.watch_first_paint(w)
     w.show()
     sys.exit(app.exec())
 
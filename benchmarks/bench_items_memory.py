@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+列表常驻条目的内存基准：生成合成历史，用 tracemalloc 测量把全部条目载入内存后每条占用的字节数，
+对比整行 SELECT * + 每行一个 dict（旧的载入方式）与 LIST_COLUMNS + ClipItem。
+
+    python -m benchmarks.bench_items_memory [--n 100000]
+"""
+from __future__ import annotations
+import argparse, gc, os, random, sys, tempfile, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import storage
+from core.queue_manager import QueueManager
+
+class _Settings:
+    duplicate_policy = "separate"
+    large_text_kb = 64
+
+def build(eng: storage.StorageEngine, n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    words = "alpha bravo charlie delta echo foxtrot golf hotel india juliet 剪贴板 会议 报告".split()
+    for start in range(0, n, 10000):
+        with eng.transaction():
+            for i in range(start, min(n, start + 10000)):
+                if i % 10 == 0:
+                    eng.add_files_item([f"/home/user/project/{rnd.choice(words)}/{i}-{k}.txt" for k in range(rnd.randint(1, 5))])
+                elif i % 25 == 0:
+                    eng.add_image_item(f"/home/user/.cache/img/{i:08x}.png", "separate", content_hash=f"{i:032x}")
+                else:
+                    # 长度偏态分布：多数是短片段，少数是几 KB 的段落
+                    k = int(rnd.paretovariate(1.2) * 6)
+                    eng.add_text_item(" ".join(rnd.choices(words, k=min(k, 2000))) + f" {i}", "separate")
+
+def _legacy_payload(row) -> dict:
+    return {
+        "id": row[0], "session_id": row[1], "type": row[2],
+        "text": row[3], "image_path": row[4], "paths_json": row[5],
+        "count": row[6], "status": row[7], "pinned": bool(row[8]),
+        "edited": bool(row[9]), "note": row[10],
+        "created_at": row[11], "last_used_at": row[12],
+        "text_len": row[14] if len(row) > 14 else None,
+    }
+
+def load_all(fetch, first_id, size: int = 1000) -> list:
+    """按游标从最新往前翻页，直到取完全部条目。"""
+    out = []
+    page = fetch(None, size)
+    while page:
+        out.extend(page)
+        page = fetch(first_id(page[0]), size)
+    return out
+
+def measure(label: str, fetch, first_id):
+    gc.collect()
+    tracemalloc.start()
+    t = time.perf_counter()
+    items = load_all(fetch, first_id)
+    dt = time.perf_counter() - t
+    cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10}{len(items):>9}{cur / len(items):>12.0f}{peak / len(items):>12.0f}{dt * 1000:>10.0f}")
+    return items
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100000)
+    args = ap.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        eng = storage.StorageEngine(os.path.join(tmp, "bench.db"))
+        build(eng, args.n)
+        qm = QueueManager(_Settings(), eng)
+        print(f"{'':<10}{'items':>9}{'B/item':>12}{'peak B/item':>12}{'load ms':>10}")
+        legacy = measure("dict", lambda before, size: [_legacy_payload(r) for r in eng.fetch_page(before, None, size)],
+                         lambda d: d["id"])
+        del legacy
+        measure("ClipItem", lambda before, size: qm.fetch_page(before, None, size), lambda it: it.id)
+        eng.close()
+
+if __name__ == "__main__":
+    main()
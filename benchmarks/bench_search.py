@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+全文检索基准：生成合成历史，测量 QueueManager.search 的延迟分位数。
+
+    python -m benchmarks.bench_search [--n 500000] [--repeat 50] [--db PATH]   # 给 --db 时库保留下来，再次运行直接复用
+"""
+from __future__ import annotations
+import argparse, os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import storage
+
+# 合成词表：音节拼出的伪词，按 Zipf 分布取词，近似真实文本里常见词少、长尾词多
+_SYL = "ka ri mo ten sul bra vex lin dor pha que zim nox tal gre ust von ple ar is".split()
+CJK = "剪贴板测试会议报告发布版本设计预算日程服务器客户端配置文档邮件地址链接图片文件"
+
+def vocabulary(rnd: random.Random, size: int = 5000) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rnd.choice(_SYL) for _ in range(rnd.randint(2, 4))))
+    words = sorted(words)
+    rnd.shuffle(words)
+    return words
+
+def build(path: str, n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    vocab = vocabulary(rnd)
+    weights = [1.0 / (r + 1) for r in range(len(vocab))]
+    eng = storage.StorageEngine(path)
+    if eng._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] >= n:
+        return eng, vocab
+    batch = 10000
+    for start in range(0, n, batch):
+        with eng.transaction():
+            for i in range(start, min(n, start + batch)):
+                if i % 10 == 0:
+                    eng.add_files_item([f"/home/user/{rnd.choice(vocab)}/{i}.txt"])
+                elif i % 3 == 0:
+                    eng.add_text_item("".join(rnd.choice(CJK) for _ in range(rnd.randint(6, 30))) + f" {i}", "separate")
+                else:
+                    eng.add_text_item(" ".join(rnd.choices(vocab, weights, k=rnd.randint(4, 20))) + f" {i}", "separate")
+    return eng, vocab
+
+def queries(vocab: list[str]) -> list[str]:
+    # 按词频排名取词：最常见、常见、长尾、两词组合、中文、无命中、短词（走 LIKE）：常见、无命中、与长词组合
+    return [vocab[0], vocab[10], vocab[1000], f"{vocab[3]} {vocab[50]}", "会议报告", "zzzqqq", "剪贴", "zq",
+            f"{vocab[0]} zq"]
+
+def percentile(xs: list[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100.0 * (len(xs) - 1))))]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=500000)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--db", help="合成库的位置（默认临时目录，运行完删除）")
+    args = ap.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        eng, vocab = build(args.db or os.path.join(tmp, "bench.db"), args.n)
+        print(f"built {args.n} items in {time.perf_counter() - t0:.1f}s")
+        print(f"{'query':<24}{'hits':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for q in queries(vocab):
+            lat, hits = [], 0
+            for _ in range(args.repeat):
+                t = time.perf_counter()
+                hits = len(eng.search(q, limit=args.limit))
+                lat.append((time.perf_counter() - t) * 1000)
+            print(f"{q:<24}{hits:>6}{percentile(lat, 50):>9.2f}{percentile(lat, 95):>9.2f}{percentile(lat, 99):>9.2f}")
+        eng.close()
+
+if __name__ == "__main__":
+    main()
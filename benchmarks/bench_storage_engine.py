@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+StorageEngine 微基准：对比旧的「每次调用都 connect()」与长连接引擎的 ops/sec。
+
+    python -m benchmarks.bench_storage_engine [--n 2000]
+"""
+from __future__ import annotations
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import storage
+
+# ---------- 旧实现（每次调用打开/关闭连接），仅用于对比 ----------
+def _legacy_add_text(path: str, text: str):
+    conn = storage.connect(path)
+    try:
+        sid = storage.get_current_session_id(conn)
+        row = conn.execute("SELECT id, count FROM items WHERE type='text' AND text=? ORDER BY id DESC LIMIT 1", (text,)).fetchone()
+        with conn:
+            if row:
+                conn.execute("UPDATE items SET count=? WHERE id=?", (row[1]+1, row[0]))
+                return row[0]
+            return conn.execute(
+                "INSERT INTO items(session_id, type, text, count, status, created_at) VALUES (?,?,?,?,?,?)",
+                (sid, "text", text, 1, "active", int(time.time()))).lastrowid
+    finally:
+        conn.close()
+
+def _legacy_is_favorite(path: str, item_id: int) -> bool:
+    conn = storage.connect(path)
+    try:
+        cid = storage._favorites_id(conn)
+        return conn.execute("SELECT 1 FROM collection_map WHERE collection_id=? AND item_id=? LIMIT 1", (cid, item_id)).fetchone() is not None
+    finally:
+        conn.close()
+
+def _legacy_set_used(path: str, item_id: int):
+    conn = storage.connect(path)
+    try:
+        with conn:
+            conn.execute("UPDATE items SET status='used', last_used_at=? WHERE id=?", (int(time.time()), item_id))
+    finally:
+        conn.close()
+
+def _rate(n: int, fn) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - t0)
+
+def run(n: int) -> list[tuple[str, float, float]]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        old_db, new_db = os.path.join(tmp, "old.db"), os.path.join(tmp, "new.db")
+        storage.StorageEngine(old_db).close()   # 建表
+        eng = storage.StorageEngine(new_db)
+        cases = [
+            ("add_text", lambda i: _legacy_add_text(old_db, f"clip {i}"),
+                         lambda i: eng.add_text_item(f"clip {i}", "count")),
+            ("is_favorite", lambda i: _legacy_is_favorite(old_db, i % n + 1),
+                            lambda i: eng.is_favorite(i % n + 1)),
+            ("set_item_used", lambda i: _legacy_set_used(old_db, i % n + 1),
+                              lambda i: eng.set_item_used(i % n + 1)),
+        ]
+        for name, before, after in cases:
+            results.append((name, _rate(n, before), _rate(n, after)))
+        eng.close()
+    return results
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=2000)
+    args = ap.parse_args(argv)
+    print(f"{'op':<16}{'before ops/s':>14}{'after ops/s':>14}{'speedup':>10}")
+    for name, before, after in run(args.n):
+        print(f"{name:<16}{before:>14.0f}{after:>14.0f}{after/before:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+text_joiner 基准：对比旧实现（逐字符 any([...]) + 整串多次 re.sub）与单遍增量实现。
+
+    python -m benchmarks.bench_text_joiner [--parts 10000] [--mb 10] [--repeat 5]
+
+场景：
+  parts  paste_all 常见形态，大量短文本（默认 1 万段）
+  big    少量超长文本（默认合计 10 MB）
+同时校验新旧输出一致（旧实现换用新的 CJK 分类表后逐字节比较）。
+"""
+from __future__ import annotations
+import argparse, os, random, re, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import text_joiner
+
+# ---------- 旧实现，仅用于对比 ----------
+def _legacy_is_cjk(ch: str) -> bool:
+    return any([
+        "一" <= ch <= "鿿",
+        "぀" <= ch <= "ヿ",
+        "가" <= ch <= "힯",
+    ])
+
+def _legacy_join(parts, mode='cjk', custom_sep='', is_cjk=_legacy_is_cjk) -> str:
+    if not parts:
+        return ""
+    parts = [p.strip() for p in parts if p is not None]
+    if mode == 'custom':
+        return custom_sep.join(parts)
+    if mode == 'english':
+        s = " ".join(parts)
+        s = re.sub(r"\s+([,\.\!\?])", r"\1", s)
+        s = re.sub(r"([,\.\!\?])(\w)", r"\1 \2", s)
+        return s
+    out = []
+    prev_last = ""
+    for p in parts:
+        if not out:
+            out.append(p)
+        else:
+            a = prev_last[-1] if prev_last else ""
+            b = p[0] if p else ""
+            out.append(p if (a and is_cjk(a)) and (b and is_cjk(b)) else " " + p)
+        prev_last = p[-1] if p else ""
+    s = "".join(out)
+    return re.sub(r"\s+([，。！？；：、])", r"\1", s)
+
+# ---------- 数据 ----------
+_WORDS = ["hello", "world", "clip", "board", "queue", "paste", "3.14", "e.g.", "ok", "data"]
+_CJK = "剪贴板队列粘贴合并文本测试数据中文日本語テキストの한국어문장"
+_PUNCT = ["，", "。", "！", "？", "、", ",", ".", "!", "?", " ", " ", ""]
+
+def _fragment(rnd: random.Random, n: int) -> str:
+    out = []
+    for _ in range(n):
+        if rnd.random() < 0.5:
+            out.append(rnd.choice(_WORDS))
+        else:
+            out.append("".join(rnd.choice(_CJK) for _ in range(rnd.randint(1, 6))))
+        out.append(rnd.choice(_PUNCT))
+    return "".join(out)
+
+def make_parts(n: int, seed: int = 1) -> list[str]:
+    rnd = random.Random(seed)
+    return [("  " if rnd.random() < 0.2 else "") + _fragment(rnd, rnd.randint(1, 8)) for _ in range(n)]
+
+def make_big(total_mb: int, pieces: int = 4, seed: int = 2) -> list[str]:
+    rnd = random.Random(seed)
+    base = _fragment(rnd, 20000)
+    reps = max(1, total_mb * 1024 * 1024 // pieces // len(base.encode("utf-8")))
+    return [base * reps for _ in range(pieces)]
+
+# ---------- 计时 ----------
+def _best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter(); fn()
+        best = min(best, (time.perf_counter() - t) * 1000)
+    return best
+
+def run(name: str, parts: list[str], repeat: int):
+    for mode in ("cjk", "english", "custom"):
+        old = _best_ms(lambda: _legacy_join(parts, mode, "\n"), repeat)
+        new = _best_ms(lambda: text_joiner.join_texts(parts, mode, "\n"), repeat)
+        same = _legacy_join(parts, mode, "\n", is_cjk=text_joiner._is_cjk) == text_joiner.join_texts(parts, mode, "\n")
+        print(f"{name:6s} {mode:8s} legacy {old:9.2f} ms   new {new:9.2f} ms   x{old/new:5.2f}   same={same}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--parts", type=int, default=10000)
+    ap.add_argument("--mb", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=5)
+    a = ap.parse_args()
+    run("parts", make_parts(a.parts), a.repeat)
+    run("big", make_big(a.mb), a.repeat)
+
+if __name__ == "__main__":
+    main()
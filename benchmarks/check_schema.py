@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+结构迁移与查询计划检查：
+  1. 按最早版本（没有 user_version、没有 content_hash/text_len 列、没有全文索引）的表结构建一个旧库，
+     写入几条文本/文件/收藏和一条大文本，用 StorageEngine 打开让它逐步迁移到 SCHEMA_VERSION
+  2. 检查版本号、补出的列与索引、数据是否完整（按全文计算的哈希与去重、大文本外置、全文检索、收藏）
+  3. 再打开一次确认迁移幂等，并对 hot_queries() 做 EXPLAIN QUERY PLAN 检查
+任何一项失败打印原因并以退出码 1 结束。
+
+    python -m benchmarks.check_schema [--db PATH]   # 给 --db 则只对已有库做查询计划检查
+"""
+from __future__ import annotations
+import argparse, json, os, sqlite3, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core import storage
+
+# 最早发布版本的表结构（user_version=0）
+LEGACY_SCHEMA = '''
+CREATE TABLE sessions(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  started_at INTEGER NOT NULL,
+  closed_at INTEGER
+);
+CREATE TABLE items(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  session_id INTEGER,
+  type TEXT NOT NULL,
+  text TEXT,
+  image_path TEXT,
+  paths_json TEXT,
+  count INTEGER DEFAULT 1,
+  status TEXT NOT NULL,
+  pinned INTEGER DEFAULT 0,
+  edited INTEGER DEFAULT 0,
+  note TEXT,
+  created_at INTEGER NOT NULL,
+  last_used_at INTEGER,
+  FOREIGN KEY(session_id) REFERENCES sessions(id) ON DELETE SET NULL
+);
+CREATE TABLE collections(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE collection_map(
+  collection_id INTEGER NOT NULL,
+  item_id INTEGER NOT NULL,
+  PRIMARY KEY(collection_id, item_id),
+  FOREIGN KEY(collection_id) REFERENCES collections(id) ON DELETE CASCADE,
+  FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE CASCADE
+);
+'''
+
+INDEXES = ("idx_items_hash", "idx_items_status", "idx_items_session", "idx_items_type", "idx_collection_map_item")
+
+def build_legacy(path: str, big: str):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    now = int(time.time())
+    with conn:
+        conn.execute("INSERT INTO sessions(started_at) VALUES (?)", (now,))
+        conn.execute("INSERT INTO collections(name) VALUES ('favorites')")
+        rows = [("text", "第一条 alpha", None), ("text", "second bravo", None),
+                ("files", None, json.dumps(["/tmp/a.txt", "/tmp/b.txt"])), ("text", big, None)]
+        for kind, text, paths in rows:
+            conn.execute("INSERT INTO items(session_id, type, text, paths_json, status, created_at) VALUES (1,?,?,?,'active',?)",
+                         (kind, text, paths, now))
+        conn.execute("INSERT INTO collection_map(collection_id, item_id) VALUES (1, 2)")
+    conn.close()
+
+def check_upgrade(path: str) -> list[str]:
+    big = "大文本 charlie " * 10000
+    build_legacy(path, big)
+    errors = []
+    eng = storage.StorageEngine(path)
+    conn = eng._conn
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != storage.SCHEMA_VERSION:
+        errors.append(f"user_version={version}，应为 {storage.SCHEMA_VERSION}")
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(items)")}
+    errors += [f"缺少列 items.{c}" for c in ("content_hash", "text_len") if c not in cols]
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+    errors += [f"缺少 {n}" for n in (*INDEXES, "items_fts", "fts_gc", "blobs", "text_blobs") if n not in names]
+    if conn.execute("SELECT COUNT(*) FROM items WHERE content_hash IS NULL").fetchone()[0]:
+        errors.append("content_hash 没有补齐")
+    if eng.get_text(4) != big or conn.execute("SELECT text_len FROM items WHERE id=4").fetchone()[0] != len(big):
+        errors.append("大文本没有外置或内容不一致")
+    # 补算的哈希必须按全文计算（大文本移出行后行内只剩预览），否则重新捕获同一内容不会按 count 策略去重
+    for item_id, h in conn.execute("SELECT id, content_hash FROM items WHERE type='text'").fetchall():
+        if h != storage.text_hash(eng.get_text(item_id)):
+            errors.append(f"条目 {item_id} 的 content_hash 不是全文的哈希")
+    if eng.add_text_item(big, "count") != 4:
+        errors.append("重新捕获迁移前的大文本没有合并到原条目")
+    if [r[0] for r in eng.search("bravo")] != [2] or [r[0] for r in eng.search("b.txt")] != [3]:
+        errors.append("全文索引没有覆盖旧数据")
+    if eng.favorite_ids() != {2}:
+        errors.append("收藏丢失")
+    errors += eng.check_query_plans()
+    eng.close()
+    # 第二次打开：版本已是最新，不应再改动任何东西
+    before = sqlite3.connect(path).execute("PRAGMA schema_version").fetchone()[0]
+    storage.StorageEngine(path).close()
+    if sqlite3.connect(path).execute("PRAGMA schema_version").fetchone()[0] != before:
+        errors.append("重复打开时又改了表结构（迁移不幂等）")
+    return errors
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", help="只检查这个库的查询计划（会先把它迁移到最新版本）")
+    args = ap.parse_args(argv)
+    if args.db:
+        eng = storage.StorageEngine(args.db)
+        errors = eng.check_query_plans()
+        eng.close()
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            errors = check_upgrade(os.path.join(tmp, "legacy.db"))
+    for e in errors:
+        print("FAIL", e)
+    print("ok" if not errors else f"{len(errors)} 项失败")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
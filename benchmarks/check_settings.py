@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+设置存储检查：SettingsStore 用自定义路径时读写都落在这个文件上，不碰默认的 settings.json。
+  1. 自定义路径不存在：写出默认设置到该路径
+  2. update + flush 后用新的 SettingsStore 从同一路径读回，值一致
+  3. 默认设置文件在整个过程中没有被创建或改动
+任何一项失败打印原因并以退出码 1 结束。
+
+    python -m benchmarks.check_settings
+"""
+from __future__ import annotations
+import os, sys, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def check_roundtrip(tmp: str) -> list[str]:
+    # 默认数据目录也指到临时目录，便于确认它没被写
+    os.environ["XDG_DATA_HOME"] = os.path.join(tmp, "xdg")
+    os.environ["HOME"] = os.path.join(tmp, "home")
+    from PyQt6.QtCore import QCoreApplication
+    from core import settings as settings_mod
+    _app = QCoreApplication.instance() or QCoreApplication([])   # SettingsStore 的定时器需要
+    default = settings_mod.settings_path()
+    before = os.path.exists(default) and os.stat(default).st_mtime_ns
+    errors = []
+    path = os.path.join(tmp, "portable", "settings.json")
+    os.makedirs(os.path.dirname(path))
+    store = settings_mod.SettingsStore(path)
+    if not os.path.exists(path):
+        errors.append("自定义路径上没有写出默认设置")
+    store.update(history_default_count=123, large_text_kb=8)
+    store.flush()
+    again = settings_mod.SettingsStore(path).settings
+    if (again.history_default_count, again.large_text_kb) != (123, 8):
+        errors.append(f"从自定义路径读回的值不一致：{again.history_default_count}, {again.large_text_kb}")
+    if (os.path.exists(default) and os.stat(default).st_mtime_ns) != before:
+        errors.append(f"默认设置文件被改动：{default}")
+    return errors
+
+def main(argv=None) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        errors = check_roundtrip(tmp)
+    for e in errors:
+        print("FAIL", e)
+    print("ok" if not errors else f"{len(errors)} 项失败")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+无界面基准环境：offscreen Qt 平台、临时 HOME/数据目录，并用桩模块替换 pyautogui/keyboard
+（不真正发送按键、不注册全局热键）。必须在导入 core/ui 之前调用 setup()。
+"""
+from __future__ import annotations
+import os, sys, tempfile, time, types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class _Recorder:
+    """记录桩函数被调用的时刻，供粘贴基准统计按键延迟。"""
+    def __init__(self):
+        self.calls: list[float] = []
+
+    def __call__(self, *a, **k):
+        self.calls.append(time.perf_counter())
+
+hotkey_calls = _Recorder()
+
+def _stub_modules():
+    pg = types.ModuleType("pyautogui")
+    pg.hotkey = hotkey_calls
+    pg.FAILSAFE = False
+    kb = types.ModuleType("keyboard")
+    kb.add_hotkey = lambda *a, **k: None
+    kb.remove_hotkey = lambda *a, **k: None
+    kb.unhook_all_hotkeys = lambda: None
+    sys.modules["pyautogui"] = pg
+    sys.modules["keyboard"] = kb
+
+_app = None
+
+def setup():
+    """准备环境并返回 QApplication（重复调用返回同一个）。"""
+    global _app
+    if _app is not None:
+        return _app
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    home = tempfile.mkdtemp(prefix="cs-bench-")
+    os.environ["HOME"] = home
+    os.environ["XDG_DATA_HOME"] = os.path.join(home, "data")
+    _stub_modules()
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from PyQt6.QtWidgets import QApplication
+    _app = QApplication.instance() or QApplication([sys.argv[0]])
+    return _app
+
+def wait_until(pred, timeout_s: float = 10.0) -> bool:
+    """驱动事件循环直到 pred() 为真或超时。"""
+    from PyQt6.QtCore import QEventLoop
+    deadline = time.perf_counter() + timeout_s
+    while not pred():
+        if time.perf_counter() > deadline:
+            return False
+        _app.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 5)
+    return True
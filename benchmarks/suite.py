@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+无界面基准套件：存储、捕获、列表渲染、粘贴四条路径，结果写成 JSON，可与基线对比。
+
+    python -m benchmarks.suite run [--sizes 1000,100000,1000000] [--out bench.json]
+                                   [--baseline base.json] [--threshold 0.15]
+    python -m benchmarks.suite compare base.json bench.json [--threshold 0.15]
+
+指标：
+  storage.insert@N   ops/s  N 行批量写入（每 1000 条一个事务）
+  storage.dedup@N    ops/s  对已有文本按 count 策略重复写入（每条单独事务）
+  storage.list@N     ms     最新一页（200 行）
+  storage.list_deep@N ms    中部游标翻页
+  storage.delete@N   ops/s  按 id 删除（每 100 条一次）
+  capture.<kind>     ms     setMimeData → item_captured（text/image/files）
+  ui.reload_queue@N  ms     MainWindow.reload_queue + 渲染一帧
+  paste.<pacing>     ms     提交 → paste_done 的单任务延迟（min_interval_ms=0）
+compare 对每个指标按 better 方向计算变化，劣化超过 threshold 即标记并以退出码 1 结束。
+"""
+from __future__ import annotations
+import argparse, json, os, platform, random, statistics, sys, tempfile, time
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import headless
+
+def _metric(value: float, unit: str, better: str, **extra) -> dict:
+    return {"value": round(value, 4), "unit": unit, "better": better, **extra}
+
+def _lat(samples: list[float]) -> dict:
+    xs = sorted(samples)
+    return _metric(statistics.median(xs), "ms", "lower",
+                   p95=round(xs[min(len(xs) - 1, int(0.95 * (len(xs) - 1) + 0.5))], 4), n=len(xs))
+
+def _fill(eng, n: int, batch: int = 1000):
+    for start in range(0, n, batch):
+        with eng.transaction():
+            for i in range(start, min(n, start + batch)):
+                eng.add_text_item(f"bench item {i} " + "lorem ipsum " * (i % 7), "separate")
+
+# ---------- storage ----------
+def bench_storage(sizes: list[int], out: dict):
+    from core import storage
+    rnd = random.Random(3)
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            eng = storage.StorageEngine(os.path.join(tmp, "bench.db"))
+            t = time.perf_counter(); _fill(eng, n)
+            out[f"storage.insert@{n}"] = _metric(n / (time.perf_counter() - t), "ops/s", "higher")
+
+            k = min(1000, n)
+            picks = [rnd.randrange(n) for _ in range(k)]
+            t = time.perf_counter()
+            for i in picks:
+                eng.add_text_item(f"bench item {i} " + "lorem ipsum " * (i % 7), "count")
+            out[f"storage.dedup@{n}"] = _metric(k / (time.perf_counter() - t), "ops/s", "higher")
+
+            lat = []
+            for _ in range(50):
+                t = time.perf_counter(); eng.fetch_page(None, None, 200)
+                lat.append((time.perf_counter() - t) * 1000)
+            out[f"storage.list@{n}"] = _lat(lat)
+            lat = []
+            for _ in range(50):
+                t = time.perf_counter(); eng.fetch_page(rnd.randrange(n // 4, n // 2 + 2), None, 200)
+                lat.append((time.perf_counter() - t) * 1000)
+            out[f"storage.list_deep@{n}"] = _lat(lat)
+
+            ids = rnd.sample(range(1, n + 1), k)
+            t = time.perf_counter()
+            for j in range(0, k, 100):
+                eng.delete_items(ids[j:j + 100])
+            out[f"storage.delete@{n}"] = _metric(k / (time.perf_counter() - t), "ops/s", "higher")
+            eng.close()
+            print(f"  storage @{n} done", flush=True)
+
+# ---------- capture ----------
+def bench_capture(out: dict, reps: int = 50):
+    from PyQt6.QtCore import QMimeData, QUrl
+    from PyQt6.QtGui import QGuiApplication, QImage, QColor
+    from core import storage, settings as settings_mod
+    from core.change_feed import ChangeFeed
+    from core.queue_manager import QueueManager
+    from core.clipboard_watcher import ClipboardWatcher
+    with tempfile.TemporaryDirectory() as tmp:
+        s = settings_mod.Settings(duplicate_policy="separate")
+        eng = storage.StorageEngine(os.path.join(tmp, "bench.db"))
+        feed = ChangeFeed()
+        qm = QueueManager(s, eng, feed)
+        watcher = ClipboardWatcher(s, qm)
+        got: list[int] = []
+        watcher.item_captured.connect(got.append)
+        cb = QGuiApplication.clipboard()
+
+        def mime(kind: str, i: int) -> QMimeData:
+            md = QMimeData()
+            if kind == "text":
+                md.setText(f"capture bench {i}")
+            elif kind == "image":
+                img = QImage(256, 256, QImage.Format.Format_RGB32)
+                img.fill(QColor(i % 256, (i * 7) % 256, (i * 13) % 256))
+                md.setImageData(img)
+            else:
+                md.setUrls([QUrl.fromLocalFile(os.path.join(tmp, f"file{i}_{j}.txt")) for j in range(3)])
+            return md
+
+        for kind in ("text", "image", "files"):
+            lat = []
+            for i in range(reps):
+                before = len(got)
+                t = time.perf_counter()
+                cb.setMimeData(mime(kind, i))
+                if not headless.wait_until(lambda: len(got) > before):
+                    raise RuntimeError(f"capture {kind} timed out")
+                lat.append((time.perf_counter() - t) * 1000)
+            out[f"capture.{kind}"] = _lat(lat)
+        watcher.close()
+        eng.close()
+    print("  capture done", flush=True)
+
+# ---------- reload_queue ----------
+def bench_render(rows: int, out: dict, reps: int = 20):
+    from core import storage
+    eng = storage.StorageEngine(storage.db_path())
+    _fill(eng, rows)
+    eng.close()
+    from ui.main_window import MainWindow
+    w = MainWindow()
+    w.resize(480, 720); w.show()
+    headless.wait_until(lambda: False, 0.2)
+    lat = []
+    for _ in range(reps):
+        t = time.perf_counter()
+        w.reload_queue()
+        w.list_queue.viewport().grab()   # 强制绘制可见行
+        lat.append((time.perf_counter() - t) * 1000)
+    out[f"ui.reload_queue@{rows}"] = _lat(lat)
+    w.close()
+    headless.wait_until(lambda: False, 0.1)
+    print("  render done", flush=True)
+
+# ---------- paste ----------
+def bench_paste(out: dict, reps: int = 100):
+    from core import settings as settings_mod
+    from core.paste_engine import PasteEngine
+    for pacing in ("fixed", "adaptive"):
+        s = settings_mod.Settings(min_interval_ms=0, paste_pacing=pacing, paste_interval_min_ms=0)
+        pe = PasteEngine(s)
+        done: list[float] = []
+        pe.paste_done.connect(lambda _id: done.append(time.perf_counter()))
+        lat = []
+        for i in range(reps):
+            t = time.perf_counter()
+            pe.paste_text(i, f"paste bench {i}")
+            if not headless.wait_until(lambda: len(done) > i):
+                raise RuntimeError("paste timed out")
+            lat.append((done[i] - t) * 1000)
+        out[f"paste.{pacing}"] = _lat(lat)
+        pe.shutdown()
+    print("  paste done", flush=True)
+
+# ---------- run / compare ----------
+def run(args) -> dict:
+    headless.setup()
+    sizes = [int(x) for x in args.sizes.split(",") if x]
+    metrics: dict = {}
+    print("storage ..."); bench_storage(sizes, metrics)
+    print("capture ..."); bench_capture(metrics)
+    print("render ..."); bench_render(args.render_rows, metrics)
+    print("paste ..."); bench_paste(metrics)
+    from PyQt6.QtCore import QT_VERSION_STR
+    import sqlite3
+    return {
+        "meta": {"created_at": int(time.time()), "python": platform.python_version(),
+                 "platform": platform.platform(), "qt": QT_VERSION_STR, "sqlite": sqlite3.sqlite_version},
+        "metrics": metrics,
+    }
+
+def compare(base: dict, cur: dict, threshold: float) -> list[str]:
+    """打印对比表，返回劣化超过阈值的指标名。"""
+    bad = []
+    print(f"{'metric':<28}{'baseline':>12}{'current':>12}{'change':>9}  unit")
+    bm, cm = base.get("metrics", {}), cur.get("metrics", {})
+    for name in sorted(set(bm) | set(cm)):
+        if name not in bm or name not in cm:
+            print(f"{name:<28}{'-' if name not in bm else bm[name]['value']:>12}{'-' if name not in cm else cm[name]['value']:>12}")
+            continue
+        b, c = bm[name], cm[name]
+        if not b["value"]:
+            continue
+        change = (c["value"] - b["value"]) / b["value"]
+        worse = -change if b["better"] == "higher" else change
+        flag = ""
+        if worse > threshold:
+            bad.append(name); flag = "  REGRESSION"
+        print(f"{name:<28}{b['value']:>12.2f}{c['value']:>12.2f}{change:>+9.1%}  {b['unit']}{flag}")
+    return bad
+
+def _load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="benchmarks.suite")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run")
+    r.add_argument("--sizes", default="1000,100000,1000000")
+    r.add_argument("--render-rows", type=int, default=100000)
+    r.add_argument("--out", default="bench.json")
+    r.add_argument("--baseline")
+    r.add_argument("--threshold", type=float, default=0.15)
+    c = sub.add_parser("compare")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--threshold", type=float, default=0.15)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "run":
+        result = run(args)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"wrote {args.out}")
+        if not args.baseline:
+            return 0
+        base, cur = _load(args.baseline), result
+    else:
+        base, cur = _load(args.baseline), _load(args.current)
+    bad = compare(base, cur, args.threshold)
+    if bad:
+        print(f"{len(bad)} regression(s) over {args.threshold:.0%}: {', '.join(bad)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+命令行客户端：通过本地套接字控制正在运行的 Clipboard Sequencer（协议见 core/ipc.py）。
+只依赖标准库和 core.ipc，不加载 PyQt6/pyautogui/keyboard，启动只要几十毫秒。
+
+  python cli.py enqueue "第一段" "第二段"
+  some-cmd | python cli.py enqueue -          # 每行一条
+  find . -print0 | python cli.py enqueue -0   # NUL 分隔（条目里可以有换行）
+  python cli.py enqueue --files a.png b.txt   # 一条文件条目
+  python cli.py list --limit 20
+  python cli.py search 关键词
+  python cli.py paste-next -n 3
+  python cli.py paste-all
+"""
+from __future__ import annotations
+import argparse, json, sys
+from core.ipc import Client, IpcError
+
+def _read_stdin(nul: bool) -> list[str]:
+    data = sys.stdin.read()
+    parts = data.split("\0") if nul else data.splitlines()
+    return [p for p in parts if p.strip()]
+
+def _print_rows(rows: list[dict], as_json: bool):
+    if as_json:
+        for r in rows:
+            print(json.dumps(r, ensure_ascii=False))
+        return
+    for r in rows:
+        if r["type"] == "text":
+            body = (r["text"] or "").split("\n", 1)[0][:80]
+        elif r["type"] == "image":
+            body = r["image_path"] or ""
+        else:
+            body = " ".join(r["paths"] or [])
+        print(f"{r['id']}\t{r['type']}\t{r['status']}\t{body}")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="cli.py", description="Clipboard Sequencer 命令行客户端")
+    ap.add_argument("--socket", help="套接字路径（默认数据目录下的 ipc.sock）")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("ping")
+    p = sub.add_parser("enqueue", help="批量加入队列")
+    p.add_argument("texts", nargs="*", help="文本条目；单独一个 - 表示从标准输入按行读取")
+    p.add_argument("-0", "--null", action="store_true", help="标准输入按 NUL 分隔")
+    p.add_argument("--files", nargs="+", metavar="PATH", help="作为一条文件条目加入")
+    p.add_argument("--batch", type=int, default=10000, help="每个请求（一个事务）最多的条数")
+    p = sub.add_parser("list", help="最新的条目")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--before", type=int, dest="before_id")
+    p.add_argument("--type", choices=("text", "image", "files"))
+    p.add_argument("--status", choices=("active", "used"))
+    p.add_argument("--favorites", action="store_true")
+    p.add_argument("--json", action="store_true", help="每行输出一个 JSON 对象")
+    p = sub.add_parser("search", help="全文搜索")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--offset", type=int, default=0)
+    p.add_argument("--type", choices=("text", "image", "files"))
+    p.add_argument("--json", action="store_true")
+    p = sub.add_parser("paste-next", help="按顺序粘贴当前选中起的 n 条")
+    p.add_argument("-n", type=int, default=1)
+    sub.add_parser("paste-all", help="粘贴当前列表的全部条目")
+    a = ap.parse_args(argv)
+
+    try:
+        with Client(a.socket) as c:
+            if a.cmd == "ping":
+                print(c.call("ping")["pid"])
+            elif a.cmd == "enqueue":
+                if a.files:
+                    items = [{"paths": a.files}]
+                elif a.texts in ([], ["-"]) or a.null:
+                    items = _read_stdin(a.null)
+                else:
+                    items = a.texts
+                added = 0
+                for i in range(0, len(items), max(1, a.batch)):
+                    ids = c.call("enqueue", items=items[i:i + max(1, a.batch)])["ids"]
+                    added += sum(1 for x in ids if x != -1)
+                print(f"{added}/{len(items)}", file=sys.stderr)
+            elif a.cmd == "list":
+                _print_rows(c.call("list", limit=a.limit, before_id=a.before_id, type=a.type,
+                                   status=a.status, favorites=a.favorites), a.json)
+            elif a.cmd == "search":
+                _print_rows(c.call("search", query=a.query, limit=a.limit, offset=a.offset, type=a.type), a.json)
+            elif a.cmd == "paste-next":
+                c.call("paste_next", n=a.n)
+            elif a.cmd == "paste-all":
+                c.call("paste_all")
+    except IpcError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
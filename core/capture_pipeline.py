@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+from dataclasses import dataclass
+import os, queue, sqlite3, time
+from concurrent.futures import Future
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from PyQt6.QtGui import QImage
+from . import metrics, storage
+from .image_store import ImageStore, StoredImage
+from .queue_manager import QueueManager
+
+@dataclass(frozen=True)
+class CaptureRecord:
+    """GUI 线程从剪贴板 mime 数据拍下的不可变快照。"""
+    kind: str                       # text|image|files
+    text: str = ""
+    paths: tuple[str, ...] = ()
+    image: QImage | None = None     # QImage 隐式共享，拷贝代价很小
+
+_STOP = object()
+
+def _transient(e: Exception) -> bool:
+    """库被锁/忙、磁盘 I/O 或空间不足：稍后重试可能成功。"""
+    return isinstance(e, sqlite3.OperationalError) and any(
+        s in str(e).lower() for s in ("locked", "busy", "disk i/o", "disk is full"))
+
+class _CaptureWriter(QThread):
+    """
+    写线程：持有自己的 StorageEngine（引擎是线程独占的），
+    把队列里攒下的记录合并成一个事务写入，再把分配到的 id 报回 GUI 线程。
+    队列元素为 (CaptureRecord, Future|None)：图片在提交时就已交给编码线程池。
+    写入失败时整批留在写线程里，先于队列里的新记录重试：
+      - 暂时性错误（库被锁/忙、磁盘 I/O）按指数退避重试，超过 RETRY_MAX 次才丢弃
+      - 其他错误改为逐条写入，只丢弃出错的那条
+    丢弃的条数经 lost 报给 CapturePipeline 计入 dropped。
+    """
+    written = pyqtSignal(list)      # [item_id, ...]，-1 表示该记录未入库（空文本/图片保存失败/写入失败）
+    failed = pyqtSignal(str)
+    lost = pyqtSignal(int)          # 写入失败最终丢弃的记录数
+
+    RETRY_MAX = 5
+    RETRY_BASE_S = 0.05             # 退避 0.05, 0.1, 0.2 … 秒，封顶 RETRY_MAX_S
+    RETRY_MAX_S = 2.0
+
+    def __init__(self, settings, db_path: str, q: queue.Queue, batch_max: int, images: ImageStore, feed=None,
+                 thumbs=None, parent=None):
+        super().__init__(parent)
+        self.feed = feed
+        self.thumbs = thumbs
+        self.settings = settings
+        self.db_path = db_path
+        self.q = q
+        self.batch_max = batch_max
+        self.images = images
+
+    def run(self):
+        engine = storage.StorageEngine(self.db_path)
+        qm = QueueManager(self.settings, engine, self.feed)
+        try:
+            stop = False
+            while not stop:
+                batch = [self.q.get()]
+                while len(batch) < self.batch_max:
+                    try:
+                        batch.append(self.q.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = any(r is _STOP for r in batch)
+                recs = [(r[0], self._prepare(r[1])) for r in batch if r is not _STOP]
+                if not recs:
+                    continue
+                metrics.set_gauge("capture.pending", self.q.qsize())
+                metrics.inc("capture.batches"); metrics.inc("capture.records", len(recs))
+                ids = self._commit(engine, qm, recs)
+                self._restore_missing(recs)
+                if self.thumbs is not None:
+                    for (rec, stored), item_id in zip(recs, ids):
+                        if stored and item_id != -1: self.thumbs.prefetch(stored.path, rec.image)
+                self.written.emit(ids)
+        finally:
+            engine.close()
+
+    def _commit(self, engine: storage.StorageEngine, qm: QueueManager, recs) -> list[int]:
+        attempt = 0
+        while True:
+            try:
+                with metrics.span("capture.write_batch"), engine.transaction():
+                    return [self._write(qm, rec, stored) for rec, stored in recs]
+            except Exception as e:
+                if _transient(e) and attempt < self.RETRY_MAX:
+                    metrics.inc("capture.retries")
+                    time.sleep(min(self.RETRY_MAX_S, self.RETRY_BASE_S * 2 ** attempt))
+                    attempt += 1
+                    continue
+                if len(recs) > 1 and not _transient(e):
+                    # 一条坏记录不连累整批
+                    return [self._commit(engine, qm, [r])[0] for r in recs]
+                metrics.inc("capture.write_failed", len(recs))
+                self.failed.emit(str(e))
+                self.lost.emit(len(recs))
+                return [-1] * len(recs)
+
+    def _prepare(self, fut: Future | None) -> StoredImage | None:
+        # 在事务外等待图片编码完成，避免长时间占用写锁
+        if fut is None:
+            return None
+        try:
+            return fut.result()
+        except Exception as e:
+            self.failed.emit(str(e))
+            return None
+
+    def _write(self, qm: QueueManager, rec: CaptureRecord, stored: StoredImage | None) -> int:
+        if rec.kind == "image":
+            return qm.add_image(stored.path, stored.hash) if stored else -1
+        if rec.kind == "files":
+            return qm.add_files(list(rec.paths))
+        return qm.add_text(rec.text)
+
+    def _restore_missing(self, recs):
+        # 复用的 blob 可能恰好在登记前被回收，登记后文件仍缺失就重新编码一次
+        for rec, stored in recs:
+            if stored and not os.path.exists(stored.path):
+                try: self.images.store(rec.image)
+                except Exception as e: self.failed.emit(str(e))
+
+class CapturePipeline(QObject):
+    """
+    写后合并（write-behind）捕获管线：
+      - GUI 线程只调用 submit() 把快照放进有界队列，不做任何 SQLite/编码工作
+      - 图片在 submit 时交给 ImageStore 线程池编码（按 settings.image_codec/image_quality），
+        入库后再交给 thumbs（ThumbnailCache）预生成缩略图
+      - 写线程按批（每批一个事务）落盘，通过 item_captured 报告分配到的 id
+      - 队列满时按 overflow 策略处理：
+          drop_oldest  丢弃最早一条尚未写入的记录，保留最新复制（默认）
+          drop_newest  丢弃这次的新记录
+          block        最多阻塞 block_timeout_ms，仍满则丢弃新记录（GUI 不会无限卡住）
+      - close() 保证队列中已接收的记录全部写完再返回
+    """
+    item_captured = pyqtSignal(int)
+    dropped = pyqtSignal(int)       # 累计丢弃条数
+    failed = pyqtSignal(str)
+
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+    def __init__(self, settings, db_path: str, max_pending: int = 256, batch_max: int = 64,
+                 overflow: str = "drop_oldest", block_timeout_ms: int = 50, feed=None, thumbs=None, parent=None):
+        super().__init__(parent)
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy: {overflow}")
+        self.overflow = overflow
+        self.block_timeout_ms = block_timeout_ms
+        self.dropped_count = 0
+        self._closed = False
+        self._q: queue.Queue = queue.Queue(maxsize=max_pending)
+        self.images = ImageStore(codec=settings.image_codec, quality=settings.image_quality)
+        self._writer = _CaptureWriter(settings, db_path, self._q, batch_max, self.images, feed, thumbs, self)
+        self._writer.written.connect(self._on_written)
+        self._writer.failed.connect(self.failed)
+        self._writer.lost.connect(self._drop)
+        self._writer.start()
+
+    def submit(self, rec: CaptureRecord) -> bool:
+        if self._closed:
+            return False
+        fut = self.images.submit(rec.image) if rec.kind == "image" else None
+        return self._enqueue((rec, fut))
+
+    def _enqueue(self, rec) -> bool:
+        try:
+            self._q.put_nowait(rec); return True
+        except queue.Full:
+            pass
+        if self.overflow == "block":
+            try:
+                self._q.put(rec, timeout=self.block_timeout_ms/1000.0); return True
+            except queue.Full:
+                pass
+        elif self.overflow == "drop_oldest":
+            try:
+                self._q.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                self._drop()
+            try:
+                self._q.put_nowait(rec); return True
+            except queue.Full:
+                pass
+        self._drop()
+        return False
+
+    def _drop(self, n: int = 1):
+        metrics.inc("capture.dropped", n)
+        self.dropped_count += n
+        self.dropped.emit(self.dropped_count)
+
+    def _on_written(self, ids: list):
+        for item_id in ids:
+            if item_id != -1:
+                self.item_captured.emit(item_id)
+
+    def close(self, timeout_ms: int = 5000) -> bool:
+        """停止接收新记录，等待写线程把剩余记录落盘；返回是否在超时内完成。"""
+        if self._closed:
+            return True
+        self._closed = True
+        self._q.put(_STOP)
+        ok = self._writer.wait(timeout_ms)
+        self.images.shutdown(wait=ok)
+        return ok
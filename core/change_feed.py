@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+from dataclasses import dataclass, field
+import threading
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+
+@dataclass
+class ChangeSet:
+    """一个事件循环周期内合并后的变更。"""
+    inserted: list[int] = field(default_factory=list)
+    updated: dict[int, set[str]] = field(default_factory=dict)
+    deleted: set[int] = field(default_factory=set)
+    favorites: dict[int, bool] = field(default_factory=dict)
+
+    def add(self, kind: str, item_id: int, arg=None):
+        if kind == "inserted":
+            self.inserted.append(item_id)
+        elif kind == "updated":
+            if item_id not in self.inserted:   # 新插入的行会整行读取，字段更新不必再记
+                self.updated.setdefault(item_id, set()).update(arg or ())
+        elif kind == "deleted":
+            self.deleted.add(item_id)
+            self.updated.pop(item_id, None)
+            if item_id in self.inserted:
+                self.inserted.remove(item_id)
+        elif kind == "favorite_changed":
+            self.favorites[item_id] = bool(arg)
+
+    def touched(self) -> list[int]:
+        """需要重新读取整行的 id（新插入 + 字段变化），已删除的除外。"""
+        ids = dict.fromkeys(self.inserted)
+        ids.update(dict.fromkeys(self.updated))
+        return [i for i in ids if i not in self.deleted]
+
+class ChangeFeed(QObject):
+    """
+    存储变更订阅：post() 可在任意线程调用（作为 StorageEngine 的 listener），
+    事件在 GUI 线程按事件循环周期合并，每个周期最多发出一次 changed(ChangeSet)。
+    连续捕获 50 条只会触发一次界面更新。
+    """
+    changed = pyqtSignal(object)    # ChangeSet
+    _wake = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._pending: ChangeSet | None = None
+        self._wake.connect(self._flush, Qt.ConnectionType.QueuedConnection)
+
+    def post(self, kind: str, item_id: int, arg=None):
+        with self._lock:
+            first = self._pending is None
+            if first:
+                self._pending = ChangeSet()
+            self._pending.add(kind, item_id, arg)
+        if first:
+            self._wake.emit()
+
+    def _flush(self):
+        with self._lock:
+            cs, self._pending = self._pending, None
+        if cs is not None:
+            self.changed.emit(cs)
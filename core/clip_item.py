@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+import json, sys
+
+class ClipItem:
+    """
+    列表里常驻的条目记录，由 QueueManager 从 storage.LIST_COLUMNS 查询的行构造。
+      - __slots__ 固定字段，没有每行一个 dict；只带列表需要的列（不含 session_id/edited/content_hash）
+      - preview 最多 storage.LIST_PREVIEW_CHARS 字，truncated 为真时全文由 full_text() 按需读取并缓存
+      - 文件列表保持 JSON 原文，第一次访问 paths 时才解码，之后复用
+      - type/status 这类取值很少的字符串驻留（intern），所有条目共用同一个对象
+    """
+    __slots__ = ("id", "type", "preview", "image_path", "count", "status", "pinned", "note",
+                 "created_at", "last_used_at", "text_len", "length", "_paths", "_full")
+
+    def __init__(self, id, type, preview, image_path, paths_json, count, status, pinned, note,
+                 created_at, last_used_at, text_len, length):
+        self.id = id
+        self.type = sys.intern(type)
+        self.preview = preview
+        self.image_path = image_path
+        self.count = count
+        self.status = sys.intern(status)
+        self.pinned = bool(pinned)
+        self.note = note
+        self.created_at = created_at
+        self.last_used_at = last_used_at
+        self.text_len = text_len   # 非空：大文本，全文压缩存于 text_blobs
+        self.length = length if length and length > len(preview or "") else None   # preview 不完整时为全文长度
+        self._paths = paths_json   # 解码前是 JSON 字符串，解码后是 tuple
+        self._full = None
+
+    @classmethod
+    def from_row(cls, row) -> "ClipItem":
+        return cls(*row)
+
+    @property
+    def truncated(self) -> bool:
+        """preview 只是全文的前缀。"""
+        return self.length is not None
+
+    @property
+    def paths(self) -> tuple[str, ...]:
+        p = self._paths
+        if p is None or isinstance(p, tuple):
+            return p or ()
+        try:
+            p = tuple(json.loads(p))
+        except ValueError:
+            p = ()
+        self._paths = p
+        return p
+
+    def full_text(self, load) -> str:
+        """全文；preview 不完整时调用 load(id) 读取一次并缓存（可在粘贴线程调用）。"""
+        if not self.truncated:
+            return self.preview or ""
+        if self._full is None:
+            self._full = load(self.id)
+        return self._full
+
+    def __repr__(self):
+        return f"ClipItem(id={self.id}, type={self.type!r})"
@@ -1,20 +1,49 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-from PyQt6.QtCore import QObject, pyqtSignal
+import time
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
 from PyQt6.QtGui import QGuiApplication
-from . import storage
-import os, uuid
+from . import metrics
+from .capture_pipeline import CapturePipeline, CaptureRecord
+from .paste_engine import TOKEN_MIME
+from .storage import text_hash, files_hash
+
+def _fingerprint(kind: str, text: str | None = None, paths=None) -> str | None:
+    # 与去重用的内容哈希一致；图片不算指纹（要重新编码整张图），只靠令牌识别
+    if kind == "text":
+        return text_hash(text or "")
+    if kind == "files":
+        return files_hash(list(paths or ()))
+    return None
 
 class ClipboardWatcher(QObject):
+    """
+    剪贴板监听：
+      - 很多程序一次复制会分几次发布格式，连发多个 dataChanged；这里去抖，
+        最后一个事件之后 DEBOUNCE_MS 内没有新事件才读取一次最终内容（持续触发时最多推迟 MAX_DELAY_MS）
+      - 粘贴引擎自己写入的内容不记录：写入前 expect() 登记令牌和内容指纹，
+        剪贴板带着同一令牌、或（令牌格式被平台丢掉时）内容指纹一致就跳过；指纹只用一次
+    """
     item_captured = pyqtSignal(int)
     status_changed = pyqtSignal(bool)
 
-    def __init__(self, settings, queue_manager, parent=None):
+    DEBOUNCE_MS = 50
+    MAX_DELAY_MS = 250
+
+    def __init__(self, settings, queue_manager, thumbs=None, parent=None):
         super().__init__(parent)
         self.settings = settings
         self.queue = queue_manager
         self.enabled = True
-        self._ignore_until = 0  # ms
+        self._expect: tuple[bytes, str | None] | None = None   # 令牌, 内容指纹
+        self._burst_at = 0.0   # 本轮去抖第一个事件的时刻
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.capture)
+        # 落盘交给写线程，GUI 线程只负责拍快照
+        self.pipeline = CapturePipeline(settings, queue_manager.db.path, feed=queue_manager.feed,
+                                        thumbs=thumbs, parent=self)
+        self.pipeline.item_captured.connect(self.item_captured)
         self.cb = QGuiApplication.clipboard()
         self.cb.dataChanged.connect(self.on_changed)
 
@@ -22,38 +51,71 @@ class ClipboardWatcher(QObject):
         self.enabled = b
         self.status_changed.emit(b)
 
-    def ignore_for(self, ms: int):
-        import time
-        self._ignore_until = int(time.time()*1000) + ms
+    def expect(self, token: bytes, kind: str, payload):
+        """粘贴引擎即将写入剪贴板：登记它的令牌和内容指纹。"""
+        self._expect = (token, _fingerprint(kind, payload if kind == "text" else None,
+                                            payload if kind == "files" else None))
+
+    def close(self):
+        if self._timer.isActive():
+            self._timer.stop()
+            self.capture()
+        self.enabled = False
+        self.pipeline.close()
 
     def on_changed(self):
-        import time
         if not self.enabled:
             return
-        if int(time.time()*1000) < self._ignore_until:
+        now = time.monotonic()
+        if self._timer.isActive():
+            metrics.inc("capture.coalesced")
+        else:
+            self._burst_at = now
+        left = self.MAX_DELAY_MS - (now - self._burst_at) * 1000
+        self._timer.start(int(max(0, min(self.DEBOUNCE_MS, left))))
+
+    def _is_self_write(self, mime) -> bool:
+        if self._expect is None:
+            return False
+        token, fp = self._expect
+        if mime.hasFormat(TOKEN_MIME):
+            if bytes(mime.data(TOKEN_MIME)) == token:
+                self._expect = (token, None)   # 平台保留了令牌，之后同内容的复制是用户自己的
+                return True
+        elif fp is not None:
+            if mime.hasUrls():
+                cur = _fingerprint("files", paths=[u.toLocalFile() for u in mime.urls() if u.isLocalFile()])
+            else:
+                cur = _fingerprint("text", mime.text()) if mime.hasText() else None
+            if cur == fp:
+                self._expect = None
+                return True
+        self._expect = None   # 剪贴板已经换成别的内容
+        return False
+
+    @metrics.timed("capture.on_changed")
+    def capture(self):
+        if not self.enabled:
             return
         mime = self.cb.mimeData()
         if mime is None:
             return
+        if self._is_self_write(mime):
+            metrics.inc("capture.suppressed")
+            return
         # files (urls)
         if mime.hasUrls():
             paths = [u.toLocalFile() for u in mime.urls() if u.isLocalFile()]
             if paths:
-                item_id = self.queue.add_files(paths)
-                self.item_captured.emit(item_id); return
+                metrics.inc("capture.files")
+                self.pipeline.submit(CaptureRecord("files", paths=tuple(paths))); return
         # image
         if mime.hasImage():
             image = self.cb.image()
             if not image.isNull():
-                img_dir = storage.cache_img_dir()
-                name = f"{uuid.uuid4().hex}.png"
-                path = os.path.join(img_dir, name)
-                image.save(path, "PNG")
-                item_id = self.queue.add_image(path)
-                self.item_captured.emit(item_id); return
+                metrics.inc("capture.image")
+                self.pipeline.submit(CaptureRecord("image", image=image)); return
         # text
         if mime.hasText():
-            text = mime.text()
-            item_id = self.queue.add_text(text)
-            if item_id != -1:
-                self.item_captured.emit(item_id)
+            metrics.inc("capture.text")
+            self.pipeline.submit(CaptureRecord("text", text=mime.text()))
@@ -1,13 +1,95 @@
 # -*- coding: utf-8 -*-
-import keyboard
-from PyQt6.QtCore import QObject
+from __future__ import annotations
+from dataclasses import dataclass
+import time
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+from . import metrics
+
+@dataclass
+class _Action:
+    callback: object
+    mode: str = "queue"          # queue|drop|collapse
+    busy: object = None          # () -> bool，动作是否仍在执行
+    min_interval_ms: int = 0
+    last_at: float = 0.0         # 钩子线程上次接受按键的时刻
+    pending: int = 0             # collapse：忙时累计的按键数
+    first_at: float = 0.0        # collapse：累计中第一次按键的时刻
 
 class Hotkeys(QObject):
+    """
+    全局热键分发：
+      keyboard 的回调运行在它自己的钩子线程里，那里只记下按键时刻并发出 queued 信号，
+      动作总是在 Hotkeys 所在的（GUI）线程执行，不会在钩子线程里碰控件和剪贴板。
+    每个动作按 mode 处理连按：
+      - queue：每次按键调用一次 callback()
+      - drop：busy() 为真时到达的按键丢弃
+      - collapse：busy() 为真时的按键累计起来，flush()（动作空闲时由调用方触发）
+        合并成一次 callback(n)；空闲时的按键立即 callback(1)
+    min_interval_ms 在钩子线程里就丢掉间隔过短的按键（按住不放时的自动重复）。
+    回调执行期间 last_trigger 是这次按键的 time.monotonic()，可用于统计端到端延迟。
+    keyboard 在第一次注册时才导入：它会启动系统级钩子，放到首屏之后。
+    """
+    _fired = pyqtSignal(str, float)   # seq, 按键时刻
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._actions: dict[str, _Action] = {}
+        self.last_trigger: float | None = None
+        self._fired.connect(self._dispatch, Qt.ConnectionType.QueuedConnection)
 
-    def register(self, seq: str, callback):
-        keyboard.add_hotkey(seq, callback, suppress=False)
+    def register(self, seq: str, callback, mode: str = "queue", busy=None, min_interval_ms: int = 0):
+        import keyboard
+        self._actions[seq] = _Action(callback, mode, busy, min_interval_ms)
+        keyboard.add_hotkey(seq, lambda: self._on_hook(seq), suppress=False)
 
     def unregister_all(self):
-        keyboard.unhook_all_hotkeys()
\ No newline at end of file
+        import keyboard
+        keyboard.unhook_all_hotkeys()
+        self._actions.clear()
+
+    # ---------- 钩子线程 ----------
+    def _on_hook(self, seq: str):
+        t = time.monotonic()
+        a = self._actions.get(seq)
+        if a is None:
+            return
+        if a.min_interval_ms and (t - a.last_at) * 1000 < a.min_interval_ms:
+            metrics.inc("hotkeys.throttled")
+            return
+        a.last_at = t
+        metrics.inc("hotkeys.presses")
+        self._fired.emit(seq, t)
+
+    # ---------- GUI 线程 ----------
+    def _dispatch(self, seq: str, t: float):
+        a = self._actions.get(seq)
+        if a is None:
+            return
+        metrics.observe("hotkeys.dispatch", (time.monotonic() - t) * 1000)
+        busy = a.busy is not None and a.busy()
+        if a.mode == "drop" and busy:
+            metrics.inc("hotkeys.dropped")
+        elif a.mode == "collapse":
+            if busy or a.pending:
+                if not a.pending:
+                    a.first_at = t
+                a.pending += 1
+                metrics.inc("hotkeys.coalesced")
+            else:
+                self._run(a, t, 1)
+        else:
+            self._run(a, t)
+
+    def flush(self):
+        """把 collapse 动作忙时累计的按键合并执行；动作完成（空闲）时调用。"""
+        for a in self._actions.values():
+            if a.pending and not (a.busy is not None and a.busy()):
+                n, a.pending = a.pending, 0
+                self._run(a, a.first_at, n)
+
+    def _run(self, a: _Action, t: float, n: int | None = None):
+        self.last_trigger = t
+        try:
+            a.callback() if n is None else a.callback(n)
+        finally:
+            self.last_trigger = None
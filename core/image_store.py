@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib, os, uuid
+from PyQt6.QtGui import QImage, QImageWriter
+from . import metrics, storage
+
+# codec -> (Qt 格式名, 扩展名)；quality 为 -1 时用 Qt 默认值。
+# PNG 的 quality 是压缩级别：0 最小最慢，100 最大最快；JPG/WEBP 为有损质量。
+CODECS = {
+    "png": ("PNG", "png"),
+    "webp": ("WEBP", "webp"),
+    "jpg": ("JPG", "jpg"),
+}
+
+@dataclass(frozen=True)
+class StoredImage:
+    hash: str
+    path: str
+    size: int
+
+def pixel_hash(image: QImage) -> str:
+    """按像素内容算哈希，和编码格式无关：同一张图换 codec 也能识别为重复。"""
+    h = hashlib.blake2b(digest_size=16, person=b"image")
+    h.update(f"{image.width()}x{image.height()}:{image.format().value}:{image.bytesPerLine()}".encode())
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    h.update(bits)
+    return h.hexdigest()
+
+class ImageStore:
+    """
+    内容寻址的图片缓存：
+      - 文件名为像素哈希加当前编码的扩展名，同一张图在同一编码下只编码、只存一次
+      - 编码在后台线程池完成，GUI 线程只提交 QImage
+      - 引用计数与回收由 storage 的 blobs 表按文件路径负责，切换编码后新旧文件各自登记、各自回收
+    """
+    def __init__(self, root: str | None = None, codec: str = "png", quality: int = -1, workers: int = 2):
+        self.root = root or storage.cache_img_dir()
+        self.set_codec(codec, quality)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-encode")
+
+    def set_codec(self, codec: str, quality: int = -1):
+        """切换之后提交的图片使用的编码；三元组整体替换，编码线程读到的总是一致的一组。"""
+        fmt, ext = CODECS.get(codec, CODECS["png"])
+        supported = {bytes(f).decode().lower() for f in QImageWriter.supportedImageFormats()}
+        if fmt.lower() not in supported:
+            fmt, ext = CODECS["png"]
+        self._codec = (fmt, ext, quality)
+
+    def path_for(self, digest: str, ext: str | None = None) -> str:
+        return os.path.join(self.root, f"{digest}.{ext or self._codec[1]}")
+
+    def submit(self, image: QImage) -> Future:
+        return self._pool.submit(self.store, image)
+
+    @metrics.timed("image.store")
+    def store(self, image: QImage) -> StoredImage:
+        fmt, ext, quality = self._codec
+        digest = pixel_hash(image)
+        path = self.path_for(digest, ext)
+        if not os.path.exists(path):
+            # 先写临时文件再原子改名，读者不会看到写了一半的图片
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                if not image.save(tmp, fmt, quality):
+                    raise OSError(f"encode {fmt} failed: {path}")
+                os.replace(tmp, path)
+            except BaseException:
+                try: os.remove(tmp)
+                except OSError: pass
+                raise
+        return StoredImage(digest, path, os.path.getsize(path))
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+本地控制接口（Unix 域套接字）的协议和客户端。
+
+每行一个 JSON：
+  请求 {"id": 1, "method": "enqueue", "params": {...}}
+  响应 {"id": 1, "result": ...} 或 {"id": 1, "error": "..."}
+方法：ping、enqueue(items)、list(limit, before_id, type, status, favorites)、
+      search(query, limit, offset, type, status, collection)、paste_next(n)、paste_all()
+enqueue 的 items 元素为文本字符串，或 {"text": ...} / {"paths": [...]}，整批一个事务写入。
+
+这个模块只用标准库（外加 appdirs），命令行客户端 cli.py 只导入它，不加载 PyQt6/pyautogui/keyboard。
+服务端见 core.ipc_server。
+"""
+from __future__ import annotations
+import json, os, socket
+from appdirs import user_data_dir
+
+APP_NAME = "clipboard_sequencer"
+APP_AUTHOR = "local"
+
+METHODS = ("ping", "enqueue", "list", "search", "paste_next", "paste_all")
+
+def socket_path() -> str:
+    return os.path.join(user_data_dir(APP_NAME, APP_AUTHOR), "ipc.sock")
+
+def encode(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+class IpcError(Exception):
+    """服务端返回 error，或者连不上正在运行的程序。"""
+
+class Client:
+    """同步客户端：一个连接上按顺序发请求、等响应。"""
+
+    def __init__(self, path: str | None = None, timeout: float = 60.0):
+        self.path = path or socket_path()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(self.path)
+        except OSError as e:
+            self._sock.close()
+            raise IpcError(f"无法连接 {self.path}（程序没有运行？）：{e}") from None
+        self._buf = b""
+        self._next_id = 0
+
+    def call(self, method: str, **params):
+        self._next_id += 1
+        self._sock.sendall(encode({"id": self._next_id, "method": method, "params": params}))
+        while b"\n" not in self._buf:
+            chunk = self._sock.recv(1 << 16)
+            if not chunk:
+                raise IpcError("连接已断开")
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\n", 1)
+        resp = json.loads(line)
+        if "error" in resp:
+            raise IpcError(resp["error"])
+        return resp.get("result")
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import itertools, json, os
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+from . import metrics, storage
+from .clip_item import ClipItem
+from .ipc import encode, socket_path
+from .queue_manager import QueueManager
+
+MAX_ROWS = 1000   # list/search 单次最多返回的条数
+
+def _row_dict(it: ClipItem) -> dict:
+    return {
+        "id": it.id, "type": it.type, "text": it.preview, "image_path": it.image_path,
+        "paths": list(it.paths) if it.type == "files" else None,
+        "count": it.count, "status": it.status, "pinned": it.pinned, "note": it.note,
+        "created_at": it.created_at, "last_used_at": it.last_used_at,
+        "text_len": it.length if it.truncated else None,   # 非空：text 只是预览前缀
+    }
+
+@dataclass
+class _Conn:
+    sock: QLocalSocket
+    buf: bytearray = field(default_factory=bytearray)
+    lines: deque = field(default_factory=deque)
+    busy: bool = False     # 有请求在处理中：同一连接上的请求按顺序逐个处理
+
+class IpcServer(QObject):
+    """
+    控制接口服务端（协议见 core.ipc）。QLocalServer 在 Unix 上就是域套接字，只允许当前用户连接。
+      - 读写数据库的方法（enqueue/list/search）在一个工作线程执行，它持有自己的 StorageEngine，
+        批量入队一个事务；写入照常经 feed 推送，界面增量刷新
+      - 粘贴类方法（paste_next/paste_all）在 GUI 线程调用 actions 里对应的回调
+    """
+    _reply = pyqtSignal(int, bytes)   # 连接编号, 响应行
+
+    DB_METHODS = ("enqueue", "list", "search")
+    PROBE_TIMEOUT_MS = 200
+
+    def __init__(self, settings, db_path: str, feed=None, actions: dict | None = None,
+                 path: str | None = None, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.db_path = db_path
+        self.feed = feed
+        self.actions = actions or {}
+        self.path = path or socket_path()
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self._server.newConnection.connect(self._on_connection)
+        self._conns: dict[int, _Conn] = {}
+        self._ids = itertools.count(1)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ipc")
+        self._qm: QueueManager | None = None   # 只在工作线程里创建和使用
+        self._reply.connect(self._send, Qt.ConnectionType.QueuedConnection)
+
+    def start(self) -> bool:
+        """开始监听；同一路径上已有实例在应答时返回 False，不抢占它的套接字。"""
+        if self._server.isListening():
+            return True
+        if self._answering():
+            return False
+        QLocalServer.removeServer(self.path)   # 没人应答：上次异常退出留下的套接字文件
+        return self._server.listen(self.path)
+
+    def _answering(self) -> bool:
+        probe = QLocalSocket()
+        probe.connectToServer(self.path)
+        ok = probe.waitForConnected(self.PROBE_TIMEOUT_MS)
+        probe.abort()
+        return ok
+
+    def stop(self):
+        self._server.close()
+        for c in list(self._conns.values()):
+            c.sock.abort()
+        self._conns.clear()
+
+    def shutdown(self):
+        self.stop()
+        self._pool.submit(self._close_engine)
+        self._pool.shutdown(wait=True)
+
+    # ---------- GUI 线程 ----------
+    def _on_connection(self):
+        while self._server.hasPendingConnections():
+            sock = self._server.nextPendingConnection()
+            cid = next(self._ids)
+            self._conns[cid] = _Conn(sock)
+            sock.readyRead.connect(lambda cid=cid: self._on_ready(cid))
+            sock.disconnected.connect(lambda cid=cid: self._drop(cid))
+
+    def _drop(self, cid: int):
+        c = self._conns.pop(cid, None)
+        if c is not None:
+            c.sock.deleteLater()
+
+    def _on_ready(self, cid: int):
+        c = self._conns.get(cid)
+        if c is None:
+            return
+        c.buf += bytes(c.sock.readAll())
+        while (i := c.buf.find(b"\n")) >= 0:
+            c.lines.append(bytes(c.buf[:i]))
+            del c.buf[:i + 1]
+        self._next(cid)
+
+    def _next(self, cid: int):
+        c = self._conns.get(cid)
+        while c is not None and not c.busy and c.lines:
+            line = c.lines.popleft()
+            try:
+                req = json.loads(line)
+                rid, method, params = req.get("id"), req.get("method"), req.get("params") or {}
+            except (ValueError, AttributeError):
+                self._send(cid, encode({"id": None, "error": "请求不是合法的 JSON 对象"}), advance=False)
+                continue
+            metrics.inc("ipc.requests")
+            if method in self.DB_METHODS:
+                c.busy = True
+                self._pool.submit(self._run_db, cid, rid, method, params)
+            elif method == "ping":
+                self._send(cid, encode({"id": rid, "result": {"pid": os.getpid()}}), advance=False)
+            elif method in self.actions:
+                try:
+                    body = {"id": rid, "result": self.actions[method](**params)}
+                except Exception as e:
+                    body = {"id": rid, "error": f"{type(e).__name__}: {e}"}
+                self._send(cid, encode(body), advance=False)
+            else:
+                self._send(cid, encode({"id": rid, "error": f"未知方法：{method}"}), advance=False)
+
+    def _send(self, cid: int, data: bytes, advance: bool = True):
+        c = self._conns.get(cid)
+        if c is None:
+            return
+        c.sock.write(data)
+        c.sock.flush()
+        if advance:
+            c.busy = False
+            self._next(cid)
+
+    # ---------- 工作线程 ----------
+    def _run_db(self, cid: int, rid, method: str, params: dict):
+        try:
+            if self._qm is None:
+                self._qm = QueueManager(self.settings, storage.StorageEngine(self.db_path), self.feed)
+            with metrics.span(f"ipc.{method}"):
+                body = {"id": rid, "result": getattr(self, f"_do_{method}")(self._qm, **params)}
+        except Exception as e:
+            metrics.inc("ipc.errors")
+            body = {"id": rid, "error": f"{type(e).__name__}: {e}"}
+        self._reply.emit(cid, encode(body))
+
+    def _close_engine(self):
+        if self._qm is not None:
+            self._qm.db.close()
+            self._qm = None
+
+    @staticmethod
+    def _do_enqueue(qm: QueueManager, items: list) -> dict:
+        ids = qm.add_many(items)
+        metrics.inc("ipc.enqueued", len(ids))
+        return {"ids": ids}
+
+    @staticmethod
+    def _do_list(qm: QueueManager, limit: int = 50, before_id: int | None = None, type: str | None = None,
+                 status: str | None = None, favorites: bool = False) -> list[dict]:
+        filters = {"type": type, "status": status, "favorites": favorites}
+        return [_row_dict(r) for r in qm.fetch_page(before_id, None, min(int(limit), MAX_ROWS), filters)]
+
+    @staticmethod
+    def _do_search(qm: QueueManager, query: str, limit: int = 50, offset: int = 0, type: str | None = None,
+                   status: str | None = None, collection: str | None = None) -> list[dict]:
+        return [_row_dict(r) for r in qm.search(query, type, status, collection, min(int(limit), MAX_ROWS), int(offset))]
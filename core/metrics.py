@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+轻量指标：计数器、直方图（耗时分位数，单位毫秒）、仪表值。
+
+关闭时（默认）timed()/span() 只多一次属性判断，不取时间、不加锁；
+打开后直方图保留最近 WINDOW 个样本用于 p50/p95/p99，count/sum 为累计值。
+所有方法可在任意线程调用。
+"""
+from __future__ import annotations
+import functools, json, os, re, threading, time
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        with self._lock:
+            self.value += n
+
+    def snapshot(self) -> dict:
+        return {"type": self.kind, "value": self.value}
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, v: float):
+        self.value = v
+
+    def snapshot(self) -> dict:
+        return {"type": self.kind, "value": self.value}
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, window: int = WINDOW):
+        self._lock = threading.Lock()
+        self._recent: deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, v: float):
+        with self._lock:
+            self._recent.append(v)
+            self.count += 1
+            self.sum += v
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            xs = sorted(self._recent)
+            count, total = self.count, self.sum
+        out = {"type": self.kind, "count": count, "sum": round(total, 3)}
+        for q in QUANTILES:
+            out[f"p{int(q * 100)}"] = round(xs[min(len(xs) - 1, int(q * len(xs)))], 3) if xs else 0.0
+        return out
+
+class Registry:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def _get(self, name: str, cls):
+        m = self._metrics.get(name)
+        if m is None:
+            with self._lock:
+                m = self._metrics.setdefault(name, cls())
+        return m
+
+    def counter(self, name: str) -> Counter:
+        return self._get(name, Counter)
+
+    def gauge(self, name: str) -> Gauge:
+        return self._get(name, Gauge)
+
+    def histogram(self, name: str) -> Histogram:
+        return self._get(name, Histogram)
+
+    # ---------- 记录 ----------
+    def inc(self, name: str, n: int = 1):
+        if self.enabled:
+            self.counter(name).inc(n)
+
+    def set(self, name: str, v: float):
+        if self.enabled:
+            self.gauge(name).set(v)
+
+    def observe(self, name: str, ms: float):
+        if self.enabled:
+            self.histogram(name).observe(ms)
+
+    @contextmanager
+    def span(self, name: str):
+        """记录 with 块耗时（毫秒）到直方图 name。"""
+        if not self.enabled:
+            yield; return
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name).observe((time.perf_counter() - t) * 1000)
+
+    def timed(self, name: str):
+        """装饰器：记录函数每次调用的耗时（毫秒）。"""
+        def deco(fn):
+            @functools.wraps(fn)
+            def wrapper(*a, **k):
+                if not self.enabled:
+                    return fn(*a, **k)
+                t = time.perf_counter()
+                try:
+                    return fn(*a, **k)
+                finally:
+                    self.histogram(name).observe((time.perf_counter() - t) * 1000)
+            return wrapper
+        return deco
+
+    # ---------- 导出 ----------
+    def reset(self):
+        with self._lock:
+            self._metrics = {}
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            items = sorted(self._metrics.items())
+        return {name: m.snapshot() for name, m in items}
+
+    def to_prometheus(self, prefix: str = "clipboard_sequencer") -> str:
+        lines = []
+        for name, s in self.snapshot().items():
+            n = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+            if s["type"] == "histogram":
+                n += "_ms"
+                lines.append(f"# TYPE {n} summary")
+                for q in QUANTILES:
+                    lines.append(f'{n}{{quantile="{q}"}} {s[f"p{int(q * 100)}"]}')
+                lines.append(f"{n}_sum {s['sum']}")
+                lines.append(f"{n}_count {s['count']}")
+            else:
+                if s["type"] == "counter":
+                    n += "_total"
+                lines.append(f"# TYPE {n} {s['type']}")
+                lines.append(f"{n} {s['value']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory: str) -> tuple[str, str]:
+        """把当前快照写成 metrics.json 和 metrics.prom（先写临时文件再替换）。"""
+        paths = (os.path.join(directory, "metrics.json"), os.path.join(directory, "metrics.prom"))
+        bodies = (json.dumps({"time": int(time.time()), "metrics": self.snapshot()}, indent=2), self.to_prometheus())
+        for path, body in zip(paths, bodies):
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(body)
+            os.replace(tmp, path)
+        return paths
+
+REGISTRY = Registry()
+
+# 模块级快捷方式，调用方写 metrics.timed("storage.search") 即可
+counter = REGISTRY.counter
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set
+observe = REGISTRY.observe
+span = REGISTRY.span
+timed = REGISTRY.timed
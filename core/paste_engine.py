@@ -1,68 +1,313 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
+from dataclasses import dataclass, field
+import queue, threading, time, uuid
 from PyQt6.QtCore import QObject, pyqtSignal, QThread
 from PyQt6.QtGui import QGuiApplication, QImage
 from PyQt6.QtCore import QMimeData, QUrl
-import pyautogui, json, time
+from . import metrics
 from .platform_utils import paste_hotkey
 
+# 写剪贴板时附带的自定义格式，dataChanged 时据此确认剪贴板里已经是我们的内容
+TOKEN_MIME = "application/x-clipboard-sequencer-token"
+
+@dataclass
+class PasteJob:
+    item_id: int
+    kind: str            # text|image|files
+    payload: object      # str | 图片路径 | list[str]
+    generation: int = 0  # 提交时的取消代数，cancel() 之后旧代数的任务全部作废
+    error: str = ""
+    token: bytes = b""
+    set_at: float = 0.0  # time.monotonic()，写入剪贴板的时刻
+    ack: threading.Event = field(default_factory=threading.Event)
+    loader: object = None   # 可选：在粘贴线程上调用一次得到 payload（大文本延迟到粘贴时才读取）
+    trigger_at: float = 0.0 # time.monotonic()，触发这次粘贴的热键时刻（0=非热键触发）
+    merged: tuple = ()      # 合并粘贴（item_id=-1）时被合并的条目 id
+
+class AdaptivePacer:
+    """
+    自适应粘贴间隔：按内容类型用 EWMA 学习「写剪贴板 → 剪贴板确认」的延迟，
+    间隔 = EWMA × SAFETY，限制在 settings 的 [paste_interval_min_ms, paste_interval_max_ms]（实时读取）。
+    确认超时按上限计入，间隔随之变大；还没有样本时用 min_interval_ms。
+    """
+    ALPHA = 0.3
+    SAFETY = 1.5
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._ewma: dict[str, float] = {}
+
+    @property
+    def lo_ms(self) -> int:
+        return self.settings.paste_interval_min_ms
+
+    @property
+    def hi_ms(self) -> int:
+        return self.settings.paste_interval_max_ms
+
+    def observe(self, kind: str, latency_ms: float):
+        prev = self._ewma.get(kind)
+        self._ewma[kind] = latency_ms if prev is None else prev + self.ALPHA * (latency_ms - prev)
+
+    def interval_ms(self, kind: str) -> float:
+        est = self._ewma.get(kind)
+        ms = self.settings.min_interval_ms if est is None else est * self.SAFETY
+        return min(self.hi_ms, max(self.lo_ms, ms))
+
+    def snapshot(self) -> dict[str, float]:
+        return {k: self.interval_ms(k) for k in self._ewma}
+
+class _Cancelled(Exception):
+    pass
+
 class _PasteWorker(QThread):
-    done = pyqtSignal(int)
-    fail = pyqtSignal(int, str)
+    """
+    常驻粘贴线程：按 FIFO 逐个执行任务，保证顺序和 paste_done 的先后一致。
+    剪贴板只能在 GUI 线程设置，所以每个任务先请求 GUI 线程写剪贴板并等待确认，
+    再按节奏等待后发送粘贴快捷键：
+      - fixed：固定等待 min_interval_ms
+      - adaptive：等剪贴板 dataChanged 确认是本任务的 token，再补足 AdaptivePacer 学到的间隔
+    失败按指数退避重试 max_retries 次。
+    """
+    request_clipboard = pyqtSignal(object, object)   # PasteJob, threading.Event
+    done = pyqtSignal(object)          # PasteJob
+    fail = pyqtSignal(object, str)     # PasteJob, message
+    dropped = pyqtSignal(object)       # 被取消、未执行的 PasteJob
+
+    CLIPBOARD_TIMEOUT_S = 2.0
+    BACKOFF_MS = 100
 
-    def __init__(self, item_id: int, setter, interval_ms: int, parent=None):
+    def __init__(self, scheduler: "PasteScheduler", parent=None):
         super().__init__(parent)
-        self.item_id = item_id
-        self.setter = setter
-        self.interval_ms = interval_ms
+        self.scheduler = scheduler
+        self.wake = threading.Event()   # cancel/stop 时唤醒正在等待的任务
 
     def run(self):
+        s = self.scheduler
+        while True:
+            job = s.jobs.get()
+            if job is None:
+                return
+            if s.is_cancelled(job):
+                self.dropped.emit(job); continue
+            metrics.set_gauge("paste.pending", s.jobs.qsize())
+            with metrics.span(f"paste.job.{job.kind}"):
+                self._run_job(job)
+
+    def _run_job(self, job: PasteJob):
+        if job.loader is not None:
+            try:
+                job.payload, job.loader = job.loader(), None
+            except Exception as e:
+                self.fail.emit(job, str(e)); return
+        retries = 0
+        while True:
+            try:
+                self._paste_once(job)
+                self.done.emit(job); return
+            except _Cancelled:
+                self.dropped.emit(job); return
+            except Exception as e:
+                retries += 1
+                metrics.inc("paste.errors")
+                if retries > self.scheduler.settings.max_retries:
+                    self.fail.emit(job, str(e)); return
+                try:
+                    self._sleep(job, self.BACKOFF_MS * (2 ** (retries - 1)))
+                except _Cancelled:
+                    self.dropped.emit(job); return
+
+    def _wait_ack(self, job: PasteJob, timeout_ms: float) -> bool:
+        deadline = job.set_at + timeout_ms/1000.0
+        while not job.ack.is_set():
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            job.ack.wait(min(left, 0.02))   # 短轮询，以便及时响应取消
+            if self.scheduler.is_cancelled(job):
+                raise _Cancelled()
+        return True
+
+    def _sleep(self, job: PasteJob, ms: float):
+        self.wake.wait(ms/1000.0)
+        if self.scheduler.is_cancelled(job):
+            raise _Cancelled()
+
+    def _paste_once(self, job: PasteJob):
+        job.error = ""
+        ev = threading.Event()
+        self.request_clipboard.emit(job, ev)
+        if not ev.wait(self.CLIPBOARD_TIMEOUT_S):
+            raise TimeoutError("设置剪贴板超时")
+        if job.error:
+            raise RuntimeError(job.error)
+        s = self.scheduler
+        if s.settings.paste_pacing == "adaptive":
+            pacer = s.pacer
+            if not self._wait_ack(job, pacer.hi_ms):
+                metrics.inc("paste.ack_timeouts")
+                pacer.observe(job.kind, pacer.hi_ms)
+            elapsed = (time.monotonic() - job.set_at) * 1000
+            self._sleep(job, max(0.0, pacer.interval_ms(job.kind) - elapsed))
+        else:
+            self._sleep(job, s.settings.min_interval_ms)
+        import pyautogui   # 首次粘贴时才加载（连带 Pillow 和平台后端），不拖慢启动
+        mod, key = paste_hotkey()
+        pyautogui.hotkey(mod, key)
+        if job.trigger_at:
+            metrics.observe("hotkeys.to_keystroke", (time.monotonic() - job.trigger_at) * 1000)
+
+class PasteScheduler(QObject):
+    """
+    有序粘贴调度：所有粘贴任务进入一个队列，由一个常驻工作线程依次执行；
+    GUI 线程只负责提交任务和写剪贴板，不会 sleep 或阻塞。
+    progress(finished, total) 在一轮任务（队列从空到空）中持续报告进度，一轮结束时发出 idle。
+    """
+    done = pyqtSignal(object)          # PasteJob
+    failed = pyqtSignal(object, str)
+    progress = pyqtSignal(int, int)    # finished, total
+    about_to_set_clipboard = pyqtSignal(object)   # PasteJob（GUI 线程，写剪贴板之前）
+    idle = pyqtSignal()
+
+    def __init__(self, settings, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.jobs: queue.Queue = queue.Queue()
+        self._generation = 0
+        self._total = 0
+        self._finished = 0
+        self._awaiting: PasteJob | None = None   # 等待剪贴板确认的任务
+        self._trigger_at = 0.0
+        self.pacer = AdaptivePacer(settings)
+        QGuiApplication.clipboard().dataChanged.connect(self._on_clipboard_changed)
+        self._worker = _PasteWorker(self, self)
+        self._worker.request_clipboard.connect(self._apply_clipboard)
+        self._worker.done.connect(self._on_done)
+        self._worker.fail.connect(self._on_fail)
+        self._worker.dropped.connect(lambda job: self._advance())
+        self._worker.start()
+
+    def submit(self, job: PasteJob):
+        job.generation = self._generation
+        if self._trigger_at:
+            job.trigger_at, self._trigger_at = self._trigger_at, 0.0
+        self._total += 1
+        self.progress.emit(self._finished, self._total)
+        self.jobs.put(job)
+
+    def mark_trigger(self, t: float | None):
+        """下一个提交的任务记为由 t 时刻的热键触发（只记第一个，统计到第一次按键的延迟）。"""
+        self._trigger_at = t or 0.0
+
+    def is_cancelled(self, job: PasteJob) -> bool:
+        return job.generation != self._generation
+
+    @property
+    def busy(self) -> bool:
+        return self._total > 0
+
+    def cancel(self):
+        """取消所有尚未完成的任务（包括正在等待间隔/重试的那一个）。"""
+        self._generation += 1
+        self._worker.wake.set()
+
+    def shutdown(self, timeout_ms: int = 3000):
+        self.cancel()
+        self.jobs.put(None)
+        self._worker.wait(timeout_ms)
+
+    def _apply_clipboard(self, job: PasteJob, ev: threading.Event):
         try:
-            self.setter()
-            time.sleep(self.interval_ms/1000.0)
-            mod, key = paste_hotkey()
-            pyautogui.hotkey(mod, key)
-            self.done.emit(self.item_id)
+            if self.is_cancelled(job):
+                job.error = "cancelled"; return
+            self._worker.wake.clear()
+            job.token = uuid.uuid4().hex.encode()
+            self.about_to_set_clipboard.emit(job)
+            md = QMimeData()
+            if job.kind == "text":
+                md.setText(job.payload)
+            elif job.kind == "image":
+                md.setImageData(QImage(job.payload))
+            else:
+                md.setUrls([QUrl.fromLocalFile(p) for p in job.payload])
+            md.setData(TOKEN_MIME, job.token)
+            job.ack.clear()
+            self._awaiting = job
+            job.set_at = time.monotonic()
+            QGuiApplication.clipboard().setMimeData(md)
+            self._on_clipboard_changed()   # 部分平台在 setMimeData 内同步发出 dataChanged
         except Exception as e:
-            self.fail.emit(self.item_id, str(e))
+            job.error = str(e)
+        finally:
+            ev.set()
+
+    def _on_clipboard_changed(self):
+        job = self._awaiting
+        if job is None or job.ack.is_set():
+            return
+        md = QGuiApplication.clipboard().mimeData()
+        if md is not None and md.hasFormat(TOKEN_MIME) and bytes(md.data(TOKEN_MIME)) == job.token:
+            self._awaiting = None
+            ms = (time.monotonic() - job.set_at) * 1000
+            metrics.observe("paste.clipboard_ack", ms)
+            self.pacer.observe(job.kind, ms)
+            job.ack.set()
+
+    def _on_done(self, job: PasteJob):
+        self.done.emit(job)
+        self._advance()
+
+    def _on_fail(self, job: PasteJob, msg: str):
+        self.failed.emit(job, msg)
+        self._advance()
+
+    def _advance(self):
+        self._finished += 1
+        self.progress.emit(self._finished, self._total)
+        if self._finished >= self._total:
+            self._finished = self._total = 0
+            self.idle.emit()
 
 class PasteEngine(QObject):
-    paste_done = pyqtSignal(int)        # item_id
+    paste_done = pyqtSignal(int)        # item_id（按提交顺序）
+    paste_merged = pyqtSignal(list)     # 合并粘贴完成：被合并的条目 id（紧随其 paste_done(-1)）
     paste_failed = pyqtSignal(int, str) # item_id, message
+    progress = pyqtSignal(int, int)     # finished, total
+    idle = pyqtSignal()                 # 队列里的任务全部完成/失败/取消
 
-    def __init__(self, settings, storage, parent=None):
+    def __init__(self, settings, parent=None):
         super().__init__(parent)
         self.settings = settings
-        self.storage = storage
-
-    def _launch(self, item_id: int, setter):
-        w = _PasteWorker(item_id, setter, self.settings.min_interval_ms, self)
-        w.done.connect(self.paste_done)
-        w.fail.connect(self.paste_failed)
-        w.start()
-
-    def paste_text(self, item_id: int, text: str):
-        def setter():
-            cb = QGuiApplication.clipboard()
-            md = QMimeData(); md.setText(text)
-            cb.setMimeData(md)
-            QGuiApplication.processEvents()
-        self._launch(item_id, setter)
+        self.scheduler = PasteScheduler(settings, self)
+        self.scheduler.done.connect(self._on_done)
+        self.scheduler.failed.connect(lambda job, msg: self.paste_failed.emit(job.item_id, msg))
+        self.scheduler.progress.connect(self.progress)
+        self.scheduler.idle.connect(self.idle)
+
+    def _on_done(self, job: PasteJob):
+        self.paste_done.emit(job.item_id)
+        if job.merged:
+            self.paste_merged.emit(list(job.merged))
+
+    def paste_text(self, item_id: int, text: str = "", loader=None, merged=()):
+        self.scheduler.submit(PasteJob(item_id, "text", text, loader=loader, merged=tuple(merged)))
 
     def paste_image(self, item_id: int, image_path: str):
-        def setter():
-            cb = QGuiApplication.clipboard()
-            img = QImage(image_path)
-            md = QMimeData(); md.setImageData(img)
-            cb.setMimeData(md)
-            QGuiApplication.processEvents()
-        self._launch(item_id, setter)
+        self.scheduler.submit(PasteJob(item_id, "image", image_path))
 
     def paste_files(self, item_id: int, paths: list[str]):
-        def setter():
-            cb = QGuiApplication.clipboard()
-            md = QMimeData()
-            md.setUrls([QUrl.fromLocalFile(p) for p in paths])
-            cb.setMimeData(md)
-            QGuiApplication.processEvents()
-        self._launch(item_id, setter)
+        self.scheduler.submit(PasteJob(item_id, "files", list(paths)))
+
+    @property
+    def busy(self) -> bool:
+        return self.scheduler.busy
+
+    def mark_trigger(self, t: float | None):
+        self.scheduler.mark_trigger(t)
+
+    def cancel(self):
+        self.scheduler.cancel()
+
+    def shutdown(self):
+        self.scheduler.shutdown()
@@ -1,45 +1,122 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-from . import storage
+from concurrent.futures import Future, ThreadPoolExecutor
+import os, threading
+from . import metrics, storage
+from .clip_item import ClipItem
+
+_unlinker: ThreadPoolExecutor | None = None
+_unlinker_lock = threading.Lock()
+
+def _unlink(paths: list[str]) -> int:
+    from .thumbnails import thumb_path
+    n = 0
+    for p in paths:
+        for f in (p, thumb_path(p)):
+            try: os.remove(f); n += 1
+            except OSError: pass
+    metrics.inc("storage.files_unlinked", n)
+    return n
+
+def unlink_later(paths: list[str]) -> Future | None:
+    """在后台线程删除图片文件及其缩略图（单线程、按提交顺序执行），不占用调用方的时间。"""
+    global _unlinker
+    if not paths:
+        return None
+    with _unlinker_lock:
+        if _unlinker is None:
+            _unlinker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="unlink")
+    return _unlinker.submit(_unlink, list(paths))
 
 class QueueManager:
-    def __init__(self, settings):
+    def __init__(self, settings, engine: storage.StorageEngine | None = None, feed=None):
         self.settings = settings
+        self.db = engine or storage.get_engine()
+        self.feed = feed            # ChangeFeed：本引擎的写入变更会推送给它
+        if feed is not None:
+            self.db.add_listener(feed.post)
 
     # add
     def add_text(self, text: str) -> int:
         text = (text or "").strip()
         if not text:
             return -1
-        return storage.add_text_item(text, self.settings.duplicate_policy)
+        return self.db.add_text_item(text, self.settings.duplicate_policy, self.settings.large_text_kb * 1024)
 
-    def add_image(self, path: str) -> int:
-        return storage.add_image_item(path)
+    def add_image(self, path: str, content_hash: str | None = None) -> int:
+        return self.db.add_image_item(path, self.settings.duplicate_policy, content_hash)
 
     def add_files(self, paths: list[str]) -> int:
-        return storage.add_files_item(paths)
+        return self.db.add_files_item(paths, self.settings.duplicate_policy)
+
+    def add_many(self, items) -> list[int]:
+        """
+        批量入队，整批一个事务（控制接口 enqueue 用）。
+        items 元素为文本，或 {"text": ...} / {"paths": [...]}；空文本对应 -1，格式不对整批回滚。
+        """
+        ids = []
+        with self.db.transaction():
+            for it in items:
+                if isinstance(it, str):
+                    ids.append(self.add_text(it))
+                elif isinstance(it, dict) and "paths" in it:
+                    ids.append(self.add_files([str(p) for p in it["paths"]]))
+                elif isinstance(it, dict) and "text" in it:
+                    ids.append(self.add_text(str(it["text"])))
+                else:
+                    raise ValueError(f"不支持的条目：{it!r}")
+        return ids
 
     # list
     def list_all(self, limit=500):
-        return storage.list_items_all(limit=limit)
+        return self.db.list_items_all(limit=limit)
+
+    # 列表、检索、按 id 取行都返回 ClipItem（只含列表列，全文与文件列表按需取）
+    def fetch_page(self, before_id: int | None = None, after_id: int | None = None,
+                   size: int = 200, filters: dict | None = None, pooled: bool = False) -> list[ClipItem]:
+        return [ClipItem.from_row(r) for r in self.db.fetch_page(before_id, after_id, size, filters, pooled, listing=True)]
+
+    def search(self, query: str, type: str | None = None, status: str | None = None,
+               collection: str | None = None, limit: int = 50, offset: int = 0) -> list[ClipItem]:
+        return [ClipItem.from_row(r) for r in self.db.search(query, type, status, collection, limit, offset, listing=True)]
+
+    def search_partial(self, query: str) -> bool:
+        return self.db.search_partial(query)
+
+    def get_items(self, ids) -> list[ClipItem]:
+        return [ClipItem.from_row(r) for r in self.db.get_items(ids, listing=True)]
+
+    def get_text(self, item_id: int) -> str:
+        """条目全文；大文本只在粘贴时才取，可在粘贴线程调用。"""
+        return self.db.get_text(item_id)
+
+    def item_text(self, item: ClipItem) -> str:
+        """ClipItem 的全文：预览完整就直接用，否则读一次并缓存在条目上。"""
+        return item.full_text(self.db.get_text)
 
     def list_favorites(self, limit=500):
-        return storage.list_favorites(limit=limit)
+        return self.db.list_favorites(limit=limit)
 
     # status
     def mark_used(self, item_id: int):
-        storage.set_item_used(item_id)
+        self.db.set_item_used(item_id)
 
     def mark_active(self, item_id: int):
-        storage.set_item_active(item_id)
+        self.db.set_item_active(item_id)
 
     # delete
-    def delete(self, ids: list[int]):
-        storage.delete_items(ids)
+    def delete(self, ids) -> int:
+        """删除条目，返回因此释放、已交给后台删除的文件数。"""
+        freed = self.db.delete_items(ids)
+        unlink_later(freed)
+        return len(freed)
 
     # favorites
     def set_favorite(self, item_id: int, fav: bool):
-        storage.set_favorite(item_id, fav)
+        self.db.set_favorite(item_id, fav)
+
+    def favorite_ids(self, pooled: bool = False) -> set[int]:
+        return self.db.favorite_ids(pooled)
 
     def is_favorite(self, item_id: int) -> bool:
-        return storage.is_favorite(item_id)
+        return self.db.is_favorite(item_id)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+import logging, os, sqlite3, threading, time
+from PyQt6.QtCore import QThread, pyqtSignal
+from . import metrics, storage
+
+log = logging.getLogger(__name__)
+
+class RetentionWorker(QThread):
+    """
+    后台保留策略线程（持有自己的 StorageEngine），每 interval_s 秒或 trigger() 时执行一轮：
+      1. 按 settings.retention_* 小批量淘汰最旧的条目（收藏、置顶不淘汰），每批一个短事务，批间让出写锁
+      2. 回收引用归零的图片 blob 并删除文件；清理缓存目录中没有任何条目引用的孤儿图片及其缩略图
+      3. 分批清理已删除条目在全文索引里的残留（storage.purge_fts）
+      4. incremental_vacuum 分段把空闲页还给文件系统
+    旧库（auto_vacuum=NONE）要整库 VACUUM 才能转换成增量模式：库不超过 AUTO_VACUUM_MAX_MB 时启动后自动转换，
+    更大的库跳过并记日志，由用户在诊断面板 request_vacuum()，在本线程执行。
+    删除经 feed 推送，界面按变更增量移除行。
+    启动后先等 delay_s 秒再开始第一轮，不和首屏加载抢磁盘。
+    """
+    pass_done = pyqtSignal(int, int)   # 本轮淘汰条目数, 删除文件数
+    vacuum_done = pyqtSignal(int)      # 手动整理后库缩小的字节数，-1 表示失败（例如库被占用）
+
+    BATCH = 200
+    FTS_BATCH = 2000
+    PAUSE_S = 0.05
+    VACUUM_PAGES = 256
+    ORPHAN_GRACE_S = 300   # 新写入的图片可能还没登记，给足余量
+    AUTO_VACUUM_MAX_MB = 64
+
+    def __init__(self, settings, db_path: str, feed=None, interval_s: int = 300,
+                 delay_s: float = 0, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.db_path = db_path
+        self.feed = feed
+        self.interval_s = interval_s
+        self.delay_s = delay_s
+        self._wake = threading.Event()
+        self._stopping = False
+        self._vacuum_requested = False
+
+    def trigger(self):
+        self._wake.set()
+
+    def request_vacuum(self):
+        """在后台整库 VACUUM 一次，完成后发出 vacuum_done。"""
+        self._vacuum_requested = True
+        self._wake.set()
+
+    def stop(self, timeout_ms: int = 5000) -> bool:
+        self._stopping = True
+        self._wake.set()
+        return self.wait(timeout_ms)
+
+    def run(self):
+        if self.delay_s and self._wake.wait(self.delay_s):
+            self._wake.clear()
+        if self._stopping:
+            return
+        engine = storage.StorageEngine(self.db_path)
+        if self.feed is not None:
+            engine.add_listener(self.feed.post)
+        try:
+            self._convert(engine)
+            while not self._stopping:
+                if self._vacuum_requested:
+                    self._vacuum_requested = False
+                    self._vacuum(engine)
+                self.run_once(engine)
+                self._wake.wait(self.interval_s)
+                self._wake.clear()
+        finally:
+            engine.close()
+
+    def _convert(self, engine: storage.StorageEngine):
+        if engine.enable_incremental_vacuum(self.AUTO_VACUUM_MAX_MB * 1024 * 1024) or engine.incremental_vacuum_enabled():
+            return
+        metrics.inc("retention.vacuum_skipped")
+        log.info("数据库 %.1f MB 超过 %d MB，跳过自动 VACUUM 转换；可在诊断面板手动整理",
+                 engine.db_bytes() / 1048576, self.AUTO_VACUUM_MAX_MB)
+
+    def _vacuum(self, engine: storage.StorageEngine):
+        try:
+            freed = engine.vacuum()
+        except sqlite3.OperationalError as e:
+            log.warning("整理数据库失败：%s", e)
+            freed = -1
+        self.vacuum_done.emit(freed)
+
+    def _pause(self) -> bool:
+        """批间让出；返回是否应停止。"""
+        self._wake.wait(self.PAUSE_S)
+        return self._stopping
+
+    def run_once(self, engine: storage.StorageEngine) -> tuple[int, int]:
+        s = self.settings
+        evicted = removed = 0
+        with metrics.span("retention.pass"):
+            while True:
+                ids = engine.evict_batch(s.retention_max_age_days * 86400, s.retention_max_items,
+                                         s.retention_max_mb * 1024 * 1024, self.BATCH)
+                evicted += len(ids)
+                removed += self._remove(engine.reclaim_blobs())
+                if not ids or self._pause():
+                    break
+            removed += self._remove_orphans(engine)
+            while not self._stopping and engine.purge_fts(self.FTS_BATCH) > 0:
+                if self._pause():
+                    break
+            while not self._stopping and engine.incremental_vacuum(self.VACUUM_PAGES) > 0:
+                if self._pause():
+                    break
+        metrics.inc("retention.evicted", evicted)
+        metrics.inc("retention.files_removed", removed)
+        self.pass_done.emit(evicted, removed)
+        return evicted, removed
+
+    @staticmethod
+    def _remove(paths) -> int:
+        n = 0
+        for p in paths:
+            try: os.remove(p); n += 1
+            except OSError: pass
+        return n
+
+    def _remove_orphans(self, engine: storage.StorageEngine) -> int:
+        root = storage.cache_img_dir()
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            return 0
+        keep = engine.image_paths()
+        cutoff = time.time() - self.ORPHAN_GRACE_S
+        orphans = []
+        for e in entries:
+            try:
+                if not e.is_file() or e.stat().st_mtime > cutoff:
+                    continue
+            except OSError:
+                continue
+            if os.path.normcase(os.path.abspath(e.path)) not in keep:
+                orphans.append(e.path)
+        # 原图已不在的缩略图（thumbs/<原图文件名去扩展名>.png）
+        stems = {os.path.splitext(os.path.basename(p))[0] for p in keep}
+        try:
+            thumbs = list(os.scandir(os.path.join(root, "thumbs")))
+        except OSError:
+            thumbs = []
+        for e in thumbs:
+            try:
+                if e.is_file() and e.stat().st_mtime <= cutoff and os.path.splitext(e.name)[0] not in stems:
+                    orphans.append(e.path)
+            except OSError:
+                continue
+        return self._remove(orphans)
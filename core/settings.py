@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 from typing import Literal
-import json, os
+import json, os, uuid
 from appdirs import user_data_dir
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
 
 APP_NAME = "clipboard_sequencer"
 APP_AUTHOR = "local"
@@ -20,9 +21,21 @@ class Settings:
     joiner_mode: Literal['cjk','english','custom'] = 'cjk'
     joiner_custom_sep: str = ""
     min_interval_ms: int = 120
+    paste_pacing: Literal['fixed','adaptive'] = 'fixed'
+    paste_interval_min_ms: int = 15     # adaptive 模式下间隔的上下限
+    paste_interval_max_ms: int = 400
     max_retries: int = 1
     history_default_count: int = 50
+    image_codec: Literal['png','webp','jpg'] = 'png'
+    image_quality: int = -1          # -1=编码器默认；PNG 下为压缩级别(0 最小/100 最快)
     blacklist: list[str] | None = None
+    large_text_kb: int = 64             # 超过此大小的文本压缩后单独存放，列表只读预览
+    retention_max_age_days: int = 0     # 保留策略，0=不限；收藏和置顶的条目不受影响
+    retention_max_items: int = 0
+    retention_max_mb: int = 0
+    metrics_enabled: bool = False
+    metrics_dump_interval_s: int = 60   # 开启指标时定期写 metrics.json/metrics.prom 到数据目录，0=不写
+    ipc_enabled: bool = True            # 本地套接字控制接口（cli.py）
 
     def to_json(self) -> str:
         return json.dumps(asdict(self), ensure_ascii=False, indent=2)
@@ -32,10 +45,11 @@ class Settings:
         obj = json.loads(s)
         if obj.get("blacklist") is None:
             obj["blacklist"] = ["1Password", "Bitwarden", "KeePass", "KeePassXC", "Terminal", "PowerShell"]
-        return Settings(**obj)
+        known = {f.name for f in fields(Settings)}
+        return Settings(**{k: v for k, v in obj.items() if k in known})
 
-def load_settings() -> Settings:
-    p = settings_path()
+def load_settings(path: str | None = None) -> Settings:
+    p = path or settings_path()
     if os.path.exists(p):
         try:
             with open(p, "r", encoding="utf-8") as f:
@@ -43,10 +57,69 @@ def load_settings() -> Settings:
         except Exception:
             pass
     s = Settings()
-    save_settings(s)
+    save_settings(s, p)
     return s
 
-def save_settings(s: Settings):
-    p = settings_path()
-    with open(p, "w", encoding="utf-8") as f:
-        f.write(s.to_json())
+def save_settings(s: Settings, path: str | None = None):
+    """原子写入：先写同目录临时文件并 fsync，再 os.replace 覆盖，中途崩溃不会留下半个文件。"""
+    p = path or settings_path()
+    tmp = f"{p}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(s.to_json())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, p)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+class SettingsStore(QObject):
+    """
+    进程内唯一的设置来源：
+      - settings 是一个长期存在的 Settings 对象，各组件直接持有它，读到的总是最新值
+      - update(**values) 原地修改，只对真正变化的键发出 changed(key, value)
+      - 修改后 SAVE_DELAY_MS 内的多次更新合并成一次原子写盘；退出前调用 flush()
+    需要派生状态（定时器、缓存参数等）的组件用 subscribe(keys, callback) 订阅。
+    """
+    changed = pyqtSignal(str, object)   # key, new value
+
+    SAVE_DELAY_MS = 300
+
+    def __init__(self, path: str | None = None, parent=None):
+        super().__init__(parent)
+        self.path = path or settings_path()
+        self.settings = load_settings(self.path)
+        self._dirty = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.SAVE_DELAY_MS)
+        self._timer.timeout.connect(self.flush)
+
+    def update(self, **values) -> list[str]:
+        s = self.settings
+        changed = []
+        for k, v in values.items():
+            if not hasattr(s, k):
+                raise AttributeError(f"unknown setting: {k}")
+            if getattr(s, k) != v:
+                setattr(s, k, v)
+                changed.append(k)
+        if changed:
+            self._dirty = True
+            self._timer.start()
+            for k in changed:
+                self.changed.emit(k, getattr(s, k))
+        return changed
+
+    def subscribe(self, keys, callback):
+        """keys 中任一键变化时调用 callback(key, value)。"""
+        keys = {keys} if isinstance(keys, str) else set(keys)
+        self.changed.connect(lambda k, v: callback(k, v) if k in keys else None)
+
+    def flush(self):
+        self._timer.stop()
+        if self._dirty:
+            save_settings(self.settings, self.path)
+            self._dirty = False
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时剖析（app.py --profile-startup）：
+  - enable() 之后的每个新模块导入都计时（含其依赖的累计时间）
+  - 各阶段用 mark(name) 打点，时间都从进程入口（enable 传入的 t0）算起
+  - until 里的阶段都到齐后把明细打印到 stderr，并对照首帧目标 TARGET_MS
+未开启时 mark() 只做一次判断，可以留在正式代码路径里。
+只用标准库，要在 PyQt 之前导入。
+"""
+from __future__ import annotations
+import builtins, sys, time
+
+TARGET_MS = 300       # 目标：首帧绘制前的耗时
+TOP_IMPORTS = 12
+
+_enabled = False
+_t0 = 0.0
+_marks: list[tuple[str, float]] = []
+_imports: dict[str, float] = {}
+_until: set[str] = set()
+_orig_import = builtins.__import__
+
+def enabled() -> bool:
+    return _enabled
+
+def enable(t0: float | None = None, until=("first paint", "ready")):
+    global _enabled, _t0, _until
+    _enabled = True
+    _t0 = time.perf_counter() if t0 is None else t0
+    _until = set(until)
+    builtins.__import__ = _timed_import
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _orig_import(name, globals, locals, fromlist, level)
+    t = time.perf_counter()
+    try:
+        return _orig_import(name, globals, locals, fromlist, level)
+    finally:
+        _imports.setdefault(name, (time.perf_counter() - t) * 1000)
+
+def mark(name: str):
+    """记录阶段 name 的时间点；同名只记第一次。"""
+    if not _enabled or any(n == name for n, _ in _marks):
+        return
+    _marks.append((name, (time.perf_counter() - _t0) * 1000))
+    if _until and _until <= {n for n, _ in _marks}:
+        report()
+
+def watch_first_paint(widget):
+    """widget 第一次收到 Paint 事件时打点 "first paint"。"""
+    if not _enabled:
+        return
+    from PyQt6.QtCore import QObject, QEvent
+
+    class _PaintFilter(QObject):
+        def eventFilter(self, obj, ev):
+            if ev.type() == QEvent.Type.Paint:
+                mark("first paint")
+                obj.removeEventFilter(self)
+            return False
+
+    widget._startup_paint_filter = f = _PaintFilter(widget)
+    widget.installEventFilter(f)
+
+def report(file=None):
+    global _enabled
+    _enabled = False
+    builtins.__import__ = _orig_import
+    out = file or sys.stderr
+    print("startup profile (ms since launch)", file=out)
+    prev = 0.0
+    for name, at in sorted(_marks, key=lambda m: m[1]):
+        print(f"  {name:<24}{at:9.1f}  +{at - prev:.1f}", file=out)
+        prev = at
+    print(f"slowest imports (inclusive ms, top {TOP_IMPORTS})", file=out)
+    for name, ms in sorted(_imports.items(), key=lambda kv: -kv[1])[:TOP_IMPORTS]:
+        print(f"  {name:<40}{ms:8.1f}", file=out)
+    paint = dict(_marks).get("first paint")
+    if paint is not None:
+        verdict = "ok" if paint <= TARGET_MS else "over budget"
+        print(f"first paint {paint:.1f} ms / target {TARGET_MS} ms: {verdict}", file=out)
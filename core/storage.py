@@ -1,25 +1,45 @@
 # -*- coding: utf-8 -*-
-import os, sqlite3, json, time
+import os, re, sys, sqlite3, json, time, threading, queue, hashlib, zlib, base64, gzip, uuid, logging
+from contextlib import contextmanager
 from appdirs import user_data_dir
+from . import metrics
+
+log = logging.getLogger(__name__)
 
 APP_NAME = "clipboard_sequencer"
 APP_AUTHOR = "local"
 
+_dirs: dict[str, str] = {}
+
+def _ensure_dir(key: str, d: str) -> str:
+    # makedirs 只做一次，后续直接返回缓存的路径
+    if key not in _dirs:
+        os.makedirs(d, exist_ok=True)
+        _dirs[key] = d
+    return _dirs[key]
+
 def data_dir() -> str:
-    d = user_data_dir(APP_NAME, APP_AUTHOR)
-    os.makedirs(d, exist_ok=True)
-    return d
+    return _ensure_dir("data", user_data_dir(APP_NAME, APP_AUTHOR))
 
 def cache_img_dir() -> str:
-    d = os.path.join(os.path.expanduser("~"), f".{APP_NAME}", "cache", "images")
-    os.makedirs(d, exist_ok=True)
-    return d
+    return _ensure_dir("images", os.path.join(os.path.expanduser("~"), f".{APP_NAME}", "cache", "images"))
 
 def db_path() -> str:
     return os.path.join(data_dir(), "data.db")
 
-def connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path())
+PRAGMAS = (
+    "PRAGMA auto_vacuum=INCREMENTAL", # 只对新库生效（须在 WAL 和建表之前）；旧库由 enable_incremental_vacuum()/vacuum() 转换
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",      # WAL 下 NORMAL 足够安全，省掉每次提交的 fsync
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",     # 256 MB
+    "PRAGMA cache_size=-16000",       # 约 16 MB 页缓存
+    "PRAGMA busy_timeout=5000",
+)
+
+def connect(path: str | None = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or db_path())
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA foreign_keys=ON")
     return conn
@@ -44,6 +64,8 @@ CREATE TABLE IF NOT EXISTS items(
   note TEXT,
   created_at INTEGER NOT NULL,
   last_used_at INTEGER,
+  content_hash TEXT,         -- blake2b(规范化内容)，去重用
+  text_len INTEGER,          -- 非空表示大文本：text 只存预览前缀，全文压缩存于 text_blobs
   FOREIGN KEY(session_id) REFERENCES sessions(id) ON DELETE SET NULL
 );
 CREATE TABLE IF NOT EXISTS collections(
@@ -57,19 +79,128 @@ CREATE TABLE IF NOT EXISTS collection_map(
   FOREIGN KEY(collection_id) REFERENCES collections(id) ON DELETE CASCADE,
   FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE CASCADE
 );
+CREATE TABLE IF NOT EXISTS blobs(
+  path TEXT PRIMARY KEY,     -- 图片文件（<像素哈希>.<扩展名>），与 items.image_path 对应；换编码后同一张图是另一个文件
+  hash TEXT NOT NULL,        -- 图片像素哈希，与 items.content_hash 对应
+  size INTEGER NOT NULL DEFAULT 0,
+  refcount INTEGER NOT NULL DEFAULT 0,
+  touched_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS text_blobs(
+  item_id INTEGER PRIMARY KEY,
+  codec TEXT NOT NULL,       -- zlib
+  data BLOB NOT NULL,
+  FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE CASCADE
+);
+CREATE TRIGGER IF NOT EXISTS trg_blobs_ref AFTER INSERT ON items WHEN NEW.type='image' BEGIN
+  UPDATE blobs SET refcount=refcount+1 WHERE path=NEW.image_path;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_blobs_unref AFTER DELETE ON items WHEN OLD.type='image' BEGIN
+  UPDATE blobs SET refcount=refcount-1 WHERE path=OLD.image_path;
+END;
 '''
 
-def init_db():
-    conn = connect()
-    with conn:
-        conn.executescript(SCHEMA)
-        cur = conn.execute("SELECT id FROM collections WHERE name=?", ("favorites",))
-        if cur.fetchone() is None:
-            conn.execute("INSERT INTO collections(name) VALUES (?)", ("favorites",))
-        cur = conn.execute("SELECT id FROM sessions WHERE closed_at IS NULL ORDER BY id DESC LIMIT 1")
-        if cur.fetchone() is None:
-            conn.execute("INSERT INTO sessions(started_at) VALUES (?)", (int(time.time()),))
-    conn.close()
+# 全文索引：独立的 FTS5 表，rowid=items.id，由触发器与 items 同步。
+# trigram 分词支持子串匹配（中日韩文本没有空格分词）；不支持时退回 unicode61。
+FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(text, note, paths, tokenize='{tokenize}');
+CREATE TRIGGER IF NOT EXISTS trg_fts_ins AFTER INSERT ON items BEGIN
+  INSERT INTO items_fts(rowid, text, note, paths) VALUES (NEW.id, NEW.text, NEW.note,
+    (SELECT group_concat(value, ' ') FROM json_each(NEW.paths_json)));
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_del AFTER DELETE ON items BEGIN
+  DELETE FROM items_fts WHERE rowid=OLD.id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fts_upd AFTER UPDATE OF text, note, paths_json ON items BEGIN
+  DELETE FROM items_fts WHERE rowid=OLD.id;
+  INSERT INTO items_fts(rowid, text, note, paths) VALUES (NEW.id, NEW.text, NEW.note,
+    (SELECT group_concat(value, ' ') FROM json_each(NEW.paths_json)));
+END;
+'''
+FTS_MIN_TERM = 3   # trigram 只能匹配 >=3 个字符的词，更短的词走 LIKE
+
+# 列表只取这些列（顺序与 core.clip_item.ClipItem 的构造参数一致），文本只取前缀，全文粘贴时再读
+LIST_PREVIEW_CHARS = 256   # 略多于列表显示的 200 字，留出开头空白行的余量
+LIST_COLUMNS = (f"i.id, i.type, substr(i.text, 1, {LIST_PREVIEW_CHARS}), i.image_path, i.paths_json, i.count, "
+                f"i.status, i.pinned, i.note, i.created_at, i.last_used_at, i.text_len, COALESCE(i.text_len, length(i.text))")
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+def _rank_hits(hits, terms, k1: float = 1.2, b: float = 0.75) -> list[int]:
+    """
+    按 BM25 的词频/长度部分给命中排序，返回 id（分数相同时新的在前）。
+    hits 为 (id, text, note, paths_json)，全都包含每个词，各词的 IDF 在这批里相同，省略。
+    FTS5 的 bm25() 要先数出每个短语在整个索引里的命中数，常见词要扫几十万行，不用它。
+    """
+    terms = [t.lower() for t in terms]
+    docs = [(i, " ".join(filter(None, r)).lower()) for i, *r in hits]
+    avg = sum(len(d) for _, d in docs) / len(docs) if docs else 1
+    def score(doc: str) -> float:
+        norm = k1 * (1 - b + b * len(doc) / (avg or 1))
+        return sum(tf * (k1 + 1) / (tf + norm) for tf in map(doc.count, terms))
+    return [i for _s, i in sorted(((score(d), i) for i, d in docs), reverse=True)]
+
+def _like_pattern(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+# ---------- 内容哈希（去重） ----------
+def _digest(kind: str, data: bytes) -> str:
+    # person 参数把类型混进哈希，不同类型的相同字节不会互相命中
+    return hashlib.blake2b(data, digest_size=16, person=kind.encode()).hexdigest()
+
+def text_hash(text: str) -> str:
+    return _digest("text", text.replace("\r\n", "\n").strip().encode("utf-8"))
+
+def files_hash(paths: list[str]) -> str:
+    norm = [os.path.normcase(os.path.normpath(p)) for p in paths]
+    return _digest("files", json.dumps(norm, ensure_ascii=False).encode("utf-8"))
+
+def image_hash(image_path: str) -> str:
+    try:
+        with open(image_path, "rb") as f:
+            h = hashlib.blake2b(digest_size=16, person=b"image")
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+            return h.hexdigest()
+    except OSError:
+        return _digest("image", (image_path or "").encode("utf-8"))
+
+def _row_hash(kind: str, text, image_path, paths_json) -> str:
+    if kind == "text":
+        return text_hash(text or "")
+    if kind == "image":
+        return image_hash(image_path or "")
+    try: arr = json.loads(paths_json or "[]")
+    except ValueError: arr = []
+    return files_hash(arr)
+
+# ---------- 导出/导入用的文件读写 ----------
+def _read_b64(path: str) -> str | None:
+    try:
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                return base64.b64encode(f.read()).decode("ascii")
+    except OSError:
+        pass
+    return None
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _statements(script: str):
+    """把建表脚本拆成单条语句（触发器体内的分号不拆）。executescript 会先提交当前事务，迁移里不能用。"""
+    buf = ""
+    for line in script.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            yield buf.strip()
+            buf = ""
+    if buf.strip():
+        yield buf.strip()
 
 def get_current_session_id(conn: sqlite3.Connection) -> int:
     cur = conn.execute("SELECT id FROM sessions WHERE closed_at IS NULL ORDER BY id DESC LIMIT 1")
@@ -79,127 +210,1008 @@ def get_current_session_id(conn: sqlite3.Connection) -> int:
     cur = conn.execute("INSERT INTO sessions(started_at) VALUES (?)", (int(time.time()),))
     return cur.lastrowid
 
-# ---------- add items ----------
-def add_text_item(text: str, duplicate_policy: str):
-    conn = connect()
-    try:
-        sid = get_current_session_id(conn)
-        ts = int(time.time())
+def _favorites_id(conn: sqlite3.Connection) -> int:
+    r = conn.execute("SELECT id FROM collections WHERE name='favorites'").fetchone()
+    return r[0]
+
+class StorageEngine:
+    """
+    长连接存储引擎：
+      - 持有一个长期打开的写连接，只能在创建它的线程中使用（sqlite3 的 check_same_thread 负责检查）
+      - 连接按 SQL 文本缓存预编译语句，所以这里的语句都写成常量字符串
+      - 其他线程只读访问走 reader()：有界的只读连接池，用满时阻塞等待
+    """
+    STATEMENT_CACHE = 128
+    SEARCH_RANK_WINDOW = 100
+    SHORT_TERM_WINDOW = 10000          # 含短词（走 LIKE，没有索引）的检索只扫最新的这么多个 id
+    TEXT_PREVIEW_CHARS = 1024          # 大文本在行内保留的前缀（列表显示与全文索引只用它）
+    large_text_bytes = 64 * 1024       # UTF-8 超过这个字节数的文本放到 text_blobs
+
+    def __init__(self, path: str | None = None, readers: int = 4, large_text_bytes: int | None = None):
+        self.path = path or db_path()
+        if large_text_bytes is not None:
+            self.large_text_bytes = large_text_bytes   # 设置里的 large_text_kb；迁移与导入按它外置大文本
+        self._conn = self._open()
+        self._idle: queue.SimpleQueue = queue.SimpleQueue()
+        self._reader_slots = threading.BoundedSemaphore(readers)
+        self._tx_depth = 0
+        self._listeners: list = []
+        self._events: list[tuple] = []
+        self._init_schema()
+        with self._conn:
+            self._session_id = get_current_session_id(self._conn)
+        self._fav_id = _favorites_id(self._conn)
+
+    def _open(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, cached_statements=self.STATEMENT_CACHE,
+                               check_same_thread=check_same_thread)
+        for p in PRAGMAS:
+            conn.execute(p)
+        return conn
+
+    # ---------- 结构迁移 ----------
+    # (版本, 说明, 方法名)，按版本顺序执行；每步一个 BEGIN IMMEDIATE 事务，连同 PRAGMA user_version 一起提交，
+    # 中途失败整步回滚，下次启动重来。步骤必须可重复执行（IF NOT EXISTS、先查列再 ALTER），
+    # 因为多个引擎可能同时打开旧库。只增不改：改结构就在末尾追加一步。
+    MIGRATIONS = (
+        (1, "基础表、内容哈希、大文本、全文索引", "_migrate_base"),
+        (2, "按状态/会话/类型筛选与按条目查收藏的索引", "_migrate_filter_indexes"),
+        (3, "删除条目时全文索引延后清理", "_migrate_fts_gc"),
+        (4, "图片 blob 按文件路径登记", "_migrate_blobs_by_path"),
+    )
+
+    def _init_schema(self):
+        """执行库里 user_version 之后的迁移步骤；已是最新版本时只读一次 user_version。"""
+        conn = self._conn
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        for version, _desc, step in self.MIGRATIONS:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                # 拿到写锁后再读一次：别的引擎可能刚做完这一步
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    continue
+                getattr(self, step)(conn)
+                conn.execute(f"PRAGMA user_version={version}")
+
+    def _migrate_base(self, conn: sqlite3.Connection):
+        # 旧库（没有版本号）可能缺 content_hash/text_len 列、blob 表和全文索引，逐项补齐
+        for stmt in _statements(SCHEMA):
+            conn.execute(stmt)
+        if conn.execute("SELECT 1 FROM collections WHERE name='favorites'").fetchone() is None:
+            conn.execute("INSERT INTO collections(name) VALUES (?)", ("favorites",))
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(items)")}
+        if "content_hash" not in cols:
+            conn.execute("ALTER TABLE items ADD COLUMN content_hash TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_items_hash ON items(content_hash)")
+        # 先按完整文本补算哈希，再把大文本移出行：移出后行内只剩预览前缀
+        self._backfill_hashes()
+        if "text_len" not in cols:
+            conn.execute("ALTER TABLE items ADD COLUMN text_len INTEGER")
+            self._externalize_large_texts()
+        self._init_fts()
+
+    def _migrate_filter_indexes(self, conn: sqlite3.Connection):
+        # collection_map 的主键以 collection_id 开头，按 item_id 查（级联删除、导出时的归属）要单独的索引
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_items_status ON items(status, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_items_session ON items(session_id, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_items_type ON items(type, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_collection_map_item ON collection_map(item_id)")
+
+    def _migrate_fts_gc(self, conn: sqlite3.Connection):
+        # FTS5 删除一行要读出内容重新分词，批量删除时占了大半时间。删除时只记下 id，由 purge_fts() 在后台清理；
+        # 检索总是与 items 联结，id 又不复用（AUTOINCREMENT），残留的索引行不会出现在结果里
+        conn.execute("CREATE TABLE IF NOT EXISTS fts_gc(id INTEGER PRIMARY KEY)")
+        conn.execute("DROP TRIGGER IF EXISTS trg_fts_del")
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS trg_fts_gc AFTER DELETE ON items BEGIN
+          INSERT OR IGNORE INTO fts_gc(id) VALUES (OLD.id);
+        END""")
+
+    def _migrate_blobs_by_path(self, conn: sqlite3.Connection):
+        # blobs 原来按像素哈希登记：切换图片编码后同一张图存成另一个扩展名的文件，登记的路径却还是旧文件。
+        # 改为按路径登记，引用计数按 items.image_path 重新统计；旧表没登记到的新编码文件一并补上
+        if conn.execute("SELECT pk FROM pragma_table_info('blobs') WHERE name='path'").fetchone()[0]:
+            return
+        conn.execute("ALTER TABLE blobs RENAME TO blobs_old")
+        conn.execute("DROP TRIGGER IF EXISTS trg_blobs_ref")
+        conn.execute("DROP TRIGGER IF EXISTS trg_blobs_unref")
+        for stmt in _statements(SCHEMA):
+            conn.execute(stmt)
+        old = {r[0]: r[1:] for r in conn.execute("SELECT path, hash, size, touched_at FROM blobs_old")}
+        now = int(time.time())
+        for path, h, n in conn.execute(
+                "SELECT image_path, MIN(content_hash), COUNT(*) FROM items WHERE type='image' "
+                "AND content_hash IN (SELECT hash FROM blobs_old) GROUP BY image_path").fetchall():
+            _h, size, touched = old.pop(path, (h, None, now))
+            if size is None:
+                try: size = os.path.getsize(path)
+                except OSError: size = 0
+            conn.execute("INSERT INTO blobs(path, hash, size, refcount, touched_at) VALUES (?,?,?,?,?)", (path, h, size, n, touched))
+        # 已没有条目引用的留给 reclaim_blobs 回收
+        conn.executemany("INSERT INTO blobs(path, hash, size, refcount, touched_at) VALUES (?,?,?,0,?)",
+                         [(path, *rest) for path, rest in old.items()])
+        conn.execute("DROP TABLE blobs_old")
+
+    def _externalize_large_texts(self):
+        """旧库里已有的大文本一次性移出行（加 text_len 列时调用）。"""
+        conn = self._conn
+        rows = conn.execute("SELECT id, text FROM items WHERE type='text' AND LENGTH(CAST(text AS BLOB))>?",
+                            (self.large_text_bytes,)).fetchall()
+        for item_id, text in rows:
+            conn.execute("UPDATE items SET text=?, text_len=?, content_hash=? WHERE id=?",
+                         (text[:self.TEXT_PREVIEW_CHARS], len(text), text_hash(text), item_id))
+            conn.execute("INSERT OR REPLACE INTO text_blobs(item_id, codec, data) VALUES (?,?,?)",
+                         (item_id, "zlib", zlib.compress(text.encode("utf-8"), 6)))
+
+    def _init_fts(self):
+        conn = self._conn
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name='items_fts'").fetchone():
+            return
+        try:
+            for stmt in _statements(FTS_SCHEMA.format(tokenize="trigram")):
+                conn.execute(stmt)
+        except sqlite3.OperationalError:
+            for stmt in _statements(FTS_SCHEMA.format(tokenize="unicode61")):
+                conn.execute(stmt)
+        # 已有历史一次性建索引
+        conn.execute("""
+        INSERT INTO items_fts(rowid, text, note, paths)
+        SELECT id, text, note, (SELECT group_concat(value, ' ') FROM json_each(paths_json)) FROM items
+        """)
+
+    def _backfill_hashes(self, batch: int = 1000):
+        """
+        旧库一次性补算 content_hash（在迁移事务里分批读，避免一次载入全部行）。
+        已外置的大文本行内只有预览，按 text_blobs 里的全文计算，和捕获时的哈希一致。
+        """
+        conn = self._conn
+        has_len = "text_len" in {r[1] for r in conn.execute("PRAGMA table_info(items)")}
+        sql = ("SELECT i.id, i.type, i.text, i.image_path, i.paths_json, b.data FROM items i "
+               "LEFT JOIN text_blobs b ON b.item_id=i.id AND i.text_len IS NOT NULL "
+               "WHERE i.content_hash IS NULL LIMIT ?") if has_len else \
+              "SELECT id, type, text, image_path, paths_json, NULL FROM items WHERE content_hash IS NULL LIMIT ?"
+        while True:
+            rows = conn.execute(sql, (batch,)).fetchall()
+            if not rows:
+                return
+            conn.executemany("UPDATE items SET content_hash=? WHERE id=?",
+                             [(_row_hash(t, zlib.decompress(big).decode("utf-8") if big else tx, ip, pj), i)
+                              for i, t, tx, ip, pj, big in rows])
+
+    @contextmanager
+    def transaction(self):
+        """写事务；可嵌套，只有最外层提交，用于把一批写入合并成一次提交。"""
+        if self._tx_depth:
+            self._tx_depth += 1
+            try:
+                yield self._conn
+            finally:
+                self._tx_depth -= 1
+            return
+        self._tx_depth = 1
+        self._events = []
+        try:
+            with self._conn:
+                yield self._conn
+        except BaseException:
+            self._events = []
+            raise
+        finally:
+            self._tx_depth = 0
+        events, self._events = self._events, []
+        for ev in events:
+            for cb in self._listeners:
+                cb(*ev)
+
+    # ---------- 变更通知 ----------
+    def add_listener(self, callback):
+        """
+        注册变更回调 callback(kind, item_id, arg)，事务提交后按顺序调用（回滚则丢弃）：
+          inserted(id) / updated(id, fields) / deleted(id) / favorite_changed(id, fav)
+        回调在写入所在的线程执行，需要自行保证线程安全（见 core.change_feed）。
+        """
+        self._listeners.append(callback)
+
+    def _emit(self, kind: str, item_id: int, arg=None):
+        if self._listeners:
+            self._events.append((kind, item_id, arg))
+
+    @contextmanager
+    def reader(self):
+        """借出一个只读连接（供非所属线程使用），用完自动归还池中。"""
+        self._reader_slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open(check_same_thread=False)
+                conn.execute("PRAGMA query_only=ON")
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+        finally:
+            self._reader_slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._conn.close()
+
+    # ---------- add items ----------
+    _DUP_SQL = "SELECT id FROM items WHERE content_hash=? ORDER BY id DESC LIMIT 1"
+
+    def _bump_duplicate(self, content_hash: str) -> int | None:
+        conn = self._conn
+        row = conn.execute(self._DUP_SQL, (content_hash,)).fetchone()
+        if row is None:
+            return None
+        with self.transaction():
+            conn.execute("UPDATE items SET count=count+1 WHERE id=?", (row[0],))
+            self._emit("updated", row[0], {"count"})
+        return row[0]
+
+    @metrics.timed("storage.add_text_item")
+    def add_text_item(self, text: str, duplicate_policy: str, large_text_bytes: int | None = None) -> int:
+        h = text_hash(text)
         if duplicate_policy == "count":
-            cur = conn.execute("SELECT id, count FROM items WHERE type='text' AND text=? ORDER BY id DESC LIMIT 1", (text,))
-            row = cur.fetchone()
-            if row:
-                with conn:
-                    conn.execute("UPDATE items SET count=? WHERE id=?", (row[1]+1, row[0]))
-                return row[0]
-        with conn:
-            cur = conn.execute(
-                "INSERT INTO items(session_id, type, text, count, status, created_at) VALUES (?,?,?,?,?,?)",
-                (sid, "text", text, 1, "active", ts)
+            dup = self._bump_duplicate(h)
+            if dup is not None:
+                return dup
+        data = text.encode("utf-8")
+        large = len(data) > (self.large_text_bytes if large_text_bytes is None else large_text_bytes)
+        with self.transaction():
+            cur = self._conn.execute(
+                "INSERT INTO items(session_id, type, text, count, status, created_at, content_hash, text_len) VALUES (?,?,?,?,?,?,?,?)",
+                (self._session_id, "text", text[:self.TEXT_PREVIEW_CHARS] if large else text, 1, "active",
+                 int(time.time()), h, len(text) if large else None)
             )
+            if large:
+                self._conn.execute("INSERT INTO text_blobs(item_id, codec, data) VALUES (?,?,?)",
+                                   (cur.lastrowid, "zlib", zlib.compress(data, 6)))
+            self._emit("inserted", cur.lastrowid)
             return cur.lastrowid
-    finally:
-        conn.close()
 
-def add_image_item(image_path: str):
-    conn = connect()
-    try:
-        sid = get_current_session_id(conn)
-        ts = int(time.time())
-        with conn:
-            cur = conn.execute(
-                "INSERT INTO items(session_id, type, image_path, status, created_at) VALUES (?,?,?,?,?)",
-                (sid, "image", image_path, "active", ts)
+    @metrics.timed("storage.get_text")
+    def get_text(self, item_id: int) -> str:
+        """取条目全文（大文本从 text_blobs 解压）。走只读连接池，可在任意线程调用。"""
+        with self.reader() as conn:
+            row = conn.execute(
+                "SELECT i.text, i.text_len, b.codec, b.data FROM items i LEFT JOIN text_blobs b ON b.item_id=i.id WHERE i.id=?",
+                (item_id,)).fetchone()
+        if row is None:
+            return ""
+        text, text_len, codec, data = row
+        if text_len is None or data is None:
+            return text or ""
+        return zlib.decompress(data).decode("utf-8")
+
+    @metrics.timed("storage.add_image_item")
+    def add_image_item(self, image_path: str, duplicate_policy: str = "separate", content_hash: str | None = None) -> int:
+        """content_hash 由内容寻址的图片存储给出时，图片登记为 blob，条目插入/删除由触发器维护引用计数。"""
+        h = content_hash or image_hash(image_path)
+        if duplicate_policy == "count":
+            dup = self._bump_duplicate(h)
+            if dup is not None:
+                return dup
+        with self.transaction():
+            if content_hash:
+                try: size = os.path.getsize(image_path)
+                except OSError: size = 0
+                self._conn.execute(
+                    "INSERT INTO blobs(hash, path, size, refcount, touched_at) VALUES (?,?,?,0,?) "
+                    "ON CONFLICT(path) DO UPDATE SET touched_at=excluded.touched_at",
+                    (h, image_path, size, int(time.time()))
+                )
+            cur = self._conn.execute(
+                "INSERT INTO items(session_id, type, image_path, status, created_at, content_hash) VALUES (?,?,?,?,?,?)",
+                (self._session_id, "image", image_path, "active", int(time.time()), h)
             )
+            self._emit("inserted", cur.lastrowid)
             return cur.lastrowid
-    finally:
-        conn.close()
 
-def add_files_item(paths: list[str]):
-    conn = connect()
-    try:
-        sid = get_current_session_id(conn)
-        ts = int(time.time())
-        with conn:
-            cur = conn.execute(
-                "INSERT INTO items(session_id, type, paths_json, status, created_at) VALUES (?,?,?,?,?)",
-                (sid, "files", json.dumps(paths, ensure_ascii=False), "active", ts)
+    @metrics.timed("storage.add_files_item")
+    def add_files_item(self, paths: list[str], duplicate_policy: str = "separate") -> int:
+        h = files_hash(paths)
+        if duplicate_policy == "count":
+            dup = self._bump_duplicate(h)
+            if dup is not None:
+                return dup
+        with self.transaction():
+            cur = self._conn.execute(
+                "INSERT INTO items(session_id, type, paths_json, status, created_at, content_hash) VALUES (?,?,?,?,?,?)",
+                (self._session_id, "files", json.dumps(paths, ensure_ascii=False), "active", int(time.time()), h)
             )
+            self._emit("inserted", cur.lastrowid)
             return cur.lastrowid
-    finally:
-        conn.close()
 
-# ---------- list / status ----------
-def list_items_all(limit=500):
-    conn = connect()
-    try:
-        cur = conn.execute("SELECT * FROM items ORDER BY id ASC LIMIT ?", (limit,))
-        return cur.fetchall()
-    finally:
-        conn.close()
+    # ---------- list / status ----------
+    @metrics.timed("storage.list_items_all")
+    def list_items_all(self, limit=500):
+        return self._conn.execute("SELECT * FROM items ORDER BY id ASC LIMIT ?", (limit,)).fetchall()
 
-def list_favorites(limit=500):
-    conn = connect()
-    try:
-        cur = conn.execute("""
+    # 过滤条件 -> SQL 片段；键固定，所以每种组合的语句文本固定，可命中语句缓存
+    _PAGE_FILTERS = {
+        "type": "i.type=?",
+        "status": "i.status=?",
+        "session_id": "i.session_id=?",
+    }
+
+    @metrics.timed("storage.fetch_page")
+    def fetch_page(self, before_id: int | None = None, after_id: int | None = None,
+                   size: int = 200, filters: dict | None = None, pooled: bool = False, listing: bool = False) -> list:
+        """
+        基于游标（keyset）的分页，按主键走索引，不用 OFFSET：
+          - before_id：紧挨着 before_id 之前（更旧）的 size 条
+          - after_id：紧挨着 after_id 之后（更新）的 size 条
+          - 都不给：最新的 size 条
+        filters 可含 type/status/session_id，以及 favorites=True（只看收藏）。
+        返回行始终按 id 升序。pooled=True 时走只读连接池，可在其他线程调用；listing=True 时只取 LIST_COLUMNS。
+        """
+        sql, args, order = self._page_sql(before_id, after_id, filters or {}, LIST_COLUMNS if listing else "i.*")
+        if pooled:
+            with self.reader() as conn:
+                rows = conn.execute(sql, (*args, size)).fetchall()
+        else:
+            rows = self._conn.execute(sql, (*args, size)).fetchall()
+        if order == "DESC":
+            rows.reverse()
+        return rows
+
+    def _page_sql(self, before_id, after_id, filters: dict, cols: str = "i.*") -> tuple[str, list, str]:
+        where, args = [], []
+        if filters.get("favorites"):
+            src = "collection_map m JOIN items i ON i.id=m.item_id"
+            key = "m.item_id"
+            where.append("m.collection_id=?"); args.append(self._fav_id)
+        else:
+            src = "items i"
+            key = "i.id"
+        for k, clause in self._PAGE_FILTERS.items():
+            if filters.get(k) is not None:
+                where.append(clause); args.append(filters[k])
+        if after_id is not None:
+            where.append(f"{key}>?"); args.append(after_id); order = "ASC"
+        else:
+            if before_id is not None:
+                where.append(f"{key}<?"); args.append(before_id)
+            order = "DESC"
+        sql = f"SELECT {cols} FROM {src}" + (" WHERE " + " AND ".join(where) if where else "") + f" ORDER BY {key} {order} LIMIT ?"
+        return sql, args, order
+
+    @metrics.timed("storage.search")
+    def search(self, query: str, type: str | None = None, status: str | None = None,
+               collection: str | None = None, limit: int = 50, offset: int = 0, listing: bool = False) -> list:
+        """
+        全文检索 text / note / 文件路径，limit/offset 分页；listing=True 时只取 LIST_COLUMNS。
+        查询按空白切词，每个词作为短语、词之间为 AND；短于 FTS_MIN_TERM 的词用 LIKE 过滤。
+        LIKE 用不上索引，没有命中的短词会扫完整张表，所以含短词时只查最新的 SHORT_TERM_WINDOW 个 id，
+        结果是否因此不完整由 search_partial() 判断。
+        相关度只在最新的 SEARCH_RANK_WINDOW 条命中里排序（_rank_hits），之后的命中按新到旧接在后面，翻页时顺序不变：
+        常见词可能命中几十万行，全部打分会让延迟随历史线性增长，而剪贴板历史里越新的越可能是要找的。
+        窗口越大，罕见词（命中稀疏）为凑满窗口要扫的索引越多，500k 条时 100 条窗口约 8 ms。
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        long_terms = [t for t in terms if len(t) >= FTS_MIN_TERM]
+        short_terms = [t for t in terms if len(t) < FTS_MIN_TERM]
+        joins, where, args = [], [], []
+        if collection is not None:
+            joins.append("JOIN collection_map m ON m.item_id=i.id JOIN collections c ON c.id=m.collection_id AND c.name=?")
+            args.append(collection)
+        if long_terms:
+            where.append("items_fts MATCH ?"); args.append(" ".join(_fts_phrase(t) for t in long_terms))
+        for t in short_terms:
+            where.append("(i.text LIKE ? ESCAPE '\\' OR i.note LIKE ? ESCAPE '\\' OR i.paths_json LIKE ? ESCAPE '\\')")
+            args += [_like_pattern(t)] * 3
+        if type is not None:
+            where.append("i.type=?"); args.append(type)
+        if status is not None:
+            where.append("i.status=?"); args.append(status)
+        floor = self._short_term_floor() if short_terms else 0
+        if floor:
+            # 有全文条件时约束落在 items_fts.rowid 上，FTS5 按 rowid 区间就停止迭代
+            where.append("items_fts.rowid>?" if long_terms else "i.id>?"); args.append(floor)
+        cond = " ".join(joins) + " WHERE " + " AND ".join(where)
+        cols = LIST_COLUMNS if listing else "i.*"
+        if not long_terms:
+            sql = f"SELECT {cols} FROM items i {cond} ORDER BY i.id DESC LIMIT ? OFFSET ?"
+            return self._conn.execute(sql, (*args, limit, offset)).fetchall()
+        window = max(self.SEARCH_RANK_WINDOW, offset + limit)
+        sql = (f"SELECT i.id, i.text, i.note, i.paths_json FROM items_fts JOIN items i ON i.id=items_fts.rowid {cond} "
+               f"ORDER BY items_fts.rowid DESC LIMIT ?")
+        hits = self._conn.execute(sql, (*args, window)).fetchall()
+        w = self.SEARCH_RANK_WINDOW
+        ids = (_rank_hits(hits[:w], long_terms) + [h[0] for h in hits[w:]])[offset:offset + limit]
+        if not ids:
+            return []
+        rows = {r[0]: r for r in self._conn.execute(
+            f"SELECT {cols} FROM items i WHERE i.id IN (SELECT value FROM json_each(?))", (json.dumps(ids),))}
+        return [rows[i] for i in ids]
+
+    def _short_term_floor(self) -> int:
+        return max(0, self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM items").fetchone()[0] - self.SHORT_TERM_WINDOW)
+
+    def search_partial(self, query: str) -> bool:
+        """search(query) 是否因含短词只查了最新的 SHORT_TERM_WINDOW 个 id（更早的条目没有查）。"""
+        if not any(len(t) < FTS_MIN_TERM for t in query.split()):
+            return False
+        floor = self._short_term_floor()
+        return bool(floor) and self._conn.execute("SELECT 1 FROM items WHERE id<=? LIMIT 1", (floor,)).fetchone() is not None
+
+    _GET_ITEMS_SQL = "SELECT i.* FROM items i WHERE i.id IN (SELECT value FROM json_each(?)) ORDER BY i.id ASC"
+    _GET_LISTING_SQL = f"SELECT {LIST_COLUMNS} FROM items i WHERE i.id IN (SELECT value FROM json_each(?)) ORDER BY i.id ASC"
+
+    @metrics.timed("storage.get_items")
+    def get_items(self, ids, listing: bool = False) -> list:
+        sql = self._GET_LISTING_SQL if listing else self._GET_ITEMS_SQL
+        return self._conn.execute(sql, (json.dumps(list(ids)),)).fetchall()
+
+    @metrics.timed("storage.list_favorites")
+    def list_favorites(self, limit=500):
+        return self._conn.execute("""
         SELECT i.* FROM items i
-        JOIN collection_map m ON m.item_id=i.id
-        JOIN collections c ON c.id=m.collection_id AND c.name='favorites'
+        JOIN collection_map m ON m.item_id=i.id AND m.collection_id=?
         ORDER BY i.id ASC LIMIT ?
-        """, (limit,))
-        return cur.fetchall()
-    finally:
-        conn.close()
+        """, (self._fav_id, limit)).fetchall()
+
+    @metrics.timed("storage.set_item_used")
+    def set_item_used(self, item_id: int):
+        with self.transaction():
+            self._conn.execute("UPDATE items SET status='used', last_used_at=? WHERE id=?", (int(time.time()), item_id))
+            self._emit("updated", item_id, {"status", "last_used_at"})
+
+    @metrics.timed("storage.set_item_active")
+    def set_item_active(self, item_id: int):
+        with self.transaction():
+            self._conn.execute("UPDATE items SET status='active' WHERE id=?", (item_id,))
+            self._emit("updated", item_id, {"status"})
+
+    @metrics.timed("storage.delete_items")
+    def delete_items(self, ids, reclaim: bool = True, grace_s: int = 60) -> list[str]:
+        """
+        批量删除：id 先写入临时表，再用一条 DELETE ... IN (SELECT ...) 删除，级联和触发器在 SQLite 内部完成。
+        reclaim=True 时同一事务里回收因此不再被引用的图片，返回这些文件路径（由调用方在后台删除）：
+          - blobs 里引用计数归零、且 grace_s 内没有重新登记的（刚登记的留给 reclaim_blobs 以后回收）
+          - 没有登记为 blob 的旧条目图片，已没有其他条目引用的
+        """
+        if not ids:
+            return []
+        conn = self._conn
+        freed: list[str] = []
+        with self.transaction():
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS del_ids(id INTEGER PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO temp.del_ids(id) VALUES (?)", ((i,) for i in ids))
+            deleted = [r[0] for r in conn.execute("SELECT id FROM items WHERE id IN (SELECT id FROM temp.del_ids)")]
+            images = [r[0] for r in conn.execute(
+                "SELECT DISTINCT image_path FROM items WHERE id IN (SELECT id FROM temp.del_ids) "
+                "AND type='image' AND image_path IS NOT NULL")] if reclaim else []
+            conn.execute("DELETE FROM items WHERE id IN (SELECT id FROM temp.del_ids)")
+            conn.execute("DELETE FROM temp.del_ids")
+            if images:
+                paths = json.dumps(images)
+                cutoff = int(time.time()) - grace_s
+                registered = {r[0] for r in conn.execute(
+                    "SELECT path FROM blobs WHERE path IN (SELECT value FROM json_each(?))", (paths,))}
+                freed = [r[0] for r in conn.execute(
+                    "SELECT path FROM blobs WHERE path IN (SELECT value FROM json_each(?)) AND refcount<=0 AND touched_at<?",
+                    (paths, cutoff))]
+                conn.execute("DELETE FROM blobs WHERE path IN (SELECT value FROM json_each(?)) AND refcount<=0 AND touched_at<?",
+                             (paths, cutoff))
+                legacy = set(images) - registered
+                if legacy:
+                    # 一次按类型索引扫描图片条目，找出仍被引用的
+                    still = {r[0] for r in conn.execute(
+                        "SELECT image_path FROM items WHERE type='image' AND image_path IN (SELECT value FROM json_each(?))",
+                        (json.dumps(list(legacy)),))}
+                    freed += sorted(legacy - still)
+            for i in deleted:
+                self._emit("deleted", i)
+        return freed
+
+    @metrics.timed("storage.purge_fts")
+    def purge_fts(self, batch: int = 2000) -> int:
+        """从全文索引里删掉最多 batch 条已删除条目的残留，返回删除条数（0 表示已清理完）。"""
+        conn = self._conn
+        with self.transaction():
+            ids = json.dumps([r[0] for r in conn.execute("SELECT id FROM fts_gc LIMIT ?", (batch,))])
+            conn.execute("DELETE FROM items_fts WHERE rowid IN (SELECT value FROM json_each(?))", (ids,))
+            return conn.execute("DELETE FROM fts_gc WHERE id IN (SELECT value FROM json_each(?))", (ids,)).rowcount
+
+    @metrics.timed("storage.reclaim_blobs")
+    def reclaim_blobs(self, grace_s: int = 60) -> list[str]:
+        """
+        删除引用计数归零的 blob 记录并返回其文件路径（由调用方删除文件）。
+        grace_s 内刚登记过的 blob 不回收，避免和正在写入同一图片的捕获线程竞争。
+        """
+        cutoff = int(time.time()) - grace_s
+        with self.transaction():
+            rows = self._conn.execute("SELECT path FROM blobs WHERE refcount<=0 AND touched_at<?", (cutoff,)).fetchall()
+            self._conn.executemany("DELETE FROM blobs WHERE path=? AND refcount<=0", rows)
+        return [r[0] for r in rows]
+
+    # ---------- retention ----------
+    # 可淘汰：未置顶且不在收藏里
+    _EVICTABLE = "pinned=0 AND NOT EXISTS (SELECT 1 FROM collection_map m WHERE m.collection_id=? AND m.item_id=items.id)"
+
+    @metrics.timed("storage.evict_batch")
+    def evict_batch(self, max_age_s: int = 0, max_items: int = 0, max_bytes: int = 0, batch: int = 200) -> list[int]:
+        """
+        按保留策略删除最多 batch 条最旧的可淘汰条目，返回被删除的 id（为空表示已满足策略）。
+        依次检查：早于 max_age_s、可淘汰条目数超过 max_items、总字节数超过 max_bytes；0 表示不限。
+        总字节数 = 行内文本与文件列表长度 + 大文本压缩后大小 + blobs 中图片文件大小。
+        """
+        conn = self._conn
+        ev = self._EVICTABLE
+        ids: list[int] = []
+        if max_age_s > 0:
+            ids = [r[0] for r in conn.execute(
+                f"SELECT id FROM items WHERE created_at<? AND {ev} ORDER BY id LIMIT ?",
+                (int(time.time()) - max_age_s, self._fav_id, batch))]
+        if not ids and max_items > 0:
+            excess = conn.execute(f"SELECT COUNT(*) FROM items WHERE {ev}", (self._fav_id,)).fetchone()[0] - max_items
+            if excess > 0:
+                ids = [r[0] for r in conn.execute(
+                    f"SELECT id FROM items WHERE {ev} ORDER BY id LIMIT ?", (self._fav_id, min(excess, batch)))]
+        if not ids and max_bytes > 0 and self.total_bytes() > max_bytes:
+            ids = [r[0] for r in conn.execute(f"SELECT id FROM items WHERE {ev} ORDER BY id LIMIT ?", (self._fav_id, batch))]
+        self.delete_items(ids, reclaim=False)   # 图片由保留线程随后的 reclaim_blobs/孤儿清理回收
+        return ids
+
+    def total_bytes(self) -> int:
+        conn = self._conn
+        n = conn.execute(
+            "SELECT COALESCE(SUM(COALESCE(LENGTH(CAST(text AS BLOB)),0) + COALESCE(LENGTH(paths_json),0)),0) FROM items"
+        ).fetchone()[0]
+        n += conn.execute("SELECT COALESCE(SUM(LENGTH(data)),0) FROM text_blobs").fetchone()[0]
+        return n + conn.execute("SELECT COALESCE(SUM(size),0) FROM blobs").fetchone()[0]
+
+    def image_paths(self) -> set[str]:
+        """仍被引用的图片文件：blobs 登记的 + 旧条目直接记录的 image_path。"""
+        conn = self._conn
+        paths = {r[0] for r in conn.execute("SELECT path FROM blobs")}
+        paths.update(r[0] for r in conn.execute("SELECT DISTINCT image_path FROM items WHERE type='image' AND image_path IS NOT NULL"))
+        return {os.path.normcase(os.path.abspath(p)) for p in paths}
+
+    def incremental_vacuum_enabled(self) -> bool:
+        return self._conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def db_bytes(self) -> int:
+        conn = self._conn
+        return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+    def enable_incremental_vacuum(self, max_bytes: int | None = None) -> bool:
+        """
+        旧库（auto_vacuum=NONE）转换为 INCREMENTAL，需要一次整库 VACUUM；返回是否做了转换。
+        给了 max_bytes 时库超过该大小就不转换：VACUUM 会重写整个文件并一直持有写锁，大库交给用户手动 vacuum()。
+        """
+        if self.incremental_vacuum_enabled() or (max_bytes is not None and self.db_bytes() > max_bytes):
+            return False
+        self.vacuum()
+        return True
+
+    @metrics.timed("storage.vacuum")
+    def vacuum(self) -> int:
+        """整库 VACUUM（旧库顺带转换为 INCREMENTAL），返回库缩小的字节数。耗时与库大小成正比，只在后台线程调用。"""
+        conn = self._conn
+        before = self.db_bytes()
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return max(0, before - self.db_bytes())
+
+    def incremental_vacuum(self, pages: int = 256) -> int:
+        """归还最多 pages 个空闲页给文件系统，返回剩余空闲页数。"""
+        conn = self._conn
+        # execute() 只单步执行一次（只释放一页），executescript 才会跑完整条 PRAGMA
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    # ---------- favorites ----------
+    @metrics.timed("storage.set_favorite")
+    def set_favorite(self, item_id: int, fav: bool):
+        with self.transaction():
+            if fav:
+                self._conn.execute("INSERT OR IGNORE INTO collection_map(collection_id, item_id) VALUES (?,?)", (self._fav_id, item_id))
+            else:
+                self._conn.execute("DELETE FROM collection_map WHERE collection_id=? AND item_id=?", (self._fav_id, item_id))
+            self._emit("favorite_changed", item_id, fav)
+
+    _FAV_IDS_SQL = "SELECT item_id FROM collection_map WHERE collection_id=?"
+    _IS_FAV_SQL = "SELECT 1 FROM collection_map WHERE collection_id=? AND item_id=? LIMIT 1"
+
+    @metrics.timed("storage.favorite_ids")
+    def favorite_ids(self, pooled: bool = False) -> set[int]:
+        if pooled:
+            with self.reader() as conn:
+                return {r[0] for r in conn.execute(self._FAV_IDS_SQL, (self._fav_id,))}
+        return {r[0] for r in self._conn.execute(self._FAV_IDS_SQL, (self._fav_id,))}
+
+    @metrics.timed("storage.is_favorite")
+    def is_favorite(self, item_id: int) -> bool:
+        return self._conn.execute(self._IS_FAV_SQL, (self._fav_id, item_id)).fetchone() is not None
+
+    # ---------- 查询计划检查 ----------
+    # 热路径查询 -> 计划里必须出现的访问方式（正则）。加索引、改查询或升级 SQLite 后跑
+    # check_query_plans()（benchmarks/check_schema.py），防止某条查询悄悄退化成全表扫描或临时排序。
+    def hot_queries(self) -> list[tuple[str, str, tuple, str]]:
+        """(名称, SQL, 参数, 期望的计划片段)；分页语句取自 _page_sql，与 fetch_page 实际执行的一致。"""
+        out = []
+        pages = (
+            ("page", {}, r"SCAN i\b|INTEGER PRIMARY KEY"),
+            ("page.type", {"type": "text"}, r"INDEX idx_items_type \(type=\?"),
+            ("page.status", {"status": "active"}, r"INDEX idx_items_status \(status=\?"),
+            ("page.session", {"session_id": 1}, r"INDEX idx_items_session \(session_id=\?"),
+            ("page.favorites", {"favorites": True}, r"INDEX sqlite_autoindex_collection_map_1 \(collection_id=\?"),
+        )
+        for name, filters, expect in pages:
+            for suffix, before_id, after_id in (("", None, None), (".older", 1000, None), (".newer", None, 1000)):
+                sql, args, _ = self._page_sql(before_id, after_id, filters)
+                out.append((name + suffix, sql, (*args, 200), expect))
+        fav = self._fav_id
+        out += [
+            ("dedup", self._DUP_SQL, ("x",), r"INDEX idx_items_hash \(content_hash=\?"),
+            ("get_items", self._GET_ITEMS_SQL, ("[1]",), r"INTEGER PRIMARY KEY \(rowid=\?"),
+            ("favorite_ids", self._FAV_IDS_SQL, (fav,), r"INDEX sqlite_autoindex_collection_map_1 \(collection_id=\?"),
+            ("is_favorite", self._IS_FAV_SQL, (fav, 1), r"\(collection_id=\? AND item_id=\?"),
+            # 删除条目时外键级联按 item_id 查 collection_map；EXPLAIN 看不到级联，用等价语句代替
+            ("cascade.collection_map", "DELETE FROM collection_map WHERE item_id=?", (1,),
+             r"INDEX idx_collection_map_item \(item_id=\?"),
+            ("evict", f"SELECT id FROM items WHERE {self._EVICTABLE} ORDER BY id LIMIT ?", (fav, 200),
+             r"\(collection_id=\? AND item_id=\?"),
+            ("export", self._EXPORT_SQL, (0, 1000), r"INTEGER PRIMARY KEY \(rowid>\?"),
+        ]
+        return out
+
+    def check_query_plans(self) -> list[str]:
+        """对 hot_queries() 逐条 EXPLAIN QUERY PLAN，返回不合格的说明（空列表表示全部通过）。"""
+        failures = []
+        for name, sql, args, expect in self.hot_queries():
+            plan = "\n".join(r[3] for r in self._conn.execute("EXPLAIN QUERY PLAN " + sql, args))
+            if not re.search(expect, plan):
+                failures.append(f"{name}: 计划里没有 /{expect}/\n{plan}")
+            elif "USE TEMP B-TREE" in plan:
+                failures.append(f"{name}: 需要临时排序\n{plan}")
+        return failures
+
+    # ---------- 导出 / 导入（NDJSON） ----------
+    EXPORT_FORMAT = "clipboard-sequencer"
+    EXPORT_VERSION = 1
+
+    _EXPORT_SQL = """
+    SELECT i.id, i.type, i.text, i.image_path, i.paths_json, i.count, i.status, i.pinned, i.edited, i.note,
+           i.created_at, i.last_used_at, i.content_hash, i.text_len, b.data,
+           (SELECT group_concat(c.name, char(31)) FROM collections c WHERE EXISTS
+              (SELECT 1 FROM collection_map m WHERE m.collection_id=c.id AND m.item_id=i.id))
+    FROM items i LEFT JOIN text_blobs b ON b.item_id=i.id
+    WHERE i.id>? ORDER BY i.id LIMIT ?
+    """
+
+    def iter_export(self, batch: int = 1000, embed_images: bool = False, embed_files: bool = False):
+        """
+        逐条产出导出记录（dict），按 id 游标分批读取（只读连接池），内存占用与历史大小无关：
+          header 一条 → 每个收藏夹一条 collection → 每个条目一条 item（id 升序）
+        item 的 text 是全文（大文本已解压）；图片/文件默认只记路径，
+        embed_images / embed_files 时把文件内容 base64 内嵌（image_data / files[].data），换机器也能还原。
+        """
+        yield {"kind": "header", "format": self.EXPORT_FORMAT, "version": self.EXPORT_VERSION,
+               "schema": SCHEMA_VERSION, "exported_at": int(time.time())}
+        with self.reader() as conn:
+            names = [r[0] for r in conn.execute("SELECT name FROM collections ORDER BY id")]
+        for name in names:
+            yield {"kind": "collection", "name": name}
+        last = 0
+        while True:
+            with self.reader() as conn:
+                rows = conn.execute(self._EXPORT_SQL, (last, batch)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for (item_id, kind, text, image_path, paths_json, count, status, pinned, edited, note,
+                 created_at, last_used_at, h, text_len, blob, colls) in rows:
+                rec = {"kind": "item", "id": item_id, "type": kind, "count": count, "status": status,
+                       "pinned": bool(pinned), "edited": bool(edited), "note": note,
+                       "created_at": created_at, "last_used_at": last_used_at, "hash": h}
+                if kind == "text":
+                    rec["text"] = zlib.decompress(blob).decode("utf-8") if text_len is not None and blob else (text or "")
+                elif kind == "image":
+                    rec["image_path"] = image_path
+                    if embed_images:
+                        data = _read_b64(image_path)
+                        if data is not None:
+                            rec["image_data"] = data
+                else:
+                    try: paths = json.loads(paths_json or "[]")
+                    except ValueError: paths = []
+                    rec["paths"] = paths
+                    if embed_files:
+                        rec["files"] = [{"path": p, "data": d} for p in paths if (d := _read_b64(p)) is not None]
+                if colls:
+                    rec["collections"] = colls.split("\x1f")
+                yield rec
+
+    def import_records(self, records, batch: int = 20000, progress=None) -> dict:
+        """
+        导入 iter_export() 格式的记录流：每 batch 条一个事务，executemany 批量插入。
+        按内容哈希去重：库里（或本批里）已有相同内容的条目跳过，但其收藏夹归属照样合并。
+        导入的条目不属于任何会话；不经 listener 通知，界面需要重新载入。
+        progress(stats) 在每批提交后调用。返回 {"items", "duplicates", "skipped"}。
+        """
+        stats = {"items": 0, "duplicates": 0, "skipped": 0}
+        chunk = []
+        for rec in records:
+            kind = rec.get("kind")
+            if kind == "item":
+                chunk.append(rec)
+                if len(chunk) >= batch:
+                    self._import_chunk(chunk, stats); chunk = []
+                    if progress: progress(stats)
+            elif kind == "collection":
+                with self.transaction():
+                    self._conn.execute("INSERT OR IGNORE INTO collections(name) VALUES (?)", (rec["name"],))
+            elif kind == "header":
+                if rec.get("format") != self.EXPORT_FORMAT or rec.get("version", 0) > self.EXPORT_VERSION:
+                    raise ValueError(f"不支持的导出格式：{rec.get('format')} v{rec.get('version')}")
+        if chunk:
+            self._import_chunk(chunk, stats)
+            if progress: progress(stats)
+        return stats
+
+    def _import_row(self, rec: dict):
+        """一条 item 记录 → (content_hash, items 行, 大文本 blob, 图片 blob 登记)；不认识的类型返回 None。"""
+        kind = rec.get("type")
+        text = image_path = paths_json = text_len = big = reg = None
+        if kind == "text":
+            full = rec.get("text") or ""
+            h = text_hash(full)
+            data = full.encode("utf-8")
+            if len(data) > self.large_text_bytes:
+                text, text_len, big = full[:self.TEXT_PREVIEW_CHARS], len(full), zlib.compress(data, 6)
+            else:
+                text = full
+        elif kind == "image":
+            image_path = rec.get("image_path") or ""
+            h = rec.get("hash")
+            if rec.get("image_data"):
+                raw = base64.b64decode(rec["image_data"])
+                h = h or _digest("image", raw)
+                image_path = os.path.join(cache_img_dir(), h + (os.path.splitext(image_path)[1] or ".png"))
+                if not os.path.exists(image_path):
+                    _write_atomic(image_path, raw)
+            h = h or image_hash(image_path)
+            if os.path.dirname(os.path.abspath(image_path)) == os.path.abspath(cache_img_dir()) and os.path.exists(image_path):
+                reg = (h, image_path, os.path.getsize(image_path), int(time.time()))
+        elif kind == "files":
+            paths = [str(p) for p in rec.get("paths") or ()]
+            restored = {f["path"]: f["data"] for f in rec.get("files") or ()}
+            for i, p in enumerate(paths):
+                if p in restored and not os.path.exists(p):
+                    # 原路径不存在：内嵌的文件还原到数据目录下
+                    dst = os.path.join(data_dir(), "imported", _digest("files", p.encode("utf-8")), os.path.basename(p))
+                    if not os.path.exists(dst):
+                        os.makedirs(os.path.dirname(dst), exist_ok=True)
+                        _write_atomic(dst, base64.b64decode(restored[p]))
+                    paths[i] = dst
+            h = files_hash(paths)
+            paths_json = json.dumps(paths, ensure_ascii=False)
+        else:
+            return None
+        row = (kind, text, image_path, paths_json, rec.get("count") or 1, rec.get("status") or "active",
+               int(bool(rec.get("pinned"))), int(bool(rec.get("edited"))), rec.get("note"),
+               rec.get("created_at") or int(time.time()), rec.get("last_used_at"), h, text_len)
+        return h, row, big, reg
+
+    def _existing_hashes(self, hashes: list[str]) -> set[str]:
+        found = set()
+        for i in range(0, len(hashes), 500):
+            part = hashes[i:i + 500]
+            found.update(r[0] for r in self._conn.execute(
+                f"SELECT content_hash FROM items WHERE content_hash IN ({','.join('?' * len(part))})", part))
+        return found
+
+    def _import_chunk(self, recs: list[dict], stats: dict):
+        prepared = []
+        for rec in recs:
+            p = self._import_row(rec)
+            if p is None:
+                stats["skipped"] += 1
+            else:
+                prepared.append((p, rec.get("collections") or ()))
+        with self.transaction() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")   # 先拿写锁：下面的查重和 max(id) 不会被其他写入打断
+            seen = self._existing_hashes(list({p[0] for p, _ in prepared}))
+            rows, bigs, regs, members = [], [], [], []
+            for (h, row, big, reg), colls in prepared:
+                members += [(c, h) for c in colls]
+                if h in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(h)
+                rows.append(row)
+                if big is not None: bigs.append((big, h))
+                if reg is not None: regs.append(reg)
+            # 逐行的全文索引触发器比一次性 INSERT ... SELECT 慢近十倍：本事务内先摘掉，插完按 id 区间补索引再装回。
+            # DDL 随事务提交，其他连接看不到触发器缺失的中间状态
+            fts_trigger = conn.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name='trg_fts_ins'").fetchone() if rows else None
+            if fts_trigger:
+                conn.execute("DROP TRIGGER trg_fts_ins")
+            first = conn.execute("SELECT COALESCE(MAX(id), 0) FROM items").fetchone()[0]
+            # 图片 blob 先登记，插入条目时触发器才能增加引用计数
+            conn.executemany("INSERT INTO blobs(hash, path, size, refcount, touched_at) VALUES (?,?,?,0,?) "
+                             "ON CONFLICT(path) DO UPDATE SET touched_at=excluded.touched_at", regs)
+            conn.executemany("INSERT INTO items(type, text, image_path, paths_json, count, status, pinned, edited, note, "
+                             "created_at, last_used_at, content_hash, text_len) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+            # 新行的 id 不逐条取回，按内容哈希找（本批里哈希唯一）
+            conn.executemany("INSERT INTO text_blobs(item_id, codec, data) "
+                             "SELECT id, 'zlib', ? FROM items WHERE content_hash=? ORDER BY id DESC LIMIT 1", bigs)
+            conn.executemany("INSERT OR IGNORE INTO collections(name) VALUES (?)", [(c,) for c in {c for c, _ in members}])
+            conn.executemany("INSERT OR IGNORE INTO collection_map(collection_id, item_id) "
+                             "SELECT c.id, (SELECT id FROM items WHERE content_hash=? ORDER BY id DESC LIMIT 1) "
+                             "FROM collections c WHERE c.name=?", [(h, c) for c, h in members])
+            if fts_trigger:
+                conn.execute("INSERT INTO items_fts(rowid, text, note, paths) SELECT id, text, note, "
+                             "(SELECT group_concat(value, ' ') FROM json_each(paths_json)) FROM items WHERE id>?", (first,))
+                conn.execute(fts_trigger[0])
+        stats["items"] += len(rows)
+
+SCHEMA_VERSION = StorageEngine.MIGRATIONS[-1][0]
+
+# ---------- 模块级接口：每个线程一个长连接引擎 ----------
+_local = threading.local()
+
+class _EngineHolder:
+    """线程结束时 threading.local 释放持有者，随之关闭该线程的引擎：短命线程不会留下打开的连接。"""
+    __slots__ = ("engine",)
+
+    def __init__(self, engine: StorageEngine):
+        self.engine = engine
+
+    def __del__(self):
+        try:
+            self.engine.close()
+        except sqlite3.Error as e:   # 含 ProgrammingError（例如在别的线程里被释放）
+            log.warning("关闭线程 %s 的存储引擎失败：%s", threading.current_thread().name, e)
+
+def get_engine(large_text_bytes: int | None = None) -> StorageEngine:
+    """本线程的引擎；第一次调用时创建，large_text_bytes 只在创建时生效。"""
+    h = getattr(_local, "holder", None)
+    if h is None:
+        h = _local.holder = _EngineHolder(StorageEngine(large_text_bytes=large_text_bytes))
+    return h.engine
+
+def close_engine():
+    """立即关闭本线程的引擎（之后再调用 get_engine 会新建）。"""
+    if getattr(_local, "holder", None) is not None:
+        del _local.holder   # 持有者随即释放，由 __del__ 关闭
+
+def init_db():
+    get_engine()
+
+def add_text_item(text: str, duplicate_policy: str, large_text_bytes: int | None = None):
+    return get_engine().add_text_item(text, duplicate_policy, large_text_bytes)
+
+def add_image_item(image_path: str, duplicate_policy: str = "separate", content_hash: str | None = None):
+    return get_engine().add_image_item(image_path, duplicate_policy, content_hash)
+
+def add_files_item(paths: list[str], duplicate_policy: str = "separate"):
+    return get_engine().add_files_item(paths, duplicate_policy)
+
+def list_items_all(limit=500):
+    return get_engine().list_items_all(limit)
+
+def fetch_page(before_id: int | None = None, after_id: int | None = None, size: int = 200, filters: dict | None = None):
+    return get_engine().fetch_page(before_id, after_id, size, filters)
+
+def search(query: str, type: str | None = None, status: str | None = None,
+           collection: str | None = None, limit: int = 50, offset: int = 0):
+    return get_engine().search(query, type, status, collection, limit, offset)
+
+def get_text(item_id: int) -> str:
+    return get_engine().get_text(item_id)
+
+def get_items(ids) -> list:
+    return get_engine().get_items(ids)
+
+def list_favorites(limit=500):
+    return get_engine().list_favorites(limit)
 
 def set_item_used(item_id: int):
-    conn = connect()
-    try:
-        ts = int(time.time())
-        with conn:
-            conn.execute("UPDATE items SET status='used', last_used_at=? WHERE id=?", (ts, item_id))
-    finally:
-        conn.close()
+    get_engine().set_item_used(item_id)
 
 def set_item_active(item_id: int):
-    conn = connect()
-    try:
-        with conn:
-            conn.execute("UPDATE items SET status='active' WHERE id=?", (item_id,))
-    finally:
-        conn.close()
+    get_engine().set_item_active(item_id)
 
-def delete_items(ids: list[int]):
-    if not ids:
-        return
-    conn = connect()
-    try:
-        with conn:
-            conn.executemany("DELETE FROM items WHERE id=?", [(i,) for i in ids])
-    finally:
-        conn.close()
+def delete_items(ids, reclaim: bool = True, grace_s: int = 60) -> list[str]:
+    return get_engine().delete_items(ids, reclaim, grace_s)
 
-# ---------- favorites ----------
-def _favorites_id(conn: sqlite3.Connection) -> int:
-    r = conn.execute("SELECT id FROM collections WHERE name='favorites'").fetchone()
-    return r[0]
+def reclaim_blobs(grace_s: int = 60) -> list[str]:
+    return get_engine().reclaim_blobs(grace_s)
 
 def set_favorite(item_id: int, fav: bool):
-    conn = connect()
-    try:
-        cid = _favorites_id(conn)
-        with conn:
-            if fav:
-                conn.execute("INSERT OR IGNORE INTO collection_map(collection_id, item_id) VALUES (?,?)", (cid, item_id))
-            else:
-                conn.execute("DELETE FROM collection_map WHERE collection_id=? AND item_id=?", (cid, item_id))
-    finally:
-        conn.close()
+    get_engine().set_favorite(item_id, fav)
+
+def favorite_ids() -> set[int]:
+    return get_engine().favorite_ids()
 
 def is_favorite(item_id: int) -> bool:
-    conn = connect()
+    return get_engine().is_favorite(item_id)
+
+# ---------- 导出 / 导入命令：python -m core.storage export|import PATH ----------
+def _open_stream(path: str, mode: str):
+    """"-" 为标准输入/输出，.gz 结尾按 gzip 读写；一律二进制。"""
+    if path == "-":
+        return (sys.stdout if "w" in mode else sys.stdin).buffer
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+def export_ndjson(out, engine: StorageEngine | None = None, progress=None, every: int = 10000, **opts) -> int:
+    """把 iter_export() 的记录逐行写成 NDJSON 到二进制流 out，返回条目数；每 every 条调用 progress(n)。"""
+    n = 0
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for rec in (engine or get_engine()).iter_export(**opts):
+        out.write(dumps(rec).encode("utf-8") + b"\n")
+        if rec["kind"] == "item":
+            n += 1
+            if progress and n % every == 0:
+                progress(n)
+    return n
+
+def iter_ndjson(fp, counter: list | None = None):
+    """逐行解析 NDJSON（二进制流），跳过空行；counter[0] 累加已读字节数，供进度显示。"""
+    for line in fp:
+        if counter is not None:
+            counter[0] += len(line)
+        if line.strip():
+            yield json.loads(line)
+
+def import_ndjson(fp, engine: StorageEngine | None = None, batch: int = 20000, progress=None) -> dict:
+    return (engine or get_engine()).import_records(iter_ndjson(fp), batch, progress)
+
+def _configured_large_text_kb() -> int | None:
+    # 直接读 settings.json：core.settings 依赖 PyQt6，命令行不加载它
+    try:
+        with open(os.path.join(data_dir(), "settings.json"), "r", encoding="utf-8") as f:
+            return int(json.load(f).get("large_text_kb") or 0) or None
+    except (OSError, ValueError, TypeError, AttributeError):
+        return None
+
+def main(argv=None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(prog="python -m core.storage", description="导出/导入剪贴板历史（NDJSON）")
+    ap.add_argument("--db", help="数据库路径（默认数据目录下的 data.db）")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export"); p.add_argument("path", help="输出文件，- 为标准输出，.gz 结尾则压缩")
+    p.add_argument("--embed-images", action="store_true", help="图片内容内嵌为 base64")
+    p.add_argument("--embed-files", action="store_true", help="文件条目引用的文件内容内嵌为 base64")
+    p = sub.add_parser("import"); p.add_argument("path", help="输入文件，- 为标准输入，.gz 结尾则解压")
+    p.add_argument("--batch", type=int, default=20000, help="每个事务的条数")
+    ap.add_argument("--large-text-kb", type=int, help="超过此大小的文本单独压缩存放（默认取设置里的 large_text_kb）")
+    a = ap.parse_args(argv)
+    kb = a.large_text_kb if a.large_text_kb is not None else _configured_large_text_kb()
+    eng = StorageEngine(a.db, large_text_bytes=kb * 1024 if kb else None)
+    t = time.perf_counter()
     try:
-        cid = _favorites_id(conn)
-        r = conn.execute("SELECT 1 FROM collection_map WHERE collection_id=? AND item_id=? LIMIT 1", (cid, item_id)).fetchone()
-        return r is not None
+        if a.cmd == "export":
+            with _open_stream(a.path, "wb") as out:
+                n = export_ndjson(out, eng, progress=lambda n: print(f"\r已导出 {n} 条", end="", file=sys.stderr),
+                                  embed_images=a.embed_images, embed_files=a.embed_files)
+            print(f"\r已导出 {n} 条，用时 {time.perf_counter() - t:.1f}s", file=sys.stderr)
+        else:
+            size = os.path.getsize(a.path) if a.path != "-" and not a.path.endswith(".gz") else 0
+            read = [0]
+            def progress(st):
+                pct = f"（{read[0] * 100 // size}%）" if size else ""
+                print(f"\r已导入 {st['items']} 条，重复 {st['duplicates']} 条{pct}", end="", file=sys.stderr)
+            with _open_stream(a.path, "rb") as fp:
+                st = eng.import_records(iter_ndjson(fp, read), a.batch, progress)
+            print(f"\r已导入 {st['items']} 条，重复 {st['duplicates']} 条，跳过 {st['skipped']} 条，"
+                  f"用时 {time.perf_counter() - t:.1f}s", file=sys.stderr)
     finally:
-        conn.close()
+        eng.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,48 +1,95 @@
 # -*- coding: utf-8 -*-
-import re
-from typing import Literal
+"""
+文本合并：把多段文本按模式拼成一段。
 
-def join_texts(parts: list[str], mode: Literal['cjk','english','custom']='cjk', custom_sep: str='') -> str:
-    if not parts:
-        return ""
-    parts = [p.strip() for p in parts if p is not None]
-    if mode == 'custom':
-        return custom_sep.join(parts)
-    if mode == 'english':
-        return _join_english(parts)
-    return _join_cjk(parts)
+单遍增量构建：段与段之间的分隔符只看上一段末字符与本段首字符（区间表判断 CJK），
+按块（CHUNK_CHARS）拼接后用预编译正则整理标点空格；iter_join() 逐块产出，
+join_texts() 是它的 "".join。
+"""
+from __future__ import annotations
+import bisect, re
+from functools import lru_cache
+from typing import Iterable, Iterator, Literal
+
+Mode = Literal['cjk', 'english', 'custom']
 
-def _join_english(parts: list[str]) -> str:
-    s = " ".join(parts)
-    s = re.sub(r"\s+([,\.\!\?])", r"\1", s)      # remove space before punct
-    s = re.sub(r"([,\.\!\?])(\w)", r"\1 \2", s)  # ensure space after punct
-    return s
+# CJK 码位区间表（闭区间，按起点升序，互不重叠），含标点、假名、谚文与全角形式
+_CJK_RANGES = (
+    (0x1100, 0x11FF),    # Hangul Jamo
+    (0x2E80, 0x2FDF),    # CJK Radicals Supplement, Kangxi Radicals
+    (0x2FF0, 0x4DBF),    # 表意文字描述符、CJK 符号和标点、假名、注音、谚文兼容字母、CJK 笔画/兼容、扩展 A
+    (0x4E00, 0x9FFF),    # CJK Unified Ideographs
+    (0xA960, 0xA97F),    # Hangul Jamo Extended-A
+    (0xAC00, 0xD7FF),    # Hangul Syllables, Jamo Extended-B
+    (0xF900, 0xFAFF),    # CJK Compatibility Ideographs
+    (0xFE10, 0xFE1F),    # Vertical Forms
+    (0xFE30, 0xFE4F),    # CJK Compatibility Forms
+    (0xFF00, 0xFFEF),    # Halfwidth and Fullwidth Forms（全角标点）
+    (0x1B000, 0x1B16F),  # Kana Supplement / Extended-A
+    (0x1F200, 0x1F2FF),  # Enclosed Ideographic Supplement
+    (0x20000, 0x323AF),  # 扩展 B–H 及兼容补充
+)
+_CJK_STARTS = tuple(a for a, _ in _CJK_RANGES)
+_CJK_ENDS = tuple(b for _, b in _CJK_RANGES)
 
+# 零宽断言 + 字面量替换，避免逐个匹配展开分组模板
+_RE_CJK_PUNCT_SPACE = re.compile(r"\s+(?=[，。！？；：、])")   # CJK 标点前不留空格
+_RE_EN_PUNCT_SPACE = re.compile(r"\s+(?=[,\.\!\?])")        # 英文标点前不留空格
+_RE_EN_PUNCT_WORD = re.compile(r"(?<=[,\.\!\?])(?=\w)")       # 英文标点后补一个空格
+
+CHUNK_CHARS = 64 * 1024   # iter_join 每攒够这么多字符做一次正则整理并产出
+
+@lru_cache(maxsize=4096)
 def _is_cjk(ch: str) -> bool:
-    return any([
-        "\u4e00" <= ch <= "\u9fff",   # CJK Unified Ideographs
-        "\u3040" <= ch <= "\u30ff",   # JP Hiragana & Katakana
-        "\uac00" <= ch <= "\ud7af",   # Hangul
-    ])
-
-def _join_cjk(parts: list[str]) -> str:
-    out = []
-    prev_last = ""
+    cp = ord(ch)
+    if cp < 0x1100:
+        return False
+    i = bisect.bisect_right(_CJK_STARTS, cp) - 1
+    return i >= 0 and cp <= _CJK_ENDS[i]
+
+def iter_join(parts: Iterable[str | None], mode: Mode = 'cjk', custom_sep: str = '') -> Iterator[str]:
+    """逐段产出合并结果的文本块；None 会被跳过，各段先 strip。"""
+    if mode == 'custom':
+        first = True
+        for p in parts:
+            if p is None:
+                continue
+            if not first:
+                yield custom_sep
+            first = False
+            yield p.strip()
+        return
+
+    english = mode == 'english'
+    is_cjk = _is_cjk
+    buf: list[str] = []
+    size = 0
+    prev = None      # 上一段的末字符；None 表示还没有段，"" 表示上一段为空
     for p in parts:
-        if not out:
-            out.append(p)
-        else:
-            a = prev_last[-1] if prev_last else ""
-            b = p[0] if p else ""
-            if (a and _is_cjk(a)) and (b and _is_cjk(b)):
-                out.append(p)               # CJK-CJK: no space
-            elif (a and _is_cjk(a)) and (b and not _is_cjk(b)):
-                out.append(" " + p)         # CJK -> Latin: space
-            elif (a and not _is_cjk(a)) and (b and _is_cjk(b)):
-                out.append(" " + p)         # Latin -> CJK: space
-            else:
-                out.append(" " + p)         # Latin -> Latin: space
-        prev_last = p[-1] if p else ""
-    s = "".join(out)
-    s = re.sub(r"\s+([，。！？；：、])", r"\1", s)  # no spaces before CJK punct
-    return s
+        if p is None:
+            continue
+        p = p.strip()
+        if prev is not None and (english or not (prev and p and is_cjk(prev) and is_cjk(p[0]))):
+            buf.append(" ")
+        buf.append(p)
+        prev = p[-1] if p else ""
+        # 只在非空段之后切块：块尾不会是空白，标点前的空白总在同一块内
+        if p:
+            size += len(p)
+            if size >= CHUNK_CHARS:
+                yield _tidy("".join(buf), english)
+                buf = []; size = 0
+    if buf:
+        yield _tidy("".join(buf), english)
+
+def _tidy(s: str, english: bool) -> str:
+    if english:
+        return _RE_EN_PUNCT_WORD.sub(" ", _RE_EN_PUNCT_SPACE.sub("", s))
+    return _RE_CJK_PUNCT_SPACE.sub("", s)
+
+def join_texts(parts: list[str], mode: Mode = 'cjk', custom_sep: str = '') -> str:
+    if not parts:
+        return ""
+    if mode == 'custom':
+        return custom_sep.join(p.strip() for p in parts if p is not None)
+    return "".join(iter_join(parts, mode, custom_sep))
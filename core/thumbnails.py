@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import os, uuid
+from PyQt6.QtCore import QObject, Qt, QSize, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QPixmap
+from . import metrics
+
+THUMB_PX = 96   # 缩略图最长边（像素），卡片里按行高缩放绘制，留有高分屏余量
+
+def thumb_path(image_path: str) -> str:
+    """缩略图放在原图同目录的 thumbs/ 子目录下，文件名与原图对应。"""
+    d, name = os.path.split(image_path)
+    return os.path.join(d, "thumbs", os.path.splitext(name)[0] + ".png")
+
+def _save(img: QImage, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    if img.save(tmp, "PNG"):
+        os.replace(tmp, path)
+
+def _scaled(img: QImage) -> QImage:
+    if img.width() <= THUMB_PX and img.height() <= THUMB_PX:
+        return img
+    return img.scaled(THUMB_PX, THUMB_PX, Qt.AspectRatioMode.KeepAspectRatio,
+                      Qt.TransformationMode.SmoothTransformation)
+
+def load_thumbnail(image_path: str) -> QImage:
+    """在工作线程调用：优先读磁盘缩略图，没有就从原图按缩小尺寸解码并写盘。"""
+    tp = thumb_path(image_path)
+    img = QImage(tp) if os.path.exists(tp) else QImage()
+    if img.isNull():
+        reader = QImageReader(image_path)
+        size = reader.size()
+        if size.isValid():
+            reader.setScaledSize(size.scaled(QSize(THUMB_PX, THUMB_PX), Qt.AspectRatioMode.KeepAspectRatio)
+                                 if size.width() > THUMB_PX or size.height() > THUMB_PX else size)
+        img = reader.read()
+        if not img.isNull():
+            _save(img, tp)
+    return img
+
+class ThumbnailCache(QObject):
+    """
+    图片条目的缩略图：
+      - 生成与解码都在后台线程（QImage），GUI 线程只把结果转成 QPixmap
+      - 磁盘：原图旁的 thumbs/ 目录，捕获时就预先生成（prefetch）
+      - 内存：按字节数限制的 QPixmap LRU
+    get() 未命中时返回 None 并排队加载，加载完发出 ready(image_path)，视图据此重绘对应行。
+    """
+    ready = pyqtSignal(str)
+    _loaded = pyqtSignal(str, QImage)
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, workers: int = 1, parent=None):
+        super().__init__(parent)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = self.misses = 0
+        self._lru: OrderedDict[str, QPixmap] = OrderedDict()
+        self._pending: set[str] = set()
+        self._failed: set[str] = set()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self._loaded.connect(self._on_loaded, Qt.ConnectionType.QueuedConnection)
+
+    # ---------- GUI 线程 ----------
+    def get(self, image_path: str) -> QPixmap | None:
+        pm = self._lru.get(image_path)
+        if pm is not None:
+            self._lru.move_to_end(image_path)
+            self.hits += 1
+            metrics.inc("thumbs.hits")
+            return pm
+        self.misses += 1
+        metrics.inc("thumbs.misses")
+        if image_path and image_path not in self._pending and image_path not in self._failed:
+            self._pending.add(image_path)
+            self._pool.submit(self._load, image_path)
+        return None
+
+    def _on_loaded(self, image_path: str, img: QImage):
+        self._pending.discard(image_path)
+        if img.isNull():
+            self._failed.add(image_path)
+            return
+        pm = QPixmap.fromImage(img)
+        old = self._lru.pop(image_path, None)
+        if old is not None:
+            self.bytes -= self._cost(old)
+        self._lru[image_path] = pm
+        self.bytes += self._cost(pm)
+        while self.bytes > self.max_bytes and len(self._lru) > 1:
+            _, ev = self._lru.popitem(last=False)
+            self.bytes -= self._cost(ev)
+        metrics.set_gauge("thumbs.bytes", self.bytes)
+        metrics.set_gauge("thumbs.entries", len(self._lru))
+        metrics.set_gauge("thumbs.hit_rate", self.hit_rate)
+        self.ready.emit(image_path)
+
+    @staticmethod
+    def _cost(pm: QPixmap) -> int:
+        return pm.width() * pm.height() * max(1, pm.depth() // 8)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hit_rate, 3),
+                "bytes": self.bytes, "entries": len(self._lru)}
+
+    # ---------- 任意线程 ----------
+    def prefetch(self, image_path: str, image: QImage | None = None):
+        """捕获时预生成磁盘缩略图；已有内存中的 QImage 就直接缩放，不再解码原图。"""
+        self._pool.submit(self._generate, image_path, image)
+
+    def _generate(self, image_path: str, image: QImage | None):
+        tp = thumb_path(image_path)
+        if os.path.exists(tp):
+            return
+        try:
+            _save(_scaled(image), tp) if image is not None and not image.isNull() else load_thumbnail(image_path)
+        except Exception:
+            pass
+
+    def _load(self, image_path: str):
+        try:
+            img = load_thumbnail(image_path)
+        except Exception:
+            img = QImage()
+        self._loaded.emit(image_path, img)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QLabel
+)
+from PyQt6.QtCore import QTimer
+from core import metrics, storage
+
+class DiagnosticsDialog(QDialog):
+    """
+    诊断面板：每秒刷新一次指标快照。
+    耗时类指标（毫秒）显示次数与 p50/p95/p99，计数器/仪表值显示当前值。
+    """
+    COLUMNS = ("指标", "类型", "次数/值", "p50 ms", "p95 ms", "p99 ms")
+
+    def __init__(self, store, thumbs=None, retention=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.thumbs = thumbs
+        self.retention = retention
+        self.setWindowTitle("诊断")
+        self.resize(640, 480)
+        lay = QVBoxLayout(self)
+
+        row = QHBoxLayout()
+        self.chk_enabled = QCheckBox("采集性能指标")
+        self.chk_enabled.setChecked(metrics.REGISTRY.enabled)
+        self.chk_enabled.toggled.connect(self._toggle)
+        row.addWidget(self.chk_enabled); row.addStretch(1)
+        btn_reset = QPushButton("清零"); btn_reset.clicked.connect(self._reset)
+        btn_dump = QPushButton("导出"); btn_dump.clicked.connect(self._dump)
+        row.addWidget(btn_reset); row.addWidget(btn_dump)
+        self.btn_vacuum = QPushButton("整理数据库")
+        self.btn_vacuum.setToolTip("整库 VACUUM 并启用增量回收；大库可能需要几十秒，期间暂停写入历史")
+        self.btn_vacuum.setEnabled(retention is not None)
+        self.btn_vacuum.clicked.connect(self._vacuum)
+        row.addWidget(self.btn_vacuum)
+        lay.addLayout(row)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        lay.addWidget(self.table, 1)
+        self.lbl_thumbs = QLabel(""); lay.addWidget(self.lbl_thumbs)
+        self.lbl = QLabel(""); lay.addWidget(self.lbl)
+
+        self._timer = QTimer(self); self._timer.setInterval(1000)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start()
+        self.refresh()
+
+    def refresh(self):
+        snap = metrics.REGISTRY.snapshot()
+        self.table.setRowCount(len(snap))
+        for r, (name, s) in enumerate(snap.items()):
+            if s["type"] == "histogram":
+                cells = (name, "耗时", s["count"], s["p50"], s["p95"], s["p99"])
+            else:
+                cells = (name, "计数" if s["type"] == "counter" else "当前值", s["value"], "", "", "")
+            for c, v in enumerate(cells):
+                self.table.setItem(r, c, QTableWidgetItem(f"{v:.2f}" if isinstance(v, float) else str(v)))
+        if self.thumbs is not None:
+            t = self.thumbs.stats()
+            self.lbl_thumbs.setText(f"缩略图缓存：命中率 {t['hit_rate']:.1%}（{t['hits']}/{t['hits'] + t['misses']}），"
+                                    f"{t['entries']} 张，{t['bytes'] / 1048576:.1f} MB")
+        if not metrics.REGISTRY.enabled:
+            self.lbl.setText("未开启采集")
+
+    def _toggle(self, on: bool):
+        self.store.update(metrics_enabled=on)   # 由主窗口的订阅切换 REGISTRY.enabled
+        self.lbl.setText("")
+
+    def _reset(self):
+        metrics.REGISTRY.reset()
+        self.refresh()
+
+    def _vacuum(self):
+        self.btn_vacuum.setEnabled(False)
+        self.lbl.setText("正在后台整理数据库…")
+        self.retention.vacuum_done.connect(self._vacuum_done)
+        self.retention.request_vacuum()
+
+    def _vacuum_done(self, freed: int):
+        self.retention.vacuum_done.disconnect(self._vacuum_done)
+        self.btn_vacuum.setEnabled(True)
+        self.lbl.setText("整理失败（数据库被占用），稍后重试" if freed < 0 else f"整理完成，释放 {freed / 1048576:.1f} MB")
+
+    def _dump(self):
+        paths = metrics.REGISTRY.dump(storage.data_dir())
+        self.lbl.setText("已写入 " + "、".join(paths))
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+import bisect, os
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+from core.clip_item import ClipItem
+
+PayloadRole = Qt.ItemDataRole.UserRole
+FavRole = Qt.ItemDataRole.UserRole + 1
+UsedRole = Qt.ItemDataRole.UserRole + 2
+
+PREVIEW_CHARS = 200   # 列表里只显示第一行的前 N 个字符，超长文本不参与排版
+
+def format_text(d: ClipItem) -> str:
+    t = d.type; c = d.count
+    if t == "text":
+        base = (d.preview or "")[:PREVIEW_CHARS*4].strip().split("\n", 1)[0][:PREVIEW_CHARS]
+    elif t == "image":
+        base = f"[Image] {os.path.basename(d.image_path or '')}"
+    else:
+        arr = d.paths
+        base = f"[Files] {len(arr)} items" if len(arr)!=1 else f"[File] {arr[0]}"
+    if t == "text" and d.text_len:
+        base += f" …（{d.text_len} 字）"
+    if c and c>1: base += f" ×{c}"
+    return base
+
+class ItemListModel(QAbstractListModel):
+    """
+    队列/收藏列表的数据模型：只保存 ClipItem（fetch/search 返回的就是），显示文本在首次绘制时才格式化并缓存；
+    卡片由 ItemCardDelegate 绘制，视图只会为可见行调用 data()。
+
+    分页：fetch(before_id, after_id, size) 按游标取一页（升序）。先载入最新一页，
+    滚动到顶/底时再取更旧/更新的页；常驻行数超过 max_pages 页时从另一端淘汰。
+    搜索模式：load_search(search) 后行按相关度排列，search(offset, size) 按偏移继续翻页。
+    """
+    def __init__(self, fetch=None, page_size: int = 200, max_pages: int = 5, parent=None):
+        super().__init__(parent)
+        self._fetch = fetch
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._rows: list[ClipItem] = []
+        self._fav: set[int] = set()
+        self._display: dict[int, str] = {}   # item_id -> 显示文本
+        self.has_older = False
+        self.has_newer = False
+        self._search = None
+        self._cursor = None   # take() 取到的位置：浏览模式为最后一条的 id，搜索模式为下一条的偏移
+
+    def set_items(self, rows, fav_ids):
+        self.beginResetModel()
+        self._cursor = None
+        self._rows = list(rows)
+        self._fav = set(fav_ids)
+        self._display = {}
+        self.has_older = self.has_newer = False
+        self.endResetModel()
+
+    # ---------- 分页 ----------
+    def load_latest(self, fav_ids, rows=None):
+        """rows 为已经取好的最新一页（如启动时后台读取的），不给就同步取。"""
+        if rows is None:
+            rows = self._fetch(None, None, self.page_size)
+        self._search = None
+        self.set_items(rows, fav_ids)
+        self.has_older = len(rows) == self.page_size
+
+    def load_search(self, search, fav_ids):
+        rows = search(0, self.page_size)
+        self._search = search
+        self.set_items(rows, fav_ids)
+        self.has_newer = len(rows) == self.page_size
+
+    def fetch_older(self) -> int:
+        """在顶部插入更旧的一页，返回插入行数（视图据此保持滚动位置）。"""
+        if not self.has_older or not self._rows:
+            return 0
+        page = self._fetch(self._rows[0].id, None, self.page_size)
+        self.has_older = len(page) == self.page_size
+        if page:
+            self.beginInsertRows(QModelIndex(), 0, len(page) - 1)
+            self._rows[:0] = page
+            self.endInsertRows()
+            self._evict(from_top=False)
+        return len(page)
+
+    def fetch_newer(self) -> int:
+        """在底部追加更新的一页，返回因内存上限从顶部淘汰的行数。"""
+        if not self.has_newer or not self._rows:
+            return 0
+        if self._search is not None:
+            # 搜索结果按相关度排列，按偏移翻页；达到常驻上限后不再加载
+            page = self._search(len(self._rows), self.page_size)
+            self.has_newer = len(page) == self.page_size and len(self._rows) + len(page) < self.page_size * self.max_pages
+            if page:
+                n = len(self._rows)
+                self.beginInsertRows(QModelIndex(), n, n + len(page) - 1)
+                self._rows.extend(page)
+                self.endInsertRows()
+            return 0
+        page = self._fetch(None, self._rows[-1].id, self.page_size)
+        self.has_newer = len(page) == self.page_size
+        if page:
+            n = len(self._rows)
+            self.beginInsertRows(QModelIndex(), n, n + len(page) - 1)
+            self._rows.extend(page)
+            self.endInsertRows()
+            return self._evict(from_top=True)
+        return 0
+
+    # ---------- 按列表顺序遍历（粘贴） ----------
+    def take(self, n: int | None, start_row: int | None = None, advance: bool = True) -> list[ClipItem]:
+        """
+        按列表顺序取最多 n 条（None 不限），不论状态：从 start_row 行起；不给则接着上次 take 取到的位置，
+        再没有就从第一行起。常驻窗口之外的部分用列表自己的来源（分页游标/搜索偏移）从存储读取，不载入模型。
+        advance=True 时记住取到的位置，供下次接着取和 cursor_row()。
+        """
+        search = self._search is not None
+        if start_row is not None:
+            pos = start_row if search else self._rows[start_row].id - 1
+        elif self._cursor is not None:
+            pos = self._cursor
+        else:
+            pos = 0 if search or not self._rows else self._rows[0].id - 1
+        out: list[ClipItem] = []
+        while n is None or len(out) < n:
+            size = self.page_size if n is None else min(self.page_size, n - len(out))
+            page = self._search(pos, size) if search else self._fetch(None, pos, size)
+            out += page
+            if page:
+                pos = pos + len(page) if search else page[-1].id
+            if len(page) < size:
+                break
+        if advance:
+            self._cursor = pos
+        return out
+
+    def cursor_row(self) -> int:
+        """take() 取到的下一条所在的行，不在常驻窗口里时为 -1。"""
+        if self._cursor is None:
+            return -1
+        if self._search is not None:
+            return self._cursor if self._cursor < len(self._rows) else -1
+        r = bisect.bisect_right(self._rows, self._cursor, key=lambda d: d.id)
+        return r if r < len(self._rows) and not (r == 0 and self.has_older) else -1
+
+    def _evict(self, from_top: bool) -> int:
+        extra = len(self._rows) - self.page_size * self.max_pages
+        if extra <= 0:
+            return 0
+        if from_top:
+            first, last = 0, extra - 1
+            self.has_older = True
+        else:
+            first, last = len(self._rows) - extra, len(self._rows) - 1
+            self.has_newer = True
+        self.beginRemoveRows(QModelIndex(), first, last)
+        for d in self._rows[first:last + 1]:
+            self._display.pop(d.id, None)
+        del self._rows[first:last + 1]
+        self.endRemoveRows()
+        return extra
+
+    def in_window(self, item_id: int) -> bool:
+        """id 是否落在当前常驻窗口内（窗口外的行留给以后翻页时再取）。"""
+        if not self._rows:
+            return True
+        if item_id < self._rows[0].id:
+            return not self.has_older
+        if item_id > self._rows[-1].id:
+            return not self.has_newer
+        return True
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        r = index.row()
+        d = self._rows[r]
+        if role == Qt.ItemDataRole.DisplayRole:
+            s = self._display.get(d.id)
+            if s is None:
+                s = self._display[d.id] = format_text(d)
+            return s
+        if role == PayloadRole:
+            return d
+        if role == FavRole:
+            return d.id in self._fav
+        if role == UsedRole:
+            return d.status == "used"
+        return None
+
+    def payload(self, row: int) -> ClipItem:
+        return self._rows[row]
+
+    def row_of(self, item_id: int) -> int:
+        if self._search is not None:
+            return next((i for i, d in enumerate(self._rows) if d.id == item_id), -1)
+        # 行按 id 升序排列，二分查找
+        r = bisect.bisect_left(self._rows, item_id, key=lambda d: d.id)
+        return r if r < len(self._rows) and self._rows[r].id == item_id else -1
+
+    def upsert(self, rows) -> int:
+        """
+        按 id 合并行：已存在的原地替换并发出 dataChanged，不存在的按 id 顺序插入。
+        插入后常驻行数超过上限时从顶部（最旧）淘汰，返回淘汰的行数（视图据此保持滚动位置）。
+        """
+        inserted = False
+        for d in rows:
+            r = self.row_of(d.id)
+            if r >= 0:
+                self._rows[r] = d
+                self._display.pop(d.id, None)
+                idx = self.index(r)
+                self.dataChanged.emit(idx, idx)
+                continue
+            if self._search is not None or not self.in_window(d.id):
+                continue   # 搜索结果只更新已有行，新条目等下次查询
+            r = bisect.bisect_left(self._rows, d.id, key=lambda x: x.id)
+            self.beginInsertRows(QModelIndex(), r, r)
+            self._rows.insert(r, d)
+            self.endInsertRows()
+            inserted = True
+        return self._evict(from_top=True) if inserted else 0
+
+    def remove_ids(self, ids):
+        """一次遍历常驻行找出要删的（ids 可能有几万个，多数不在窗口里），连续的行合并成一次 removeRows。"""
+        ids = ids if isinstance(ids, (set, frozenset)) else set(ids)
+        rows = [r for r, d in enumerate(self._rows) if d.id in ids]
+        while rows:
+            last = first = rows.pop()
+            while rows and rows[-1] == first - 1:
+                first = rows.pop()
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for d in self._rows[first:last + 1]:
+                self._display.pop(d.id, None)
+            del self._rows[first:last + 1]
+            self.endRemoveRows()
+
+    def refresh_image(self, image_path: str):
+        """缩略图就绪后重绘引用这张图片的行。"""
+        for r, d in enumerate(self._rows):
+            if d.image_path == image_path:
+                idx = self.index(r)
+                self.dataChanged.emit(idx, idx, [PayloadRole])
+
+    def has(self, item_id: int) -> bool:
+        return self.row_of(item_id) >= 0
+
+    def set_favorite(self, item_id: int, fav: bool):
+        if fav: self._fav.add(item_id)
+        else: self._fav.discard(item_id)
+        r = self.row_of(item_id)
+        if r >= 0:
+            idx = self.index(r)
+            self.dataChanged.emit(idx, idx, [FavRole])
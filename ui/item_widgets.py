@@ -1,80 +1,104 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-from PyQt6.QtWidgets import QWidget, QHBoxLayout, QLabel, QPushButton
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+from PyQt6.QtCore import Qt, QEvent, QPoint, QRect, QSize, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QFontMetrics, QPen, QPainter
+from ui.item_model import PayloadRole, FavRole, UsedRole
 
-class ListItemWidget(QWidget):
+class ItemCardDelegate(QStyledItemDelegate):
     """
-    队列/收藏条目卡片：
-      - 左侧：文本
+    队列/收藏条目卡片（直接绘制，不为每行创建 Widget）：
+      - 左侧：文本（图片条目前面是缩略图，来自 ThumbnailCache，未就绪时画占位块）
       - 右侧：⭐/☆（收藏） + ×（删除）
     规则：
       - 队列视图：未收藏默认不显示星标；悬停时显示“☆”可点收藏。
       - 收藏视图：始终显示“★”并可取消。
       - 已用(status='used')：整体灰化，但仍可选/可粘贴。
+    点击命中测试在 editorEvent 中完成，通过信号把 item_id 交给窗口处理。
     """
-    def __init__(self, text: str, is_used: bool, is_fav: bool,
-                 on_toggle_fav, on_delete, show_star_when_unfav_hover: bool=True, parent=None):
+    toggle_fav = pyqtSignal(int, bool)   # item_id, 新的收藏状态
+    delete_clicked = pyqtSignal(int)     # item_id
+
+    HEIGHT = 60
+    MARGIN = 8
+    RADIUS = 16
+    STAR_W = 30
+    CLOSE_W = 28
+
+    THUMB = 40
+
+    def __init__(self, show_star_when_unfav_hover: bool = True, thumbs=None, parent=None):
         super().__init__(parent)
-        self._text = text or ""
-        self._is_used = is_used
-        self._is_fav = is_fav
-        self._on_toggle_fav = on_toggle_fav
-        self._on_delete = on_delete
         self._hover_star = show_star_when_unfav_hover
+        self._thumbs = thumbs
 
-        lay = QHBoxLayout(self); lay.setContentsMargins(12,8,12,8); lay.setSpacing(10)
-        self.lbl = QLabel(self._text); self.lbl.setWordWrap(False)
-        self.btn_star = QPushButton("★" if self._is_fav else "☆")
-        self.btn_star.setFixedWidth(30); self.btn_star.setFlat(True)
-        self.btn_close = QPushButton("×"); self.btn_close.setFixedWidth(28); self.btn_close.setFlat(True)
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.HEIGHT)
 
-        lay.addWidget(self.lbl, 1, Qt.AlignmentFlag.AlignVCenter)
-        lay.addWidget(self.btn_star, 0, Qt.AlignmentFlag.AlignVCenter)
-        lay.addWidget(self.btn_close, 0, Qt.AlignmentFlag.AlignVCenter)
+    def _rects(self, rect: QRect):
+        card = rect.adjusted(self.MARGIN, self.MARGIN//2, -self.MARGIN, -self.MARGIN//2)
+        inner = card.adjusted(12, 0, -12, 0)
+        close_r = QRect(inner.right() - self.CLOSE_W + 1, inner.top(), self.CLOSE_W, inner.height())
+        star_r = QRect(close_r.left() - 10 - self.STAR_W, inner.top(), self.STAR_W, inner.height())
+        text_r = QRect(inner.left(), inner.top(), star_r.left() - 10 - inner.left(), inner.height())
+        return card, text_r, star_r, close_r
 
-        # style
-        self._apply_style()
+    def _star_visible(self, fav: bool, hover: bool) -> bool:
+        return fav or not self._hover_star or hover
 
-        # 交互
-        self.btn_star.clicked.connect(self._toggle_fav)
-        self.btn_close.clicked.connect(lambda: self._on_delete())
+    def paint(self, p: QPainter, option, index):
+        used = bool(index.data(UsedRole)); fav = bool(index.data(FavRole))
+        hover = bool(option.state & QStyle.StateFlag.State_MouseOver)
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        card, text_r, star_r, close_r = self._rects(option.rect)
 
-        # 未收藏时在队列页默认隐藏星（悬停显示）
-        if not self._is_fav and self._hover_star:
-            self.btn_star.setVisible(False)
+        p.save()
+        p.setRenderHint(QPainter.RenderHint.Antialiasing)
+        p.setPen(QPen(QColor("#4a90e2"), 2) if selected else Qt.PenStyle.NoPen)
+        p.setBrush(QColor("#5a5a5a" if used else "#d0d0d0"))
+        p.drawRoundedRect(card, self.RADIUS, self.RADIUS)
 
-    def _apply_style(self):
-        if self._is_used:
-            # 灰化样式
-            self.setStyleSheet("""
-            QWidget { background:#5a5a5a; border-radius:16px; }
-            QLabel { color:#cfcfcf; font-weight:600; }
-            QPushButton { color:#cfcfcf; border:none; }
-            QPushButton:hover { color:#ffffff; }
-            """)
-        else:
-            self.setStyleSheet("""
-            QWidget { background:#d0d0d0; border-radius:16px; }
-            QLabel { color:#222; font-weight:700; }
-            QPushButton { color:%s; border:none; }
-            QPushButton:hover { color:#111; }
-            """ % ("#f5b301" if self._is_fav else "#8a8a8a"))
+        d = index.data(PayloadRole)
+        if self._thumbs is not None and d.type == "image":
+            thumb_r = QRect(text_r.left(), text_r.center().y() - self.THUMB//2 + 1, self.THUMB, self.THUMB)
+            pm = self._thumbs.get(d.image_path)
+            if pm is not None:
+                size = pm.size().scaled(thumb_r.size(), Qt.AspectRatioMode.KeepAspectRatio)
+                target = QRect(QPoint(0, 0), size); target.moveCenter(thumb_r.center())
+                p.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+                p.drawPixmap(target, pm)
+            else:
+                p.setPen(Qt.PenStyle.NoPen); p.setBrush(QColor("#9a9a9a"))
+                p.drawRoundedRect(thumb_r, 6, 6)
+            text_r = text_r.adjusted(self.THUMB + 10, 0, 0, 0)
 
-    def _toggle_fav(self):
-        self._is_fav = not self._is_fav
-        self.btn_star.setText("★" if self._is_fav else "☆")
-        self._apply_style()
-        if self._on_toggle_fav:
-            self._on_toggle_fav(self._is_fav)
+        font = QFont(option.font); font.setWeight(QFont.Weight.DemiBold if used else QFont.Weight.Bold)
+        p.setFont(font)
+        p.setPen(QColor("#cfcfcf" if used else "#222"))
+        text = QFontMetrics(font).elidedText(index.data(Qt.ItemDataRole.DisplayRole) or "",
+                                             Qt.TextElideMode.ElideRight, text_r.width())
+        p.drawText(text_r, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, text)
 
-    # 悬停显示“☆”
-    def enterEvent(self, e):
-        if (not self._is_fav) and self._hover_star:
-            self.btn_star.setVisible(True)
-        return super().enterEvent(e)
+        p.setPen(QColor("#cfcfcf" if used else ("#f5b301" if fav else "#8a8a8a")))
+        if self._star_visible(fav, hover):
+            p.drawText(star_r, Qt.AlignmentFlag.AlignCenter, "★" if fav else "☆")
+        p.drawText(close_r, Qt.AlignmentFlag.AlignCenter, "×")
+        p.restore()
 
-    def leaveEvent(self, e):
-        if (not self._is_fav) and self._hover_star:
-            self.btn_star.setVisible(False)
-        return super().leaveEvent(e)
+    def editorEvent(self, event, model, option, index):
+        et = event.type()
+        if et in (QEvent.Type.MouseButtonPress, QEvent.Type.MouseButtonRelease, QEvent.Type.MouseButtonDblClick) \
+                and event.button() == Qt.MouseButton.LeftButton:
+            _, _, star_r, close_r = self._rects(option.rect)
+            pos = event.position().toPoint()
+            fav = bool(index.data(FavRole))
+            on_star = star_r.contains(pos) and self._star_visible(fav, True)
+            on_close = close_r.contains(pos)
+            if on_star or on_close:
+                # 按下/双击只吞掉事件（不改变选中），松开时才触发动作
+                if et == QEvent.Type.MouseButtonRelease:
+                    item_id = index.data(PayloadRole).id
+                    if on_star: self.toggle_fav.emit(item_id, not fav)
+                    else: self.delete_clicked.emit(item_id)
+                return True
+        return super().editorEvent(event, model, option, index)
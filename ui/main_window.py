@@ -1,38 +1,60 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-import json, time
+import threading
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QListWidget, QListWidgetItem, QLabel, QStatusBar, QApplication, QMessageBox,
-    QStackedWidget
+    QListView, QLabel, QStatusBar, QMessageBox,
+    QStackedWidget, QLineEdit, QMenu
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QModelIndex, QTimer, pyqtSignal
 from PyQt6.QtGui import QGuiApplication, QKeySequence
 
-from core import storage, settings as settings_mod, text_joiner
+from core import metrics, storage, startup_profile, settings as settings_mod, text_joiner
 from core.queue_manager import QueueManager
+from core.clip_item import ClipItem
+from core.change_feed import ChangeFeed
 from core.clipboard_watcher import ClipboardWatcher
 from core.paste_engine import PasteEngine
+from core.retention import RetentionWorker
+from core.thumbnails import ThumbnailCache
 from core.hotkeys import Hotkeys
-from ui.item_widgets import ListItemWidget
+from core.ipc_server import IpcServer
+from ui.item_model import ItemListModel
+from ui.item_widgets import ItemCardDelegate
 from ui.settings_dialog import SettingsDialog
+from ui.diagnostics_dialog import DiagnosticsDialog
 
 class MainWindow(QMainWindow):
+    _first_page = pyqtSignal(object, object)   # rows, fav_ids：后台线程读到的首屏数据
+
+    RETENTION_DELAY_S = 10   # 启动后多久开始第一轮保留策略
+    PASTE_ALL_CONFIRM = 50   # Paste All 超过这么多条先确认
+    PASTE_ALL_MAX = 500      # Paste All 一次最多粘贴的条数
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Clipboard Sequencer")
         self.resize(980, 680)
 
-        self.settings = settings_mod.load_settings()
-        storage.init_db()
-        self.queue = QueueManager(self.settings)
+        # 设置只从磁盘读一次；各组件共享同一个 Settings 对象，修改经 store.update() 即时生效
+        self.store = settings_mod.SettingsStore(parent=self)
+        self.settings = self.store.settings
+        metrics.REGISTRY.enabled = self.settings.metrics_enabled
+        self.db = storage.get_engine(self.settings.large_text_kb * 1024)
+        self.feed = ChangeFeed(self)
+        self.queue = QueueManager(self.settings, self.db, self.feed)
+        self.thumbs = ThumbnailCache(parent=self)
+        startup_profile.mark("settings+db")
 
         # ---------- 基础框架 ----------
         root = QWidget(); self.setCentralWidget(root)
         root_lay = QVBoxLayout(root); root_lay.setContentsMargins(16,16,16,16); root_lay.setSpacing(10)
 
-        # 顶部工具条（菜单/刷新/图钉）
+        # 顶部工具条（搜索/菜单/刷新/图钉）
         top = QHBoxLayout()
+        self.txt_search = QLineEdit(); self.txt_search.setPlaceholderText("搜索历史…")
+        self.txt_search.setClearButtonEnabled(True)
+        top.addWidget(self.txt_search, 1)
         self.btn_menu = QPushButton("≡"); self.btn_menu.setFixedWidth(40)
         self.btn_refresh = QPushButton("⟳"); self.btn_refresh.setFixedWidth(40)
         self.btn_pin = QPushButton("📌"); self.btn_pin.setFixedWidth(40); self.btn_pin.setCheckable(True)
@@ -44,12 +66,14 @@ class MainWindow(QMainWindow):
         # 队列页
         self.page_queue = QWidget(); pq_lay = QVBoxLayout(self.page_queue)
         self.lbl_queue = QLabel("队列（已用会变灰，但仍可选择和粘贴）")
-        self.list_queue = QListWidget(); self.list_queue.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)
+        self.model_queue = ItemListModel(lambda b, a, n: self.queue.fetch_page(b, a, n), parent=self)
+        self.list_queue = self._make_list(self.model_queue, ItemCardDelegate(show_star_when_unfav_hover=True, thumbs=self.thumbs, parent=self))
         pq_lay.addWidget(self.lbl_queue); pq_lay.addWidget(self.list_queue, 1)
         # 收藏页
         self.page_fav = QWidget(); pf_lay = QVBoxLayout(self.page_fav)
         self.lbl_fav = QLabel("我的收藏")
-        self.list_fav = QListWidget(); self.list_fav.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)
+        self.model_fav = ItemListModel(lambda b, a, n: self.queue.fetch_page(b, a, n, {"favorites": True}), parent=self)
+        self.list_fav = self._make_list(self.model_fav, ItemCardDelegate(show_star_when_unfav_hover=False, thumbs=self.thumbs, parent=self))
         pf_lay.addWidget(self.lbl_fav); pf_lay.addWidget(self.list_fav, 1)
 
         self.stack.addWidget(self.page_queue)  # index 0
@@ -72,40 +96,114 @@ class MainWindow(QMainWindow):
         self._status("Ready")
 
         # 引擎/监听
-        self.paste_engine = PasteEngine(self.settings, storage)
+        self.paste_engine = PasteEngine(self.settings)
         self.paste_engine.paste_done.connect(self.on_paste_done)
+        self.paste_engine.paste_merged.connect(self.on_paste_merged)
         self.paste_engine.paste_failed.connect(self.on_paste_failed)
+        self.paste_engine.progress.connect(self._on_paste_progress)
 
-        self.watcher = ClipboardWatcher(self.settings, self.queue)
-        self.watcher.item_captured.connect(self.reload_current)
-        self.watcher.status_changed.connect(lambda _: self._status("监听状态变更"))
-        self.watcher.set_enabled(True)
+        self.watcher = None   # 首屏之后在 _finish_startup() 里创建
+        self.ipc = None
+        # 后台按保留策略淘汰旧条目、清理图片缓存
+        self.retention = RetentionWorker(self.settings, self.db.path, self.feed,
+                                         delay_s=self.RETENTION_DELAY_S, parent=self)
+        self.retention.start()
 
         # 事件绑定
         self.btn_refresh.clicked.connect(self.reload_current)
+        # 搜索：输入停顿 250ms 后再查询
+        self._search_timer = QTimer(self); self._search_timer.setSingleShot(True); self._search_timer.setInterval(250)
+        self._search_timer.timeout.connect(self.reload_current)
+        self.txt_search.textChanged.connect(lambda _: self._search_timer.start())
         self.btn_pin.clicked.connect(self._toggle_always_on_top)
         self.btn_to_queue.clicked.connect(lambda: self._switch_page(0))
         self.btn_to_fav.clicked.connect(lambda: self._switch_page(1))
         self.btn_setting.clicked.connect(self.open_settings)
+        menu = QMenu(self)
+        menu.addAction("诊断…", self.open_diagnostics)
+        self.btn_menu.setMenu(menu)
+        # 开启指标时定期写出 metrics.json / metrics.prom
+        self._metrics_timer = QTimer(self)
+        self._metrics_timer.timeout.connect(self._dump_metrics)
+        self._restart_metrics_timer()
+        # 需要派生状态的设置项
+        self.store.subscribe("large_text_kb", lambda _k, v: setattr(self.db, "large_text_bytes", v * 1024))
+        self.store.subscribe("metrics_enabled", lambda _k, v: setattr(metrics.REGISTRY, "enabled", v))
+        self.store.subscribe("metrics_dump_interval_s", lambda *_: self._restart_metrics_timer())
+        self.store.subscribe(("retention_max_age_days", "retention_max_items", "retention_max_mb"),
+                             lambda *_: self.retention.trigger())
+        # 队列页：×=删除条目；收藏页：×=从收藏移除（不删条目）
+        self.list_queue.itemDelegate().toggle_fav.connect(self.queue.set_favorite)
+        self.list_queue.itemDelegate().delete_clicked.connect(self._delete_queue_item)
+        self.list_fav.itemDelegate().toggle_fav.connect(self.queue.set_favorite)
+        self.list_fav.itemDelegate().delete_clicked.connect(lambda _id: self.queue.set_favorite(_id, False))
+        # 存储变更按事件循环周期合并后增量更新列表，不再整表重载
+        self.feed.changed.connect(self._apply_changes)
+        self.thumbs.ready.connect(lambda p: (self.model_queue.refresh_image(p), self.model_fav.refresh_image(p)))
 
         # 键盘快捷键（窗口内）
         self._bind_shortcuts()
 
-        # 全局热键（窗口不激活也能触发）
-        self.global_hotkeys = Hotkeys(self)
-        self.global_hotkeys.register("ctrl+shift+v", self.paste_next)
-        self.global_hotkeys.register("ctrl+alt+v", self.paste_all)
-        self.global_hotkeys.register("alt+\\", self._toggle_show_hide)
-
         # 列表键盘控制
         self.list_queue.keyPressEvent = self._list_keypress_wrapper(self.list_queue, source="queue")
         self.list_fav.keyPressEvent = self._list_keypress_wrapper(self.list_fav, source="fav")
 
         # 默认非置顶
         self.setWindowFlag(Qt.WindowType.WindowStaysOnTopHint, False)
+        startup_profile.mark("window built")
         self.show()
 
-        self.reload_current()
+        # 首屏：窗口先画出来，第一页在后台线程读（只读连接池），到了再装进模型，之后才启动监听和热键
+        self._first_page.connect(self._on_first_page)
+        threading.Thread(target=self._load_first_page, name="first-page", daemon=True).start()
+
+    # ---------- 启动 ----------
+    def _load_first_page(self):
+        try:
+            rows = self.queue.fetch_page(size=self.model_queue.page_size, pooled=True)
+            fav_ids = self.queue.favorite_ids(pooled=True)
+        except Exception:
+            rows = fav_ids = None   # 交给 GUI 线程按原路径同步重读
+        self._first_page.emit(rows, fav_ids)
+
+    def _on_first_page(self, rows, fav_ids):
+        startup_profile.mark("first page")
+        if rows is None or self.stack.currentIndex() != 0 or self.txt_search.text().strip():
+            self.reload_current()
+        else:
+            self.model_queue.load_latest(fav_ids, rows)
+            self.list_queue.scrollToBottom()
+        QTimer.singleShot(0, self._finish_startup)
+
+    def _finish_startup(self):
+        """首屏之后才需要的部分：剪贴板监听和全局热键（keyboard 在这里才导入）。"""
+        self.watcher = ClipboardWatcher(self.settings, self.queue, self.thumbs)
+        self.watcher.status_changed.connect(lambda _: self._status("监听状态变更"))
+        self.watcher.set_enabled(True)
+        # 粘贴引擎写剪贴板前登记令牌和内容指纹，watcher 据此跳过自己写入的内容
+        self.paste_engine.scheduler.about_to_set_clipboard.connect(
+            lambda job: self.watcher.expect(job.token, job.kind, job.payload))
+        self.store.subscribe(("image_codec", "image_quality"), lambda *_: self.watcher.pipeline.images.set_codec(
+            self.settings.image_codec, self.settings.image_quality))
+
+        # 全局热键（窗口不激活也能触发），回调由 Hotkeys 转到 GUI 线程执行：
+        # 粘贴进行中连按「粘贴下一条」合并成一次 paste_next(n)，粘贴全部在忙时丢弃
+        hk = self.global_hotkeys = Hotkeys(self)
+        busy = lambda: self.paste_engine.busy
+        hk.register("ctrl+shift+v", self._hotkey_paste(self.paste_next), mode="collapse", busy=busy)
+        hk.register("ctrl+alt+v", self._hotkey_paste(self.paste_all), mode="drop", busy=busy)
+        hk.register("alt+\\", self._toggle_show_hide, min_interval_ms=300)
+        self.paste_engine.idle.connect(hk.flush)
+
+        # 本地控制接口：脚本经 cli.py 批量入队、查询、触发粘贴
+        self.ipc = IpcServer(self.settings, self.db.path, self.feed, parent=self, actions={
+            "paste_next": lambda n=1: self.paste_next(int(n)),
+            "paste_all": self.paste_all,
+        })
+        self.store.subscribe("ipc_enabled", lambda _k, on: self._start_ipc() if on else self.ipc.stop())
+        if self.settings.ipc_enabled:
+            self._start_ipc()
+        startup_profile.mark("ready")
 
     # ---------- 样式 ----------
     def _apply_dark_style(self):
@@ -119,19 +217,22 @@ class MainWindow(QMainWindow):
         }
         QPushButton:hover { filter: brightness(0.96); }
         QPushButton:pressed { filter: brightness(0.9); }
+        QLineEdit {
+            background:#3a3a3a; color:#eaeaea; border:1px solid #555;
+            border-radius:12px; padding:6px 10px;
+        }
 
-        QListWidget {
+        QListView {
             background:transparent; border:2px dashed #666; border-radius:16px;
-            padding:8px;
+            padding:8px; outline:none;
         }
-        QListWidget::item { margin:8px; padding:0px; }  /* 我们用自定义Widget，外层只需留白 */
-        QListWidget::item:selected { outline:none; background:transparent; }
         """)
 
     # ---------- 基础方法 ----------
     def _bind_shortcuts(self):
         self._shortcut("Ctrl+Shift+V", self.paste_next)
         self._shortcut("Ctrl+Alt+V", self.paste_all)
+        self._shortcut("Esc", self.cancel_paste)
 
     def _shortcut(self, seq: str, func):
         act = self.addAction(seq)
@@ -153,14 +254,26 @@ class MainWindow(QMainWindow):
         if self.isVisible(): self.hide()
         else: self.show()
 
-    def _payload(self, row):
-        return {
-            "id": row[0], "session_id": row[1], "type": row[2],
-            "text": row[3], "image_path": row[4], "paths_json": row[5],
-            "count": row[6], "status": row[7], "pinned": bool(row[8]),
-            "edited": bool(row[9]), "note": row[10],
-            "created_at": row[11], "last_used_at": row[12],
-        }
+    def _make_list(self, model: ItemListModel, delegate: ItemCardDelegate) -> QListView:
+        lv = QListView()
+        lv.setModel(model); lv.setItemDelegate(delegate)
+        lv.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+        lv.setUniformItemSizes(True)   # 固定行高，滚动时不必逐行测量
+        lv.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        lv.setMouseTracking(True)      # 悬停显示“☆”
+        lv.verticalScrollBar().valueChanged.connect(lambda v, lv=lv: self._on_list_scrolled(lv, v))
+        return lv
+
+    def _on_list_scrolled(self, lv: QListView, v: int):
+        # 接近顶部取更旧的一页、接近底部取更新的一页，并补偿滚动位置避免跳动
+        sb = lv.verticalScrollBar(); model = lv.model()
+        edge = ItemCardDelegate.HEIGHT * 3
+        if v <= sb.minimum() + edge and model.has_older:
+            n = model.fetch_older()
+            if n: sb.setValue(sb.value() + n * ItemCardDelegate.HEIGHT)
+        elif v >= sb.maximum() - edge and model.has_newer:
+            n = model.fetch_newer()
+            if n: sb.setValue(sb.value() - n * ItemCardDelegate.HEIGHT)
 
     # ---------- 加载列表 ----------
     def reload_current(self, *_):
@@ -169,157 +282,238 @@ class MainWindow(QMainWindow):
         else:
             self.reload_fav()
 
+    @metrics.timed("ui.reload_queue")
     def reload_queue(self):
-        self.list_queue.clear()
-        for row in self.queue.list_all(limit=800):
-            d = self._payload(row)
-            is_fav = self.queue.is_favorite(d["id"])
-            # 队列视图：未收藏默认不显示星（悬停显示）
-            widget = ListItemWidget(
-                text=self._fmt_text(d),
-                is_used=(d["status"]=="used"),
-                is_fav=is_fav,
-                on_toggle_fav=lambda fav, _id=d["id"]: self.queue.set_favorite(_id, fav),
-                on_delete=lambda _id=d["id"]: self._delete_queue_item(_id),
-                show_star_when_unfav_hover=True
-            )
-            item = QListWidgetItem(); item.setData(Qt.ItemDataRole.UserRole, d)
-            item.setSizeHint(widget.sizeHint())
-            self.list_queue.addItem(item); self.list_queue.setItemWidget(item, widget)
-
+        q = self.txt_search.text().strip()
+        if q:
+            self.model_queue.load_search(lambda off, n: self.queue.search(q, limit=n, offset=off), self.queue.favorite_ids())
+            self.list_queue.scrollToTop()
+            self._status_search_scope(q)
+            return
+        # 载入最新的一页，定位到底部（最新条目）
+        self.model_queue.load_latest(self.queue.favorite_ids())
+        self.list_queue.scrollToBottom()
+
+    def _status_search_scope(self, q: str):
+        if self.queue.search_partial(q):
+            self._status(f"含 1–2 个字的词只在最近 {storage.StorageEngine.SHORT_TERM_WINDOW} 条里查找")
+
+    @metrics.timed("ui.reload_fav")
     def reload_fav(self):
-        self.list_fav.clear()
-        for row in self.queue.list_favorites(limit=800):
-            d = self._payload(row)
-            # 收藏页：始终显示★，删除=从收藏移除（不删条目）
-            widget = ListItemWidget(
-                text=self._fmt_text(d),
-                is_used=(d["status"]=="used"),
-                is_fav=True,
-                on_toggle_fav=lambda fav, _id=d["id"]: self.queue.set_favorite(_id, fav),
-                on_delete=lambda _id=d["id"]: (self.queue.set_favorite(_id, False), self.reload_current()),
-                show_star_when_unfav_hover=False
-            )
-            item = QListWidgetItem(); item.setData(Qt.ItemDataRole.UserRole, d)
-            item.setSizeHint(widget.sizeHint())
-            self.list_fav.addItem(item); self.list_fav.setItemWidget(item, widget)
-
-    def _fmt_text(self, d):
-        t = d["type"]; c = d["count"]
-        if t == "text":
-            base = d["text"] or ""
-        elif t == "image":
-            import os; base = f"[Image] {os.path.basename(d['image_path'] or '')}"
-        else:
-            try: arr = json.loads(d["paths_json"] or "[]")
-            except: arr = []
-            base = f"[Files] {len(arr)} items" if len(arr)!=1 else f"[File] {arr[0]}"
-        if c and c>1: base += f" ×{c}"
-        return base
+        q = self.txt_search.text().strip()
+        if q:
+            self.model_fav.load_search(lambda off, n: self.queue.search(q, collection="favorites", limit=n, offset=off),
+                                       self.queue.favorite_ids())
+            self.list_fav.scrollToTop()
+            self._status_search_scope(q)
+            return
+        self.model_fav.load_latest(self.queue.favorite_ids())
+        self.list_fav.scrollToBottom()
+
+    @metrics.timed("ui.apply_changes")
+    def _apply_changes(self, cs):
+        for m in (self.model_queue, self.model_fav):
+            m.remove_ids(cs.deleted)
+        unfav = [i for i, fav in cs.favorites.items() if not fav]
+        self.model_fav.remove_ids(unfav)
+        for item_id, fav in cs.favorites.items():
+            self.model_queue.set_favorite(item_id, fav)
+        # 需要整行读取的：新插入/字段变化（仅限已在列表中的）+ 新收藏
+        queue_ids = [i for i in cs.touched() if i in cs.inserted or self.model_queue.has(i)]
+        fav_ids = [i for i in cs.touched() if self.model_fav.has(i)]
+        fav_ids += [i for i, fav in cs.favorites.items() if fav and not self.model_fav.has(i) and i not in cs.deleted]
+        need = dict.fromkeys(queue_ids + fav_ids)
+        if not need:
+            return
+        rows = {r.id: r for r in self.queue.get_items(list(need))}
+        self._keep_scroll(self.list_queue, self.model_queue.upsert([rows[i] for i in queue_ids if i in rows]))
+        for i in fav_ids:
+            self.model_fav.set_favorite(i, True)
+        self._keep_scroll(self.list_fav, self.model_fav.upsert([rows[i] for i in dict.fromkeys(fav_ids) if i in rows]))
+
+    @staticmethod
+    def _keep_scroll(lv: QListView, evicted: int):
+        # 顶部淘汰了 evicted 行：内容整体上移，补偿滚动位置
+        if evicted:
+            sb = lv.verticalScrollBar()
+            sb.setValue(sb.value() - evicted * ItemCardDelegate.HEIGHT)
 
     def _delete_queue_item(self, item_id: int):
         self.queue.delete([item_id])
-        self.reload_current()
+
+    def _delete_selected(self):
+        """删除队列页选中的全部条目；列表经变更推送增量移除，图片文件在后台删除。"""
+        model = self.list_queue.model()
+        ids = [model.payload(i.row()).id for i in self.list_queue.selectionModel().selectedIndexes()]
+        if ids:
+            self.queue.delete(ids)
+            self.retention.trigger()   # 尽快在后台清理全文索引残留、归还空闲页
+            self._status(f"已删除 {len(ids)} 条")
+
+    def _start_ipc(self):
+        if not self.ipc.start():
+            self._status("控制接口启动失败（可能已有实例在监听）：" + self.ipc.path)
 
     # ---------- 粘贴 ----------
-    def paste_next(self):
-        lw = self._current_list()
-        it = lw.currentItem() or (lw.item(0) if lw.count()>0 else None)
-        if not it:
+    def _hotkey_paste(self, action):
+        """热键触发的粘贴：把按键时刻交给粘贴引擎，统计按键到实际发出粘贴键的延迟。"""
+        def run(*args):
+            self.paste_engine.mark_trigger(self.global_hotkeys.last_trigger)
+            try:
+                action(*args)
+            finally:
+                self.paste_engine.mark_trigger(None)
+        return run
+
+    def paste_next(self, n: int = 1):
+        """
+        从当前选中的条目（没有则接着上次粘贴到的位置，再没有则从列表第一行）起，按列表顺序粘贴 n 条，不论是否已用；
+        超出常驻窗口的条目按列表的筛选从存储读取。选中项移到下一条。
+        """
+        lv = self._current_list(); model = lv.model()
+        idx = lv.currentIndex()
+        items = model.take(max(1, n), idx.row() if idx.isValid() else None)
+        if not items:
             self._status("队列为空"); return
-        d = it.data(Qt.ItemDataRole.UserRole)
-        self._paste_item(d)
+        for d in items:
+            self._paste_item(d)
+        r = model.cursor_row()
+        lv.setCurrentIndex(model.index(r) if r >= 0 else QModelIndex())
 
     def paste_all(self):
-        lw = self._current_list()
+        """
+        按列表顺序粘贴当前列表（页签与搜索的筛选）从第一行起的全部条目，最多 PASTE_ALL_MAX 条；
+        超过 PASTE_ALL_CONFIRM 条先确认。
+        """
+        model = self._current_list().model()
+        items = model.take(self.PASTE_ALL_MAX + 1, 0 if model.rowCount() else None, advance=False)
+        if not items:
+            self._status("队列为空"); return
+        if len(items) > self.PASTE_ALL_CONFIRM:
+            more = len(items) > self.PASTE_ALL_MAX
+            items = items[:self.PASTE_ALL_MAX]
+            msg = f"将依次粘贴 {len(items)} 条" + (f"（只取前 {self.PASTE_ALL_MAX} 条）" if more else "") + "，继续？"
+            if QMessageBox.question(self, "全部粘贴", msg) != QMessageBox.StandardButton.Yes:
+                return
         parts_text, seq = [], []
-        for i in range(lw.count()):
-            d = lw.item(i).data(Qt.ItemDataRole.UserRole)
-            if d["type"] == "text":
+        for d in items:
+            if d.type == "text":
                 if self.settings.paste_all_text_mode == "merge":
-                    parts_text.append(d["text"] or ""); seq.append((d, "text-merge"))
+                    parts_text.append(d); seq.append((d, "text-merge"))
                 else:
                     seq.append((d, "text-step"))
             else:
-                seq.append((d, d["type"]))
+                seq.append((d, d.type))
 
         if self.settings.paste_all_text_mode == "merge":
-            text_blob = ""
-            if parts_text:
-                if self.settings.joiner_mode == "custom":
-                    text_blob = text_joiner.join_texts(parts_text, "custom", self.settings.joiner_custom_sep)
-                else:
-                    text_blob = text_joiner.join_texts(parts_text, self.settings.joiner_mode)
-            if text_blob:
-                self.watcher.ignore_for(self.settings.min_interval_ms + 50)
-                self.paste_engine.paste_text(-1, text_blob)
-                QApplication.processEvents()
-                time.sleep(self.settings.min_interval_ms/1000.0)
+            # 全部按顺序进入粘贴队列，由调度器逐个执行，GUI 线程不等待；
+            # 合并（以及读取大文本全文）在粘贴线程上进行，完成后被合并的条目经 paste_merged 标记为已用
+            if any(d.preview or d.truncated for d in parts_text):
+                mode, sep = self.settings.joiner_mode, self.settings.joiner_custom_sep
+                self.paste_engine.paste_text(-1, loader=lambda parts=parts_text: text_joiner.join_texts(
+                    [self.queue.item_text(d) for d in parts], mode, sep), merged=[d.id for d in parts_text])
             for d, kind in seq:
-                if d["type"] != "text":
+                if d.type != "text":
                     self._paste_item(d, update_status=False)
         else:
             for d, kind in seq:
                 self._paste_item(d, update_status=False)
 
-    def _paste_item(self, d, update_status=True):
-        # 去抖：避免我们设置剪贴板时被 watcher 误判为新复制
-        self.watcher.ignore_for(self.settings.min_interval_ms + 50)
-        if d["type"] == "text":
-            self.paste_engine.paste_text(d["id"], d["text"] or "")
-        elif d["type"] == "image":
-            self.paste_engine.paste_image(d["id"], d["image_path"] or "")
+    def _paste_item(self, d: ClipItem, update_status=True):
+        if d.type == "text":
+            if d.truncated:
+                # 全文在粘贴线程上读取
+                self.paste_engine.paste_text(d.id, loader=lambda d=d: self.queue.item_text(d))
+            else:
+                self.paste_engine.paste_text(d.id, d.preview or "")
+        elif d.type == "image":
+            self.paste_engine.paste_image(d.id, d.image_path or "")
         else:
-            try: arr = json.loads(d["paths_json"] or "[]")
-            except: arr = []
-            self.paste_engine.paste_files(d["id"], arr)
+            self.paste_engine.paste_files(d.id, list(d.paths))
 
     def on_paste_done(self, item_id: int):
-        # item_id == -1 表示合并文本的 Paste All
+        # item_id == -1 表示合并文本的 Paste All，被合并的条目由 on_paste_merged 处理
         if item_id != -1 and self.settings.dequeue_on_paste:
             self.queue.mark_used(item_id)   # 仅标记为 used（灰），仍留在列表中
-        self.reload_current()
+
+    def on_paste_merged(self, ids: list):
+        if self.settings.dequeue_on_paste:
+            with self.db.transaction():
+                for i in ids:
+                    self.queue.mark_used(i)
+
+    def cancel_paste(self):
+        if self.paste_engine.scheduler.busy:
+            self.paste_engine.cancel()
+            self._status("已取消粘贴")
+
+    def _on_paste_progress(self, finished: int, total: int):
+        if total > 1:
+            self._status(f"粘贴中 {finished}/{total}（Esc 取消）")
 
     def on_paste_failed(self, item_id: int, msg: str):
         QMessageBox.warning(self, "Paste 失败", f"Item {item_id} 粘贴失败：{msg}")
 
     # ---------- 列表与键盘 ----------
-    def _current_list(self) -> QListWidget:
+    def _current_list(self) -> QListView:
         return self.list_queue if self.stack.currentIndex()==0 else self.list_fav
 
-    def _list_keypress_wrapper(self, widget: QListWidget, source: str):
+    def _list_keypress_wrapper(self, widget: QListView, source: str):
         def handler(event):
             key = event.key()
             ctrl = event.modifiers() & Qt.KeyboardModifier.ControlModifier
             if key in (Qt.Key.Key_Up, Qt.Key.Key_Down):
-                return QListWidget.keyPressEvent(widget, event)
+                return QListView.keyPressEvent(widget, event)
+            if key == Qt.Key.Key_Delete and source == "queue":
+                return self._delete_selected()
             if key in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
-                it = widget.currentItem()
-                if not it: return
-                d = it.data(Qt.ItemDataRole.UserRole)
+                idx = widget.currentIndex()
+                if not idx.isValid(): return
+                d = widget.model().payload(idx.row())
                 if ctrl:
                     self._paste_item(d)
                 else:
                     cb = QGuiApplication.clipboard()
-                    if d["type"] == "text":
-                        cb.setText(d["text"] or "")
-                    elif d["type"] == "image":
+                    if d.type == "text":
+                        cb.setText(self.queue.item_text(d))
+                    elif d.type == "image":
                         from PyQt6.QtGui import QImage; from PyQt6.QtCore import QMimeData
-                        img = QImage(d["image_path"] or ""); md = QMimeData(); md.setImageData(img); cb.setMimeData(md)
+                        img = QImage(d.image_path or ""); md = QMimeData(); md.setImageData(img); cb.setMimeData(md)
                     else:
                         from PyQt6.QtCore import QMimeData, QUrl
                         md = QMimeData()
-                        try: arr = json.loads(d["paths_json"] or "[]")
-                        except: arr = []
-                        md.setUrls([QUrl.fromLocalFile(p) for p in arr]); cb.setMimeData(md)
+                        md.setUrls([QUrl.fromLocalFile(p) for p in d.paths]); cb.setMimeData(md)
                 return
-            return QListWidget.keyPressEvent(widget, event)
+            return QListView.keyPressEvent(widget, event)
         return handler
 
+    def closeEvent(self, e):
+        # 退出前等待捕获管线把已接收的记录全部落盘
+        if self.watcher is not None:
+            self.watcher.close()
+        if self.ipc is not None:
+            self.ipc.shutdown()
+        self.paste_engine.shutdown()
+        self.retention.stop()
+        self.thumbs.shutdown()
+        self.store.flush()
+        super().closeEvent(e)
+
     # ---------- 设置 ----------
+    def open_diagnostics(self):
+        DiagnosticsDialog(self.store, self.thumbs, self.retention, self).exec()
+
+    def _restart_metrics_timer(self):
+        self._metrics_timer.stop()
+        if self.settings.metrics_dump_interval_s > 0:
+            self._metrics_timer.start(self.settings.metrics_dump_interval_s * 1000)
+
+    def _dump_metrics(self):
+        if metrics.REGISTRY.enabled:
+            try: metrics.REGISTRY.dump(storage.data_dir())
+            except OSError as e: self._status(f"指标写出失败：{e}")
+
     def open_settings(self):
-        dlg = SettingsDialog(self)
-        if dlg.exec():
-            # 重新加载设置后无需重启
-            self.settings = settings_mod.load_settings()
+        # 保存时 store 原地更新共享的 Settings 并通知订阅者，无需重新读盘或重启
+        if SettingsDialog(self.store, self).exec():
             self._status("设置已保存")
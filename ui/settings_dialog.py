@@ -4,14 +4,17 @@ from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QCheckBox,
     QLineEdit, QPushButton
 )
+import dataclasses
 from core import settings as settings_mod
 
 class SettingsDialog(QDialog):
-    def __init__(self, parent=None):
+    """编辑 SettingsStore 中设置的副本；保存时一次性 update()，变化的键即时通知各组件。"""
+    def __init__(self, store: settings_mod.SettingsStore, parent=None):
         super().__init__(parent)
         self.setWindowTitle("设置")
         self.setMinimumWidth(420)
-        self.s = settings_mod.load_settings()
+        self.store = store
+        self.s = dataclasses.replace(store.settings)
 
         lay = QVBoxLayout(self)
 
@@ -54,6 +57,38 @@ class SettingsDialog(QDialog):
         self.txt_ms = QLineEdit(str(self.s.min_interval_ms))
         row4.addWidget(self.txt_ms); lay.addLayout(row4)
 
+        # 自适应间隔：等剪贴板确认后再粘贴，并自动学习间隔
+        row4b = QHBoxLayout()
+        self.chk_adaptive = QCheckBox("自适应间隔(ms)：")
+        self.chk_adaptive.setChecked(self.s.paste_pacing == "adaptive")
+        row4b.addWidget(self.chk_adaptive)
+        self.txt_ms_lo = QLineEdit(str(self.s.paste_interval_min_ms))
+        self.txt_ms_hi = QLineEdit(str(self.s.paste_interval_max_ms))
+        row4b.addWidget(self.txt_ms_lo); row4b.addWidget(QLabel("~")); row4b.addWidget(self.txt_ms_hi)
+        lay.addLayout(row4b)
+
+        # 图片编码（速度 vs 体积）
+        row5 = QHBoxLayout()
+        row5.addWidget(QLabel("图片编码："))
+        self.cmb_codec = QComboBox()
+        self.cmb_codec.addItems(["png(无损)", "webp(更小)", "jpg(最快/有损)"])
+        self.cmb_codec.setCurrentIndex({"png":0,"webp":1,"jpg":2}.get(self.s.image_codec, 0))
+        row5.addWidget(self.cmb_codec)
+        row5.addWidget(QLabel("质量/压缩级别："))
+        self.txt_quality = QLineEdit(str(self.s.image_quality))
+        self.txt_quality.setPlaceholderText("-1 为默认")
+        row5.addWidget(self.txt_quality); lay.addLayout(row5)
+
+        # 保留策略（0=不限；收藏和置顶不淘汰）
+        row6 = QHBoxLayout()
+        row6.addWidget(QLabel("保留：天数"))
+        self.txt_keep_days = QLineEdit(str(self.s.retention_max_age_days)); row6.addWidget(self.txt_keep_days)
+        row6.addWidget(QLabel("条数"))
+        self.txt_keep_items = QLineEdit(str(self.s.retention_max_items)); row6.addWidget(self.txt_keep_items)
+        row6.addWidget(QLabel("MB"))
+        self.txt_keep_mb = QLineEdit(str(self.s.retention_max_mb)); row6.addWidget(self.txt_keep_mb)
+        lay.addLayout(row6)
+
         # buttons
         btns = QHBoxLayout()
         btn_ok = QPushButton("保存")
@@ -79,5 +114,24 @@ class SettingsDialog(QDialog):
             self.s.min_interval_ms = max(60, int(self.txt_ms.text()))
         except:
             pass
-        settings_mod.save_settings(self.s)
+        self.s.paste_pacing = "adaptive" if self.chk_adaptive.isChecked() else "fixed"
+        try:
+            lo = max(0, int(self.txt_ms_lo.text())); hi = max(lo, int(self.txt_ms_hi.text()))
+            self.s.paste_interval_min_ms, self.s.paste_interval_max_ms = lo, hi
+        except:
+            pass
+        # 图片编码
+        self.s.image_codec = {0:"png",1:"webp",2:"jpg"}[self.cmb_codec.currentIndex()]
+        try:
+            self.s.image_quality = max(-1, min(100, int(self.txt_quality.text())))
+        except:
+            pass
+        # 保留策略
+        try:
+            self.s.retention_max_age_days = max(0, int(self.txt_keep_days.text()))
+            self.s.retention_max_items = max(0, int(self.txt_keep_items.text()))
+            self.s.retention_max_mb = max(0, int(self.txt_keep_mb.text()))
+        except:
+            pass
+        self.store.update(**dataclasses.asdict(self.s))
         self.accept()